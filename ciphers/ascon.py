@@ -5,10 +5,10 @@ Created on Dec 18, 2015
 '''
 
 from parser import stpcommands
+from parser.sbox import getChi
 from ciphers.cipher import AbstractCipher
 from ciphers import components
 
-from parser.stpcommands import getStringLeftRotate as rotl
 from parser.stpcommands import getStringRightRotate as rotr
 
 
@@ -69,15 +69,7 @@ class AsconCipher(AbstractCipher):
         self.c = ["c{}{}".format(x, i) for i in range(rounds+1)
                  for x in range(sboxsize)]
 
-        # Inputs/Output to the S-box
-        self.xin = ["inx{}{}{}".format(y, z, i) for i in range(rounds)
-                   for y in range(sboxsize) for z in range (wordsize)]
-        self.xout = ["outx{}{}{}".format(y, z, i) for i in range(rounds)
-                    for y in range(sboxsize) for z in range (wordsize)]
-        self.andout = ["andout{}{}{}".format(y, z, i) for i in range(rounds)
-                      for y in range(sboxsize) for z in range (wordsize)]
-
-        # w = weight
+        # w = weight, tmp = weight of each S-box in unary
         self.w = ["w{}".format(i) for i in range(rounds)]
         self.tmp = ["tmp{}{}{}".format(y, z, i) for i in range(rounds)
                    for y in range(sboxsize) for z in range (wordsize)]
@@ -88,9 +80,6 @@ class AsconCipher(AbstractCipher):
         stpcommands.setupVariables(stp_file, self.c, wordsize)
         stpcommands.setupVariables(stp_file, self.w, 16)
         stpcommands.setupVariables(stp_file, self.tmp, sboxsize)
-        stpcommands.setupVariables(stp_file, self.xin, sboxsize)
-        stpcommands.setupVariables(stp_file, self.xout, sboxsize)
-        stpcommands.setupVariables(stp_file, self.andout, sboxsize)
         
         # Register state for non-zero constraint
         self.state_variables = self.s
@@ -109,7 +98,9 @@ class AsconCipher(AbstractCipher):
             rate = parameters["rate"]
 
         # Weight computation (Ascon uses setupWeightComputationSum)
-        stpcommands.setupWeightComputationSum(stp_file, weight, self.w, wordsize)
+        stpcommands.setupWeightComputationSum(stp_file, weight, self.w, wordsize,
+                                              encoding=parameters.get("weightencoding", "bvplus"),
+                                              roundBounds=parameters.get("roundbounds"))
 
         # Fix variables for capacity
         for i in range(rate // wordsize, (rate + capacity) // wordsize):
@@ -125,10 +116,9 @@ class AsconCipher(AbstractCipher):
         """
         wordsize = parameters["wordsize"]
         self.setupAsconRound(stp_file, round_nr, self.s, self.a, self.b, self.c, wordsize, self.tmp,
-                             self.w, self.xin, self.xout, self.andout)
+                             self.w)
 
-    def setupAsconRound(self, stp_file, rnd, s, a, b, c, wordsize, tmp,
-                        w, xin, xout, andout):
+    def setupAsconRound(self, stp_file, rnd, s, a, b, c, wordsize, tmp, w):
         """
         Model for one round of Ascon.
         """
@@ -149,56 +139,15 @@ class AsconCipher(AbstractCipher):
                                                           s[3 + 5*rnd])
 
 
-        # Model for the S-box
-
+        # Model for the S-box, the non-linear part is chi on each column
+        stp_file.write(command)
+        command = ""
+        chi = getChi(5)
         for z in range(wordsize):
-            # Construct S-box input
-            command += "ASSERT({}={});\n".format(
-                xin[z + 5*wordsize*rnd],
-                a[0 + 5*rnd] + "[{0}:{0}]".format(z) + "@" +
-                a[1 + 5*rnd] + "[{0}:{0}]".format(z) + "@" +
-                a[2 + 5*rnd] + "[{0}:{0}]".format(z) + "@" +
-                a[3 + 5*rnd] + "[{0}:{0}]".format(z) + "@" +
-                a[4 + 5*rnd] + "[{0}:{0}]".format(z))
-
-            # Construct S-box output
-            command += "ASSERT({}={});\n".format(
-                xout[z + 5*wordsize*rnd],
-                b[0 + 5*rnd] + "[{0}:{0}]".format(z) + "@" +
-                b[1 + 5*rnd] + "[{0}:{0}]".format(z) + "@" +
-                b[2 + 5*rnd] + "[{0}:{0}]".format(z) + "@" +
-                b[3 + 5*rnd] + "[{0}:{0}]".format(z) + "@" +
-                b[4 + 5*rnd] + "[{0}:{0}]".format(z))
-
-            xin_rotalpha = rotl(xin[z + 5*wordsize*rnd], 2, 5)
-            xin_rotbeta = rotl(xin[z + 5*wordsize*rnd], 1, 5)
-
-            #Deal with dependent inputs
-            varibits = "({0} | {1})".format(xin_rotalpha, xin_rotbeta)
-            doublebits = self.getDoubleBits(xin[z + 5*wordsize*rnd])
-
-            #Check for valid difference
-            firstcheck = "({} & ~{})".format(andout[z + 5*wordsize*rnd], varibits)
-            secondcheck = "(~BVXOR({}, {}) & {})".format(
-            andout[z + 5*wordsize*rnd], rotl(andout[z + 5*wordsize*rnd], 2 - 1, 5), doublebits)
-            thirdcheck = "(IF {0} = 0b{1} THEN BVMOD(5, {0}, 0b00010) ELSE 0b{2}ENDIF)".format(
-                xin[z + 5*wordsize*rnd], "11111", "00000")
-            command += "ASSERT(({} | {} | {}) = 0b{});\n".format(firstcheck,
-            secondcheck, thirdcheck, "00000")
-
-            #Assert XORs
-            command += "ASSERT({} = BVXOR({},{}));\n".format(
-                xout[z + 5*wordsize*rnd], 
-                xin[z + 5*wordsize*rnd], 
-                andout[z + 5*wordsize*rnd])
-
-            #Weight computation
-            command += ("ASSERT({0} = (IF {1} = 0b{4} THEN BVSUB({5},0b{4},0b{6}1)"
-                        "ELSE BVXOR({2}, {3}) ENDIF));\n".format(
-                            self.tmp[z + 5*wordsize*rnd], 
-                            xin[z + 5*wordsize*rnd], 
-                            varibits, doublebits, "1"*5,
-                            5, "0"*4))
+            column = ["{}[{}:{}]".format(a[x + 5*rnd], z, z) for x in range(5)]
+            output = ["{}[{}:{}]".format(b[x + 5*rnd], z, z) for x in range(5)]
+            weights = ["{}[{}:{}]".format(tmp[z + 5*wordsize*rnd], bit, bit) for bit in reversed(range(5))]
+            components.add_sbox(stp_file, chi, column, output, weights)
 
             weight_sum += ("0b{0}@(BVPLUS({1}, {2}[0:0], {2}[1:1], "
                 "{2}[2:2],{2}[3:3], {2}[4:4])),".format("0"*11, 5, "0b0000@" +
@@ -233,9 +182,3 @@ class AsconCipher(AbstractCipher):
 
         stp_file.write(command)
         return
-
-    def getDoubleBits(self, xin):
-        command = "({0} & ~{1} & {2})".format(
-            rotl(xin, 1, 5), rotl(xin, 2, 5),
-            rotl(xin, 2*2 - 1, 5))
-        return command
@@ -15,6 +15,11 @@ class AbstractCipher(object, metaclass=ABCMeta):
     def __init__(self):
         self.state_variables = []
         self.weight_variables = []
+        # Weight variables of each round, for the matsui weight encoding
+        self.round_weight_variables = []
+        # Fractional S-box weights and their number of bits
+        self.fraction_variables = []
+        self.fraction_precision = 0
 
     @property
     @abstractmethod
@@ -38,6 +43,8 @@ class AbstractCipher(object, metaclass=ABCMeta):
         """
         self.state_variables = []
         self.weight_variables = []
+        self.round_weight_variables = []
+        self.fraction_variables = []
         
         self.validate_parameters(parameters)
         
@@ -90,7 +97,9 @@ class AbstractCipher(object, metaclass=ABCMeta):
             w_size = wordsize
             if self.name in ["skinny", "rectangle"]:
                 w_size = parameters.get("blocksize", 64)
-            stpcommands.setupWeightComputation(stp_file, weight, self.weight_variables, w_size, ignore_msbs, encoding)
+            stpcommands.setupWeightComputation(stp_file, weight, self.weight_variables, w_size, ignore_msbs, encoding,
+                                               self.round_weight_variables, parameters.get("roundbounds"),
+                                               self.fraction_variables, self.fraction_precision)
 
         # Standard round loop
         for i in range(rounds):
@@ -174,6 +183,21 @@ class AbstractCipher(object, metaclass=ABCMeta):
         stpcommands.setupVariables(stp_file, vars, wordsize)
         if is_weight:
             self.weight_variables.extend(vars)
+            while len(self.round_weight_variables) < len(vars):
+                self.round_weight_variables.append([])
+            for i, var in enumerate(vars):
+                self.round_weight_variables[i].append(var)
         if is_state:
             self.state_variables.extend(vars)
         return vars
+
+    def declare_fraction_vector_per_round(self, stp_file, prefix, rounds, sboxes, precision):
+        """
+        Helper to declare the fractional S-box weights of each round, with
+        precision bits for each S-box.
+        """
+        vars = self.declare_variable_vector_per_round(stp_file, prefix, rounds, sboxes * precision)
+        self.fraction_precision = precision
+        self.fraction_variables.extend(f"{var}[{precision*k + precision - 1}:{precision*k}]"
+                                       for var in vars for k in range(sboxes))
+        return vars
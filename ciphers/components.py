@@ -1,24 +1,42 @@
 
-from typing import List, TextIO, Tuple, Any
+from typing import List, Optional, TextIO, Tuple, Any
 from parser import stpcommands
 
-def add_4bit_sbox(stp_file: TextIO, sbox: List[int], inputs: List[str], outputs: List[str], weights: List[str]):
+def add_4bit_sbox(stp_file: TextIO, sbox: List[int], inputs: List[str], outputs: List[str], weights: List[str],
+                  fraction: Optional[List[str]] = None):
     """
-    Adds constraints for a 4-bit S-box differential transition.
+    Adds constraints for a 4-bit S-box differential transition. The
+    fraction bits hold the fractional part of the weight.
     """
     assert len(inputs) == 4
     assert len(outputs) == 4
     assert len(weights) == 4
     
     variables = inputs + outputs + weights
-    command = stpcommands.add4bitSbox(sbox, variables)
+    command = stpcommands.add4bitSbox(sbox, variables, fraction=fraction)
+    stp_file.write(command)
+
+def add_sbox(stp_file: TextIO, sbox: List[int], inputs: List[str], outputs: List[str],
+             weights: List[str], linear: bool = False):
+    """
+    Adds constraints for an n-bit S-box differential transition, or with
+    linear for a linear approximation. The weight bits give the weight
+    in unary, rounded down to an integer.
+    """
+    assert len(inputs) == len(outputs) == len(weights)
+
+    variables = inputs + outputs + weights
+    command = stpcommands.addSbox(sbox, variables, linear=linear)
     stp_file.write(command)
 
 def add_4bit_sbox_at_pos(stp_file: TextIO, sbox: List[int], pos: int, 
-                         in_var: str, out_var: str, w_var: str):
+                         in_var: str, out_var: str, w_var: str,
+                         f_var: Optional[str] = None, precision: int = 0):
     """
     Adds constraints for a 4-bit S-box at a specific bit position.
-    pos is the index of the nibble (0 is bits 0-3).
+    pos is the index of the nibble (0 is bits 0-3). The fractional part
+    of the weight is given by the precision bits of f_var at position
+    pos.
     """
     inputs = [f"{in_var}[{4*pos + 3}:{4*pos + 3}]",
               f"{in_var}[{4*pos + 2}:{4*pos + 2}]",
@@ -32,7 +50,11 @@ def add_4bit_sbox_at_pos(stp_file: TextIO, sbox: List[int], pos: int,
                f"{w_var}[{4*pos + 2}:{4*pos + 2}]",
                f"{w_var}[{4*pos + 1}:{4*pos + 1}]",
                f"{w_var}[{4*pos + 0}:{4*pos + 0}]"]
-    add_4bit_sbox(stp_file, sbox, inputs, outputs, weights)
+    fraction = None
+    if f_var is not None:
+        fraction = [f"{f_var}[{precision*pos + bit}:{precision*pos + bit}]"
+                    for bit in reversed(range(precision))]
+    add_4bit_sbox(stp_file, sbox, inputs, outputs, weights, fraction)
 
 def add_bit_permutation(stp_file: TextIO, input_var: str, output_var: str, permutation: List[int], wordsize: int):
     """
@@ -98,7 +98,10 @@ class CraftCipherLinear(AbstractCipher):
             stpcommands.setupVariables(stp_file, y, wordsize)
             stpcommands.setupVariables(stp_file, z, wordsize)
             stpcommands.setupVariables(stp_file, w, wordsize)
-            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize)
+            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[[var] for var in w],
+                                               roundBounds=parameters.get("roundbounds"))
 
             for i in range(rounds):
                 self.setupCraftRound(stp_file, x[i], y[i], z[i], x[i+1],
@@ -6,6 +6,7 @@ Created on Feb 21, 2017
 
 from parser import stpcommands
 from ciphers.cipher import AbstractCipher
+from config import SBOX_WEIGHT_PRECISION
 
 
 class FlyCipher(AbstractCipher):
@@ -49,15 +50,26 @@ class FlyCipher(AbstractCipher):
 
             # w = weight
             w = ["w{}".format(i) for i in range(rounds)]
+            # wf = fractional part of the S-box weights
+            precision = SBOX_WEIGHT_PRECISION
+            wf = ["wf{}".format(i) for i in range(rounds)]
+            self.fraction_precision = precision
 
             stpcommands.setupVariables(stp_file, s, wordsize)
             stpcommands.setupVariables(stp_file, p, wordsize)
             stpcommands.setupVariables(stp_file, w, wordsize)
+            stpcommands.setupVariables(stp_file, wf, 8*precision)
 
-            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize)
+            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[[var] for var in w],
+                                               roundBounds=parameters.get("roundbounds"),
+                                               fractions=["{0}[{1}:{2}]".format(var, precision*(k+1) - 1, precision*k)
+                                                          for var in wf for k in range(8)],
+                                               precision=precision)
 
             for i in range(rounds):
-                self.setupFlyRound(stp_file, s[i], p[i], s[i+1], w[i], wordsize)
+                self.setupFlyRound(stp_file, s[i], p[i], s[i+1], w[i], wf[i], wordsize)
 
             # No all zero characteristic
             stpcommands.assertNonZero(stp_file, s, wordsize)
@@ -77,7 +89,7 @@ class FlyCipher(AbstractCipher):
 
         return
 
-    def setupFlyRound(self, stp_file, s_in, p, s_out, w, wordsize):
+    def setupFlyRound(self, stp_file, s_in, p, s_out, w, wf, wordsize):
         """
         Model for differential behaviour of one round FLY
         """
@@ -131,7 +143,9 @@ class FlyCipher(AbstractCipher):
                          "{0}[{1}:{1}]".format(w, 8*i + 2),
                          "{0}[{1}:{1}]".format(w, 8*i + 1),
                          "{0}[{1}:{1}]".format(w, 8*i + 0)]
-            command += stpcommands.add8bitSbox(fly_sbox, variables)
+            fraction = ["{0}[{1}:{1}]".format(wf, self.fraction_precision*i + bit)
+                        for bit in reversed(range(self.fraction_precision))]
+            command += stpcommands.add8bitSbox(fly_sbox, variables, fraction)
 
         stp_file.write(command)
         return
@@ -56,7 +56,10 @@ class Fly4BitCipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, p, wordsize)
             stpcommands.setupVariables(stp_file, w, wordsize)
 
-            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize)
+            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[w[i::rounds] for i in range(rounds)],
+                                               roundBounds=parameters.get("roundbounds"))
 
             for i in range(rounds):
                 self.setupFlyRound(stp_file, s[i], p[i], sbox1[i], s[i+1], w[i], w[i+rounds], w[i+(2*rounds)], wordsize)
@@ -6,7 +6,9 @@ Created on Oct 14, 2014
 '''
 
 from parser import stpcommands
+from parser.sbox import getChi
 from ciphers.cipher import AbstractCipher
+from ciphers import components
 
 from parser.stpcommands import getStringLeftRotate as rotl
 
@@ -64,12 +66,6 @@ class KetjeCipher(AbstractCipher):
             c = ["c{}{}".format(x, i) for i in range(rounds + 1) for x in range(5)]
             d = ["d{}{}".format(x, i) for i in range(rounds + 1) for x in range(5)]
             m = ["m{}{}".format(x, i) for i in range(rounds +1) for x in range(2)]
-            xin = ["xin{}{}{}".format(y, z, i) for i in range(rounds)
-                   for y in range(5) for z in range (wordsize)]
-            xout = ["xout{}{}{}".format(y, z, i) for i in range(rounds)
-                    for y in range(5) for z in range (wordsize)]
-            andOut = ["andOut{}{}{}".format(y, z, i) for i in range(rounds)
-                      for y in range(5) for z in range (wordsize)]
 
 	        # w = weight
             w = ["w{}".format(i) for i in range(rounds)]
@@ -82,18 +78,17 @@ class KetjeCipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, d, wordsize)
             stpcommands.setupVariables(stp_file, w, 16)
             stpcommands.setupVariables(stp_file, tmp, 5)
-            stpcommands.setupWeightComputationSum(stp_file, weight, w, wordsize)
-            stpcommands.setupVariables(stp_file, xin, 5)
-            stpcommands.setupVariables(stp_file, xout, 5)
-            stpcommands.setupVariables(stp_file, andOut, 5)
+            stpcommands.setupWeightComputationSum(stp_file, weight, w, wordsize,
+                                                  encoding=parameters.get("weightencoding", "bvplus"),
+                                                  roundBounds=parameters.get("roundbounds"))
             stpcommands.setupVariables(stp_file, m, wordsize)
 
             # No all zero characteristic
             stpcommands.assertNonZero(stp_file, a, wordsize)
 
             for rnd in range(rounds):
-                self.setupKeccakRound(stp_file, rnd, s, a, b, c, d, wordsize, 
-                                      tmp, w, m, xin, xout, andOut)
+                self.setupKeccakRound(stp_file, rnd, s, a, b, c, d, wordsize,
+                                      tmp, w, m)
 
             for key, value in parameters["fixedVariables"].items():
                 stpcommands.assertVariableValue(stp_file, key, value)
@@ -103,7 +98,7 @@ class KetjeCipher(AbstractCipher):
         return
 
     def setupKeccakRound(self, stp_file, rnd, s, a, b, c, d, wordsize, tmp,
-                         w, m, xin, xout, andOut):
+                         w, m):
         """
         Model for one round of Keccak.
         """
@@ -139,60 +134,19 @@ class KetjeCipher(AbstractCipher):
                 command += "ASSERT({} = {});\n".format(
                     b[new_b_index], rotl(tmp_xor, self.RO[x][y], wordsize))
 
-        # Chi
-        rot_alpha = 2
-        rot_beta = 1
+        # Chi on each column of each plane, tmp is the weight in unary
+        stp_file.write(command)
+        command = ""
+        chi = getChi(5)
         weight_sum = ""
 
         for y in range(5):
             for z in range(wordsize):
-                # Construct S-box input
-                command += "ASSERT({}={});\n".format(
-                    xin[z + wordsize*y + 5*wordsize*rnd],
-                    b[0 + 5*y + 25*rnd] + "[{0}:{0}]".format(z) + "@" +
-                    b[1 + 5*y + 25*rnd] + "[{0}:{0}]".format(z) + "@" +
-                    b[2 + 5*y + 25*rnd] + "[{0}:{0}]".format(z) + "@" +
-                    b[3 + 5*y + 25*rnd] + "[{0}:{0}]".format(z) + "@" +
-                    b[4 + 5*y + 25*rnd] + "[{0}:{0}]".format(z))
-
-                # Construct S-box output
-                command += "ASSERT({}={});\n".format(
-                    xout[z + wordsize*y + 5*wordsize*rnd],
-                    s[0 + 5*y + 25*(rnd+1)] + "[{0}:{0}]".format(z) + "@" +
-                    s[1 + 5*y + 25*(rnd+1)] + "[{0}:{0}]".format(z) + "@" +
-                    s[2 + 5*y + 25*(rnd+1)] + "[{0}:{0}]".format(z) + "@" +
-                    s[3 + 5*y + 25*(rnd+1)] + "[{0}:{0}]".format(z) + "@" +
-                    s[4 + 5*y + 25*(rnd+1)] + "[{0}:{0}]".format(z))
-
-                xin_rotalpha = rotl(xin[z + wordsize*y + 5*wordsize*rnd], rot_alpha, 5)
-                xin_rotbeta = rotl(xin[z + wordsize*y + 5*wordsize*rnd], rot_beta, 5)
-
-                #Deal with dependent inputs
-                varibits = "({0} | {1})".format(xin_rotalpha, xin_rotbeta)
-                doublebits = self.getDoubleBits(xin[z + wordsize*y + 5*wordsize*rnd], rot_alpha, rot_beta)
-
-                #Check for valid difference
-                firstcheck = "({} & ~{})".format(andOut[z + wordsize*y + 5*wordsize*rnd], varibits)
-                secondcheck = "(~BVXOR({}, {}) & {})".format(
-                andOut[z + wordsize*y + 5*wordsize*rnd], rotl(andOut[z + wordsize*y + 5*wordsize*rnd], rot_alpha - rot_beta, 5), doublebits)
-                thirdcheck = "(IF {0} = 0b{1} THEN BVMOD(5, {0}, 0b00010) ELSE 0b{2}ENDIF)".format(
-                xin[z + wordsize*y + 5*wordsize*rnd], "11111", "00000")
-                command += "ASSERT(({} | {} | {}) = 0b{});\n".format(firstcheck,
-                secondcheck, thirdcheck, "00000")
-
-                #Assert XORs
-                command += "ASSERT({} = BVXOR({},{}));\n".format(
-                    xout[z + wordsize*y + 5*wordsize*rnd], 
-                    xin[z + wordsize*y + 5*wordsize*rnd], 
-                    andOut[z + wordsize*y + 5*wordsize*rnd])
-
-                #Weight computation
-                command += ("ASSERT({0} = (IF {1} = 0b{4} THEN BVSUB({5},0b{4},0b{6}1)"
-                            "ELSE BVXOR({2}, {3}) ENDIF));\n".format(
-                                tmp[z + wordsize*y + 5*wordsize*rnd], 
-                                xin[z + wordsize*y + 5*wordsize*rnd], 
-                                varibits, doublebits, "1"*5,
-                                5, "0"*4))
+                column = ["{}[{}:{}]".format(b[x + 5*y + 25*rnd], z, z) for x in range(5)]
+                output = ["{}[{}:{}]".format(s[x + 5*y + 25*(rnd+1)], z, z) for x in range(5)]
+                weights = ["{}[{}:{}]".format(tmp[z + wordsize*y + 5*wordsize*rnd], bit, bit)
+                           for bit in reversed(range(5))]
+                components.add_sbox(stp_file, chi, column, output, weights)
 
                 weight_sum += ("0b{0}@(BVPLUS({1}, {2}[0:0], {2}[1:1], "
                                "{2}[2:2],{2}[3:3], {2}[4:4])),".format(
@@ -203,9 +157,3 @@ class KetjeCipher(AbstractCipher):
 
         stp_file.write(command)
         return
-
-    def getDoubleBits(self, xin, rot_alpha, rot_beta):
-        command = "({0} & ~{1} & {2})".format(
-            rotl(xin, rot_beta, 5), rotl(xin, rot_alpha, 5),
-            rotl(xin, 2*rot_alpha - rot_beta, 5))
-        return command
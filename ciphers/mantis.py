@@ -69,7 +69,8 @@ class MantisCipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, mc, wordsize)
             stpcommands.setupVariables(stp_file, wn, wordsize)
 
-            stpcommands.setupWeightComputation(stp_file, weight, wn, wordsize)
+            stpcommands.setupWeightComputation(stp_file, weight, wn, wordsize,
+                                               encoding=parameters.get("weightencoding", "bvplus"))
 
             # Forward rounds
             for rnd in range(rounds // 2):
@@ -56,7 +56,10 @@ class Midori128Cipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, mc, wordsize)
             stpcommands.setupVariables(stp_file, w, wordsize)
 
-            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize)
+            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[[var] for var in w],
+                                               roundBounds=parameters.get("roundbounds"))
 
             for i in range(rounds):
                 self.setupMidoriRound(stp_file, sb[i], sc[i], mc[i], sb[i+1],
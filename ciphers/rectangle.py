@@ -25,6 +25,14 @@ class RectangleCipher(AbstractCipher):
         """
         return ['SC', 'SR', 'w']
 
+    # Rectangle S-box, applied to the columns of bits i, 16 + i, 32 + i, 48 + i
+    rectangle_sbox = [0x6, 0x5, 0xC, 0xA, 0x1, 0xE, 0x7, 0x9, 0xB, 0x0, 0x3, 0xD, 0x8, 0xF, 0x4, 0x2]
+
+    # ShiftRows rotates the rows of 16 bits left by 0, 1, 12 and 13
+    # bit i moves to bit P(i)
+    rectangle_permutation = [16*row + (i + rotation) % 16
+                             for row, rotation in enumerate([0, 1, 12, 13]) for i in range(16)]
+
     def setup_variables(self, stp_file, parameters):
         """
         Declare variables for RECTANGLE.
@@ -47,25 +55,11 @@ class RectangleCipher(AbstractCipher):
         w = self.w[round_nr]
 
         #SubColumn
-        rectangle_sbox = [0x6, 0x5, 0xC, 0xA, 0x1, 0xE, 0x7, 0x9, 0xB, 0x0, 0x3, 0xD, 0x8, 0xF, 0x4, 0x2]
         for i in range(16):
-            components.add_rectangle_sbox(stp_file, rectangle_sbox, i, sc_in, sr, w)
+            components.add_rectangle_sbox(stp_file, self.rectangle_sbox, i, sc_in, sr, w)
 
         #ShiftRows
-        # row 0 <<< 0
-        components.add_assignment(stp_file, f"{sc_out}[15:0]", f"{sr}[15:0]")
-
-        # row 1 <<< 1
-        components.add_assignment(stp_file, f"{sc_out}[31:17]", f"{sr}[30:16]")
-        components.add_assignment(stp_file, f"{sc_out}[16:16]", f"{sr}[31:31]")
-
-        # row 2 <<< 12
-        components.add_assignment(stp_file, f"{sc_out}[43:32]", f"{sr}[47:36]")
-        components.add_assignment(stp_file, f"{sc_out}[47:44]", f"{sr}[35:32]")
-
-        # row 3 <<< 13
-        components.add_assignment(stp_file, f"{sc_out}[63:61]", f"{sr}[50:48]")
-        components.add_assignment(stp_file, f"{sc_out}[60:48]", f"{sr}[63:51]")
+        components.add_bit_permutation(stp_file, sr, sc_out, self.rectangle_permutation, blocksize)
 
     def apply_iterative_constraints(self, stp_file, parameters):
         """
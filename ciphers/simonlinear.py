@@ -87,7 +87,10 @@ class SimonLinearCipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, sbits, wordsize)
             stpcommands.setupVariables(stp_file, pbits, wordsize)
 
-            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize)
+            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[[var] for var in w],
+                                               roundBounds=parameters.get("roundbounds"))
 
             for i in range(rounds):
                 indicesFrom = i*wordsize
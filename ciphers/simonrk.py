@@ -72,7 +72,10 @@ class SimonRkCipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, and_out, wordsize)
             stpcommands.setupVariables(stp_file, w, wordsize)
 
-            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize)
+            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[[var] for var in w],
+                                               roundBounds=parameters.get("roundbounds"))
 
             #Key Schedule
             self.setupSimonKey(stp_file, k, rounds, wordsize)
@@ -62,7 +62,8 @@ class SipHashCipher(AbstractCipher):
         weight = parameters["sweight"]
         ignore_msbs = parameters.get("ignore_msbs", 0)
         encoding = parameters.get("weightencoding", "bvplus")
-        stpcommands.setupWeightComputation(stp_file, weight, self.weight_variables, wordsize, ignore_msbs, encoding)
+        stpcommands.setupWeightComputation(stp_file, weight, self.weight_variables, wordsize, ignore_msbs, encoding,
+                                           self.round_weight_variables, parameters.get("roundbounds"))
 
         # 2. Round logic with message injection
         for block in range(num_messages):
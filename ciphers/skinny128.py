@@ -6,6 +6,7 @@ Created on Nov 15, 2017
 
 from parser import stpcommands
 from ciphers.cipher import AbstractCipher
+from config import SBOX_WEIGHT_PRECISION
 
 
 class Skinny128Cipher(AbstractCipher):
@@ -67,17 +68,28 @@ class Skinny128Cipher(AbstractCipher):
 
             # w = weight
             w = ["w{}".format(i) for i in range(rounds)]
+            # wf = fractional part of the S-box weights
+            precision = SBOX_WEIGHT_PRECISION
+            wf = ["wf{}".format(i) for i in range(rounds)]
+            self.fraction_precision = precision
 
             stpcommands.setupVariables(stp_file, sc, blocksize)
             stpcommands.setupVariables(stp_file, sr, blocksize)
             stpcommands.setupVariables(stp_file, mc, blocksize)
             stpcommands.setupVariables(stp_file, w, blocksize)
+            stpcommands.setupVariables(stp_file, wf, 16*precision)
 
-            stpcommands.setupWeightComputation(stp_file, weight, w, blocksize)
+            stpcommands.setupWeightComputation(stp_file, weight, w, blocksize,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[[var] for var in w],
+                                               roundBounds=parameters.get("roundbounds"),
+                                               fractions=["{0}[{1}:{2}]".format(var, precision*(k+1) - 1, precision*k)
+                                                          for var in wf for k in range(16)],
+                                               precision=precision)
 
             for i in range(rounds):
                 self.setupSkinnyRound(stp_file, sc[i], sr[i], mc[i], sc[i+1], 
-                                      w[i], blocksize)
+                                      w[i], wf[i], blocksize)
 
             # No all zero characteristic
             stpcommands.assertNonZero(stp_file, sc, blocksize)
@@ -97,7 +109,7 @@ class Skinny128Cipher(AbstractCipher):
 
         return
 
-    def setupSkinnyRound(self, stp_file, sc_in, sr, mc, sc_out, w, blocksize):
+    def setupSkinnyRound(self, stp_file, sc_in, sr, mc, sc_out, w, wf, blocksize):
         """
         Model for differential behaviour of one round Skinny
         """
@@ -179,7 +191,9 @@ class Skinny128Cipher(AbstractCipher):
                          "{0}[{1}:{1}]".format(w, 8*i + 2),
                          "{0}[{1}:{1}]".format(w, 8*i + 1),
                          "{0}[{1}:{1}]".format(w, 8*i + 0)]
-            command += stpcommands.add8bitSbox(skinny_sbox, variables)
+            fraction = ["{0}[{1}:{1}]".format(wf, self.fraction_precision*i + bit)
+                        for bit in reversed(range(self.fraction_precision))]
+            command += stpcommands.add8bitSbox(skinny_sbox, variables, fraction)
 
         stp_file.write(command)
         return
@@ -110,7 +110,10 @@ class SkinnyRKCipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, tk_after_pt, blocksize)
             stpcommands.setupVariables(stp_file, w, blocksize)
 
-            stpcommands.setupWeightComputation(stp_file, weight, w, blocksize)
+            stpcommands.setupWeightComputation(stp_file, weight, w, blocksize,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[[var] for var in w],
+                                               roundBounds=parameters.get("roundbounds"))
 
             self.setupTweakeySchedule(stp_file, tk, tk_after_pt, rounds, blocksize, nrOfTK)
 
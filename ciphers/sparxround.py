@@ -73,7 +73,10 @@ class SPARXRoundCipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, wright, wordsize)
 
             # Ignore MSB
-            stpcommands.setupWeightComputation(stp_file, weight, wleft + wright, wordsize, 1)
+            stpcommands.setupWeightComputation(stp_file, weight, wleft + wright, wordsize, 1,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[list(ws) for ws in zip(wleft, wright)],
+                                               roundBounds=parameters.get("roundbounds"))
 
             for i in range(rounds):
                 if parameters["skipround"] == (i+1):
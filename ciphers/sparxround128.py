@@ -102,7 +102,10 @@ class SPARXRound128Cipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, wx3, wordsize)
 
             # Ignore MSB
-            stpcommands.setupWeightComputation(stp_file, weight, wx0 + wx1 + wx2 + wx3, wordsize, 1)
+            stpcommands.setupWeightComputation(stp_file, weight, wx0 + wx1 + wx2 + wx3, wordsize, 1,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[list(ws) for ws in zip(wx0, wx1, wx2, wx3)],
+                                               roundBounds=parameters.get("roundbounds"))
 
             for i in range(rounds):
                 if ((i+1) % self.rounds_per_step) == 0:
@@ -59,7 +59,10 @@ class SpeckeyCipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, w, wordsize)
 
             # Ignore MSB
-            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize, 1)
+            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize, 1,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[[var] for var in w],
+                                               roundBounds=parameters.get("roundbounds"))
 
             for i in range(rounds):
                 self.setupSpeckeyRound(stp_file, x[i], y[i], x[i+1], y[i+1], w[i],
@@ -90,7 +90,10 @@ class TrifleCipher(AbstractCipher):
             stpcommands.setupVariables(stp_file, x, wordsize)
             stpcommands.setupVariables(stp_file, y, wordsize)            
             stpcommands.setupVariables(stp_file, w, wordsize)
-            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize)
+            stpcommands.setupWeightComputation(stp_file, weight, w, wordsize,
+                                               encoding=parameters.get("weightencoding", "bvplus"),
+                                               roundVariables=[[var] for var in w],
+                                               roundBounds=parameters.get("roundbounds"))
 
             for i in range(rounds):
                 self.setupTrifleRound(stp_file, x[i], y[i], x[i+1],
@@ -5,7 +5,34 @@ PATH_BOOLECTOR = "../boolector/build/bin/boolector"
 PATH_BITWUZLA = "../bitwuzla/build/bin/bitwuzla"
 PATH_CVC5 = "cvc5"
 PATH_APPROXMC = "approxmc"
+# Option of CryptoMiniSat to only block solutions on the sampling set,
+# "--onlysampling" in newer releases
+CRYPTOMINISAT_PROJECTION = "--onlyindep"
+# Name of the SAT solver used with --pysat, it has to support interrupts
+# (e.g. glucose4, maplechrono or minisat22, but not CaDiCaL)
+PYSAT_SOLVER = "glucose4"
+# Maximum size of the result cache (--cachedir) in MB
+RESULT_CACHE_SIZE = 1024
 #Maximum weight for characteristics to search for
 MAX_WEIGHT = 1000
 #Maximum number of characteristics to search for a differential
 MAX_CHARACTERISTICS = 10000000
+# Directory of the partial DDTs of the modular addition (--thresholdsearch).
+# The tables are built on first use and are not versioned.
+PDDT_DIRECTORY = "tmp/pddt"
+# Maximum weight of the transitions in the partial DDT. The table grows
+# quickly with the threshold, for word sizes above 32 bits 2 is advised.
+PDDT_THRESHOLD = 3
+# Time in seconds for the threshold search before the solver takes over
+THRESHOLD_SEARCH_TIME = 60
+# Final tolerance and failure probability of the anytime estimation (--anytime)
+APPROXMC_EPSILON = 0.8
+APPROXMC_DELTA = 0.2
+# Tolerance of the coarse ApproxMC counts which bound the number of
+# characteristics of a weight for --stopfraction, the bounds hold together
+# with probability at least 1 - APPROXMC_DELTA
+STOPFRACTION_EPSILON = 4.0
+# Fractional bits of the S-box weights which are not integers, e.g.
+# -log2(6/16). They are rounded down to multiples of 2^-precision, so the
+# minimal weights found are lower bounds.
+SBOX_WEIGHT_PRECISION = 3
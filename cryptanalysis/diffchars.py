@@ -6,6 +6,8 @@ Created on Apr 25, 2014
 
 import itertools
 
+from config import SBOX_WEIGHT_PRECISION
+
 
 class DifferentialCharacteristic(object):
     '''
@@ -27,6 +29,36 @@ class DifferentialCharacteristic(object):
         self.cipher = cipher
         return
 
+    def getWeight(self):
+        """
+        Get the weight of the characteristic as integer.
+        """
+        weight_clean = str(self.weight).replace("0x", "").replace("#x", "")
+        return int(weight_clean, 16)
+
+    def getFractionalWeight(self):
+        """
+        Get the weight of the characteristic before it is rounded down to
+        an integer, or None if the cipher has no fractional S-box weights.
+        The S-box weights themselves are rounded down to multiples of
+        2^-SBOX_WEIGHT_PRECISION, so this is still a lower bound.
+        """
+        if "weightfraction" not in self.characteristic_data:
+            return None
+        fraction = int(str(self.characteristic_data["weightfraction"]).replace("0x", "").replace("#x", ""), 16)
+        return self.getWeight() - (fraction >> SBOX_WEIGHT_PRECISION) + fraction / 2**SBOX_WEIGHT_PRECISION
+
+    def getWeightString(self):
+        """
+        Get the weight as printed, with the weight before rounding down
+        if the cipher has fractional S-box weights.
+        """
+        fractional = self.getFractionalWeight()
+        if fractional is None:
+            return str(self.getWeight())
+        return (f"{self.getWeight()} (rounded down from {fractional}, S-box weights rounded "
+                f"down to multiples of 2^-{SBOX_WEIGHT_PRECISION})")
+
     def getData(self):
         """
         Get the data as a list.
@@ -86,8 +118,7 @@ class DifferentialCharacteristic(object):
         print(header_str)
         print("-"*len(header_str))
         print(data_str)
-        weight_clean = str(self.weight).replace("0x", "").replace("#x", "")
-        print("Weight: " + str(int(weight_clean, 16)))
+        print("Weight: " + self.getWeightString())
         return
 
     def get_rich_table(self):
@@ -97,10 +128,7 @@ class DifferentialCharacteristic(object):
         from rich.table import Table
         from rich import box
         
-        weight_clean = str(self.weight).replace("0x", "").replace("#x", "")
-        weight_val = int(weight_clean, 16)
-        
-        table = Table(title=f"Optimal Trail (Weight: {weight_val})", 
+        table = Table(title=f"Optimal Trail (Weight: {self.getWeightString()})", 
                       box=box.ROUNDED, expand=True, title_style="bold green")
         
         data = self.getData()
@@ -4,89 +4,350 @@ Created on Mar 22, 2017
 @author: ralph
 '''
 
-# imports go here
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import SBOX_WEIGHT_PRECISION
+from cryptanalysis.diffchars import DifferentialCharacteristic
+from parser import sbox as sbox_engine
+
+
+class SPN(object):
+    """
+    Differential description of an SPN with 4-bit S-boxes and a bit
+    permutation. nibbles[k] are the state bits of S-box k, most significant
+    bit first, and bit i of the S-box layer output moves to bit
+    permutation[i] of the next state.
+    """
+
+    def __init__(self, sbox, nibbles, permutation, format_string):
+        self.sbox = tuple(sbox)
+        self.nibbles = nibbles
+        self.permutation = permutation
+        self.blocksize = len(permutation)
+        # Names of the state before and after the S-boxes, and the weight
+        self.format_string = format_string
+
+
+def getSPN(cipher, parameters) -> SPN:
+    """
+    SPN description of PRESENT, GIFT or Rectangle, taken from the tables
+    of the cipher model.
+    """
+    if cipher.name == "present":
+        nibbles = [[4*k + 3, 4*k + 2, 4*k + 1, 4*k] for k in range(16)]
+        return SPN(cipher.present_sbox, nibbles, cipher.present_permutation, ['S', 'P', 'w'])
+    if cipher.name == "gift":
+        wordsize = parameters.get("wordsize", 64)
+        permutation = cipher.gift128_permutation if wordsize == 128 else cipher.gift64_permutation
+        nibbles = [[4*k + 3, 4*k + 2, 4*k + 1, 4*k] for k in range(len(permutation) // 4)]
+        return SPN(cipher.gift_sbox, nibbles, permutation, ['SC', 'PB', 'w'])
+    if cipher.name == "rectangle":
+        nibbles = [[k + 48, k + 32, k + 16, k] for k in range(16)]
+        return SPN(cipher.rectangle_sbox, nibbles, cipher.rectangle_permutation, ['SC', 'SR', 'w'])
+    raise ValueError(f"{cipher.name} is not supported by the branch-and-bound search.")
+
 
 class MatsuisAlgorithm(object):
+    """
+    Matsui's branch-and-bound search for differential characteristics of
+    minimal weight. A characteristic of r rounds is only extended while
+    the weight of its first rounds plus the minimal weight B_(r-i) of the
+    remaining rounds is within the threshold. The threshold starts at the
+    lower bound max B_i + B_(r-i) and is increased until a characteristic
+    is found, so the first one found is optimal.
+
+    The S-box transitions and weights are the ones of the SMT model. If
+    a probability is not a power of two, all weights are counted in
+    multiples of 2^-SBOX_WEIGHT_PRECISION and rounded down, so the minimal
+    weights are lower bounds.
+    """
 
-    DDT = None
+    def __init__(self, spn: SPN, deadline: Optional[float] = None):
+        self.spn = spn
+        self.deadline = deadline
+        # Minimal weights B_1, B_2, ... found so far
+        self.bounds: List[float] = []
+        # Weights are searched as integers in units of 2^-precision
+        self.precision = SBOX_WEIGHT_PRECISION if sbox_engine.hasFractionalWeights(spn.sbox) else 0
+        self.scale = 1 << self.precision
+        self.calculateDifferentialDistributionTable()
 
-    def procedure_round_1(cipher):
+    def calculateDifferentialDistributionTable(self):
         """
-        description of function 
+        Rows of the DDT as lists of (weight, output difference), sorted by
+        weight, and the tables to apply the bit permutation to the output
+        of each S-box.
         """
-        # create a list of all input differences with hammingweight 1
-        allInputDifferences = self.getAllPossibleDifferences(cipher)
+        spn = self.spn
+        self.DDT = sbox_engine.getDDT(spn.sbox)
+        weights = sbox_engine.getTransitionWeights(spn.sbox, precision=self.precision)
+        table = np.full((16, 16), -1, dtype=np.int64)
+        for (a, b), weight in weights.items():
+            table[a][b] = weight
+        self.table = table
+
+        self.rows = [[] for _ in range(16)]
+        for a in range(1, 16):
+            valid = np.nonzero(table[a] >= 0)[0]
+            order = valid[np.lexsort((valid, table[a][valid]))]
+            self.rows[a] = [(int(table[a][b]), int(b)) for b in order]
+        self.min_weight = [row[0][0] if row else 0 for row in self.rows]
+        self.lightest_row = min(self.min_weight[1:])
+
+        # Weight of the best input difference for each output difference,
+        # the input of the first round is free
+        self.min_input = [None] * 16
+        for b in range(1, 16):
+            column = table[:, b]
+            valid = np.nonzero(column >= 0)[0]
+            valid = valid[valid != 0]
+            if len(valid):
+                a = int(valid[np.argmin(column[valid])])
+                self.min_input[b] = (int(column[a]), a)
+        self.first_row = sorted((weight, b) for b, (weight, _) in
+                                ((b, entry) for b, entry in enumerate(self.min_input) if entry is not None))
+        self.lightest = min(weight for weight, _ in self.first_row)
 
-        #for each candidate for \delta X1 do the following
-        for X1 in allInputDifferences:
-            #Let p1 = max_\deltaY (\deltaX1, \deltaY)
-            p1 = self.getMaxProbability(cipher, X1)
-            #If [p1, B_n-1] >= B_n_dash 
-            #if p1*
-                #Call procedure_round_2()
-                #self.procedure_round_i(2)
-        return
+        # The output b of S-box k sets the bits spread[k][b] of the next state
+        position = {bit: (k, 3 - i) for k, bits in enumerate(spn.nibbles) for i, bit in enumerate(bits)}
+        self.spread = []
+        for bits in spn.nibbles:
+            row = []
+            for b in range(16):
+                targets: Dict[int, int] = {}
+                for i, bit in enumerate(bits):
+                    if (b >> (3 - i)) & 1:
+                        k, shift = position[spn.permutation[bit]]
+                        targets[k] = targets.get(k, 0) | (1 << shift)
+                row.append(tuple(targets.items()))
+            self.spread.append(row)
+
+    def getMaxProbability(self, diffIn: int) -> float:
+        """
+        Minimal weight of a transition of a single S-box for the input
+        difference.
+        """
+        return self._weight(self.min_weight[diffIn])
 
-    def procedure_round_i(i):
+    def getProbabilityForDifferential(self, diffIn: int, diffOut: int) -> Optional[float]:
         """
-        description of function 
+        Weight of the transition of a single S-box, None if it is not
+        possible.
         """
-        allOutputDifferences = getAllPossibleDifferences(cipher)
+        for weight, b in self.rows[diffIn]:
+            if b == diffOut:
+                return self._weight(weight)
+        return None
 
-        #For each candidate for \deltaYi do the following
-        for Yi in allOutputDifferences:
-            #Calculate \deltaXi according to the diffusion layer
-            Xi = self.calculateNextInputDifference(Yi, cipher)
-            #Calculate the probability pi according to the DDT of the Sbox
-            pi = getProbabilityForDifferential(Xi, Yi)
-            #If [p1, ..., pi, Bn-i] >= Bndash
-                # Call procedure_round_i(i++)
-        return
+    def calculateNextInputDifference(self, outputs: Dict[int, int]) -> Dict[int, int]:
+        """
+        Input differences of the active S-boxes of the next round, for the
+        output differences of the active S-boxes of this round.
+        """
+        state: Dict[int, int] = {}
+        for k, b in outputs.items():
+            for target, value in self.spread[k][b]:
+                state[target] = state.get(target, 0) | value
+        return state
 
-    def procedure_round_n():
+    def findMinimalWeights(self, rounds: int) -> List[float]:
         """
-        description of function 
+        Minimal weights B_1, ..., B_rounds, every bound is searched with
+        the bounds of fewer rounds.
         """
-        #Calculate \deltaXi according to the diffusion layer
-        #Calculate the probability pn according to the DDT of the Sbox
-        #If [p1, ..., pi, pn] >= Bndash
-            #Bndash = [p1, ..., pi, pn]
-        return
+        while len(self.bounds) < rounds:
+            weight, _ = self.search(len(self.bounds) + 1)
+            if weight is None:
+                break
+        return self.bounds
 
-    def getAllPossibleDifferences(cipher):
+    def search(self, rounds: int, start: int = 0, end: Optional[int] = None):
         """
-        Returns a list of all differences with hammingweight 1
+        Minimal weight of a characteristic of the given rounds and the
+        characteristic as list of (input, output, weight) of each round,
+        with the weights of the trail in units of 2^-precision.
+        The bounds of fewer rounds are searched first. Returns (None, None)
+        if there is no characteristic with a weight below end, or if the
+        deadline is reached.
         """
-        return [[1 if i==j else 0 for i in range(cipher.blocksize)] for j in range(cipher.blocksize)]
+        if len(self.bounds) < rounds - 1:
+            self.findMinimalWeights(rounds - 1)
+            if len(self.bounds) < rounds - 1:
+                return None, None
+
+        start = start * self.scale
+        threshold = max(start, self._lower_bound(rounds))
+        while end is None or threshold < end * self.scale:
+            self.nodes = 0
+            trail = self._procedure_round_1(rounds, threshold)
+            if trail is not None:
+                weight = self._weight(sum(round_weight for _, _, round_weight in trail))
+                if len(self.bounds) == rounds - 1 and start <= self._lower_bound(rounds):
+                    self.bounds.append(weight)
+                return weight, trail
+            if self._reached_deadline():
+                break
+            threshold += 1
+        return None, None
+
+    def _lower_bound(self, rounds: int) -> int:
+        if rounds == 1:
+            return self.lightest
+        return max(self._bound(i) + self._bound(rounds - i) for i in range(1, rounds))
 
-    def getMaxProbability(cipher, diffIn):
+    def _bound(self, rounds: int) -> int:
+        if rounds == 0:
+            return 0
+        return math.ceil(self.bounds[rounds - 1] * self.scale)
+
+    def _weight(self, weight: int) -> float:
         """
-        returns the maximum probability according to a certain input difference
+        Weight of an integer number of units of 2^-precision, as integer
+        if the S-box weights are integers.
         """
-        return
+        return weight / self.scale if self.precision else weight
+
+    def _reached_deadline(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
 
-    def calculateNextInputDifference(Yi, cipher):
+    def _procedure_round_1(self, rounds: int, threshold: int):
         """
-        Calculate the next input difference according to the output difference and the diffusion layer
-        of the cipher
+        Chooses the output differences of the active S-boxes of the first
+        round, each with the lightest input difference.
         """
-        return
+        num_sboxes = len(self.spn.nibbles)
+        # Weight left for the first round
+        budget = threshold - self._bound(rounds - 1)
+        rest = self._bound(rounds - 2) if rounds > 1 else 0
+        outputs: Dict[int, int] = {}
+        # Number of first round S-boxes which activate each S-box of the
+        # second round. Every active S-box of the second round weighs at
+        # least the lightest transition, and more S-boxes in the first
+        # round never make it inactive.
+        targets = [0] * num_sboxes
+
+        def activate(k: int, b: int, step: int) -> int:
+            for target, _ in self.spread[k][b]:
+                targets[target] += step
+            return sum(1 for count in targets if count)
 
-    def getProbabilityForDifferential(Xi, Yi):
+        def choose(k: int, weight: int):
+            if outputs:
+                if rounds == 1:
+                    return self._trail_round_1(outputs)
+                trail = self._procedure_round_i(2, rounds, self.calculateNextInputDifference(outputs),
+                                                weight, threshold)
+                if trail is not None:
+                    return self._trail_round_1(outputs) + trail
+            for position in range(k, num_sboxes):
+                for sbox_weight, b in self.first_row:
+                    if weight + sbox_weight > budget:
+                        break
+                    outputs[position] = b
+                    active = activate(position, b, 1)
+                    trail = None
+                    if rounds == 1 or weight + sbox_weight + active * self.lightest_row + rest <= threshold:
+                        trail = choose(position + 1, weight + sbox_weight)
+                    activate(position, b, -1)
+                    del outputs[position]
+                    if trail is not None:
+                        return trail
+                if self._reached_deadline():
+                    return None
+            return None
+
+        return choose(0, 0)
+
+    def _trail_round_1(self, outputs: Dict[int, int]):
+        inputs = {k: self.min_input[b][1] for k, b in outputs.items()}
+        weight = sum(self.min_input[b][0] for b in outputs.values())
+        return [(inputs, dict(outputs), weight)]
+
+    def _procedure_round_i(self, i: int, rounds: int, inputs: Dict[int, int], weight: int, threshold: int):
         """
-        Returns the probability of a differential according to a given input/output difference
+        Chooses the transitions of the active S-boxes of round i, whose
+        input differences are given by the previous round.
         """
-        return self.DDT[Xi][Yi]
+        self.nodes += 1
+        if self.nodes % 4096 == 0 and self._reached_deadline():
+            return None
+        active = sorted(inputs)
+        # Minimal weight of the S-boxes not chosen yet
+        remaining = [0] * (len(active) + 1)
+        for j in reversed(range(len(active))):
+            remaining[j] = remaining[j + 1] + self.min_weight[inputs[active[j]]]
+        rest = self._bound(rounds - i)
+        if weight + remaining[0] + rest > threshold:
+            return None
+        if i == rounds:
+            return self._procedure_round_n(inputs, remaining[0])
 
-        return
+        outputs: Dict[int, int] = {}
 
-    def calculateDifferentialDistributionTable(cipher):
-        self.DDT = [[0]*len(cipher.sbox) for i in range(len(cipher.sbox))]
+        def choose(j: int, round_weight: int):
+            if j == len(active):
+                trail = self._procedure_round_i(i + 1, rounds, self.calculateNextInputDifference(outputs),
+                                                weight + round_weight, threshold)
+                if trail is not None:
+                    return [(dict(inputs), dict(outputs), round_weight)] + trail
+                return None
+            k = active[j]
+            for sbox_weight, b in self.rows[inputs[k]]:
+                if weight + round_weight + sbox_weight + remaining[j + 1] + rest > threshold:
+                    break
+                outputs[k] = b
+                trail = choose(j + 1, round_weight + sbox_weight)
+                if trail is not None:
+                    return trail
+            return None
 
-        for i in range(len(self.DDT)):
-            for j in range(len(self.DDT)):
-                self.DDT[i ^ j][cipher.sbox[i] ^ cipher.sbox[j]] += 1
+        return choose(0, 0)
 
+    def _procedure_round_n(self, inputs: Dict[int, int], weight: int):
+        """
+        The last round uses the lightest transition of every S-box.
+        """
+        outputs = {k: self.rows[a][0][1] for k, a in inputs.items()}
+        return [(dict(inputs), outputs, weight)]
 
+    def getCharacteristic(self, trail, cipher) -> DifferentialCharacteristic:
+        """
+        Characteristic in the variables of the cipher model. The weight of
+        a round is given by the number of bits set in its weight variable,
+        the fractional S-box weights by the fields of wf and their sum by
+        weightfraction as in the model.
+        """
+        state, after_sbox, weight_name = self.spn.format_string
+        data = {}
+        fraction = 0
+        for r, (inputs, outputs, weight) in enumerate(trail):
+            data[f"{state}{r}"] = self._to_hex(inputs)
+            data[f"{after_sbox}{r}"] = self._to_hex(outputs)
+            data[f"{weight_name}{r}"] = self._hex((1 << weight) - 1)
+            if self.precision:
+                sbox_weights = {k: int(self.table[inputs[k]][b]) for k, b in outputs.items()}
+                integer = sum(sbox_weight >> self.precision for sbox_weight in sbox_weights.values())
+                data[f"{weight_name}{r}"] = self._hex((1 << integer) - 1)
+                fractions = {k: sbox_weight % self.scale for k, sbox_weight in sbox_weights.items()}
+                data[f"wf{r}"] = hex(sum(value << (self.precision * k) for k, value in fractions.items()))
+                fraction += sum(fractions.values())
+        data[f"{state}{len(trail)}"] = self._to_hex(self.calculateNextInputDifference(trail[-1][1]))
+        if self.precision:
+            data["weightfraction"] = hex(fraction)
+        total = sum(weight for _, _, weight in trail) >> self.precision
+        return DifferentialCharacteristic(data, cipher, len(trail), hex(total))
 
+    def _to_hex(self, nibbles: Dict[int, int]) -> str:
+        value = 0
+        for k, nibble in nibbles.items():
+            for i, bit in enumerate(self.spn.nibbles[k]):
+                if (nibble >> (3 - i)) & 1:
+                    value |= 1 << bit
+        return self._hex(value)
 
+    def _hex(self, value: int) -> str:
+        return "0x" + hex(value)[2:].zfill(self.spn.blocksize // 4)
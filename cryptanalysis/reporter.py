@@ -20,6 +20,7 @@ class SearchReporter:
         self.mode = parameters.get("mode", 0)
         self.last_char = None # Store last DifferentialCharacteristic
         self.current_prob = 0.0
+        self.interval = None # (lower, upper, confidence) of the anytime estimation
         
         # Progress components
         self.progress = Progress(
@@ -43,9 +44,14 @@ class SearchReporter:
         mode_str = mode_names.get(self.mode, str(self.mode))
         
         solver_name = "STP"
-        if self.parameters.get("bitwuzla"): solver_name = "Bitwuzla"
+        if self.parameters.get("portfolio"): solver_name = "Portfolio"
+        elif self.parameters.get("bitwuzla"): solver_name = "Bitwuzla"
         elif self.parameters.get("boolector"): solver_name = "Boolector"
         elif self.parameters.get("cvc5"): solver_name = "CVC5"
+        elif self.parameters.get("pysat"): solver_name = "PySAT"
+        elif self.parameters.get("cryptominisat"): solver_name = "CryptoMiniSat"
+        if self.parameters.get("inprocess") and solver_name in ["Bitwuzla", "CVC5"]:
+            solver_name += " (in-process)"
         
         grid.add_row(
             f"[bold blue]Cipher:[/bold blue] {self.parameters.get('cipher')} | "
@@ -70,7 +76,12 @@ class SearchReporter:
     def _make_stats_panel(self) -> Panel:
         elapsed = time.time() - self.start_time
         stats = f"Elapsed: {elapsed:.2f}s | Cumulative Trails Found: {self.total_characteristics}"
-        if self.mode == 4 and self.current_prob > 0:
+        if self.mode == 4 and self.interval and self.interval[0] > 0:
+            import math
+            lower, upper, confidence = self.interval
+            upper = f"{math.log(upper, 2):.2f}" if upper < math.inf else "?"
+            stats += f" | Log2(Prob) in [{math.log(lower, 2):.2f}, {upper}] (confidence {confidence:.3f})"
+        elif self.mode == 4 and self.current_prob > 0:
             import math
             log_prob = math.log(self.current_prob, 2)
             stats += f" | Current Log2(Prob): {log_prob:.2f}"
@@ -102,6 +113,21 @@ class SearchReporter:
         if hasattr(self, "update_display"):
             self.update_display()
 
+    def update_count(self, weight: int, count: int):
+        # Called for every chunk of solver output, the display is refreshed
+        # at most every 0.1s
+        self.progress.update(self.task_id, description=f"Counting Weight {weight}: {count} solutions")
+        now = time.time()
+        if hasattr(self, "update_display") and now - getattr(self, "_last_count_update", 0) >= 0.1:
+            self._last_count_update = now
+            self.update_display()
+
+    def update_interval(self, lower: float, upper: float, confidence: float):
+        # Bounds of the probability which hold with the given confidence
+        self.interval = (lower, upper, confidence)
+        if hasattr(self, "update_display"):
+            self.update_display()
+
     def add_trail(self, weight: int, desc: str = "", count: int = 1, characteristic = None, prob: float = 0.0):
         if count > 0:
             self.total_characteristics += count
@@ -0,0 +1,70 @@
+'''
+Table of the minimal weights B_1, B_2, ... of characteristics over 1, 2, ...
+rounds, used to chain the searches of Mode 1.
+'''
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("cryptosmt")
+
+# Parameters which change the minimal weights of a cipher
+_KEY_PARAMETERS = ["cipher", "wordsize", "blocksize", "rotationconstants"]
+
+
+def lower_bound(bounds: List[Optional[int]], rounds: int) -> int:
+    """
+    Lower bound on the weight of a characteristic over the given rounds,
+    by Matsui's inequality B_r >= B_i + B_(r - i). Unknown bounds are None.
+    """
+    def bound(length: int) -> int:
+        if 0 < length <= len(bounds) and bounds[length - 1] is not None:
+            return bounds[length - 1]
+        return 0
+
+    lower = bound(rounds)
+    for i in range(1, rounds):
+        lower = max(lower, bound(i) + bound(rounds - i))
+    return lower
+
+
+def known_rounds(bounds: List[Optional[int]]) -> int:
+    """
+    Number of rounds r such that B_1, ..., B_r are known.
+    """
+    rounds = 0
+    while rounds < len(bounds) and bounds[rounds] is not None:
+        rounds += 1
+    return rounds
+
+
+def _key(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: parameters.get(name) for name in _KEY_PARAMETERS}
+
+
+def load_bounds(path: str, parameters: Dict[str, Any]) -> List[Optional[int]]:
+    """
+    Reads the bounds saved by save_bounds. Bounds of other parameters are
+    not used.
+    """
+    if not os.path.isfile(path):
+        return []
+    with open(path, "r") as f:
+        table = json.load(f)
+    if table.get("parameters") != _key(parameters):
+        logger.warning(f"The bounds in {path} belong to other parameters, not using them.")
+        return []
+    return table.get("bounds", [])
+
+
+def save_bounds(path: str, parameters: Dict[str, Any], bounds: List[Optional[int]]) -> None:
+    """
+    Writes the bounds to path, the file is replaced atomically so that an
+    interrupted search does not leave a partial table.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"parameters": _key(parameters), "bounds": bounds}, f)
+    os.replace(tmp_path, path)
@@ -11,10 +11,14 @@ import threading
 
 from ciphers.cipher import AbstractCipher
 from .strategies.min_weight import MinWeightStrategy
-from .strategies.probability import ProbabilityStrategy
+from .strategies.stitch import StitchStrategy
+from .strategies.branch_bound import BranchBoundStrategy
+from .strategies.threshold import ThresholdStrategy
+from .strategies.probability import ProbabilityStrategy, AnytimeProbabilityStrategy
 from .strategies.all_characteristics import AllCharacteristicsStrategy
 from .strategies.best_constants import BestConstantsStrategy
 from .reporter import SearchReporter
+from . import roundbounds
 
 logger = logging.getLogger("cryptosmt")
 
@@ -23,9 +27,17 @@ def _run_with_reporter(strategy_class, cipher, parameters):
     Helper to run a strategy with the rich reporter in a separate thread.
     This ensures the Live UI stays responsive even during long solver calls.
     """
+    result, _ = _run_strategy(strategy_class, cipher, parameters)
+    return result
+
+def _run_strategy(strategy_class, cipher, parameters):
+    """
+    Runs a strategy as _run_with_reporter and returns its result and the
+    strategy.
+    """
     if parameters.get("quiet"):
         strategy = strategy_class(cipher, parameters)
-        return strategy.run()
+        return strategy.run(), strategy
         
     reporter = SearchReporter(parameters)
     strategy = strategy_class(cipher, parameters, reporter=reporter)
@@ -41,7 +53,7 @@ def _run_with_reporter(strategy_class, cipher, parameters):
 
     if not parameters.get("is_interactive"):
         # Fallback for non-interactive: simple run
-        return strategy.run()
+        return strategy.run(), strategy
 
     t = threading.Thread(target=search_thread)
     t.start()
@@ -61,16 +73,25 @@ def _run_with_reporter(strategy_class, cipher, parameters):
     if "error" in result_container:
         raise result_container["error"]
         
-    return result_container.get("result")
+    return result_container.get("result"), strategy
 
 def computeProbabilityOfDifferentials(cipher: AbstractCipher, parameters: Dict[str, Any]) -> float:
+    if parameters.get("anytime"):
+        return _run_with_reporter(AnytimeProbabilityStrategy, cipher, parameters)
     return _run_with_reporter(ProbabilityStrategy, cipher, parameters)
 
 def findBestConstants(cipher: AbstractCipher, parameters: Dict[str, Any]) -> List[int]:
     return _run_with_reporter(BestConstantsStrategy, cipher, parameters)
 
+def _min_weight_strategy(parameters: Dict[str, Any]):
+    if parameters.get("branchbound"):
+        return BranchBoundStrategy
+    if parameters.get("thresholdsearch"):
+        return ThresholdStrategy
+    return StitchStrategy if parameters.get("stitch") else MinWeightStrategy
+
 def findMinWeightCharacteristic(cipher: AbstractCipher, parameters: Dict[str, Any]) -> int:
-    return _run_with_reporter(MinWeightStrategy, cipher, parameters)
+    return _run_with_reporter(_min_weight_strategy(parameters), cipher, parameters)
 
 def findAllCharacteristics(cipher: AbstractCipher, parameters: Dict[str, Any]) -> None:
     return _run_with_reporter(AllCharacteristicsStrategy, cipher, parameters)
@@ -78,10 +99,45 @@ def findAllCharacteristics(cipher: AbstractCipher, parameters: Dict[str, Any]) -
 def searchCharacteristics(cipher: AbstractCipher, parameters: Dict[str, Any]) -> None:
     """
     Searches for differential characteristics of minimal weight
-    for an increasing number of rounds.
+    for an increasing number of rounds. The minimal weights B_1, ..., B_r
+    found so far give the starting weight B_i + B_(r - i) of the next
+    round and are added to its model as roundbounds. With a bounds file,
+    the table is saved after every round and an interrupted search
+    continues after the last round in the table.
     """
+    bounds = list(parameters.get("roundbounds") or [])
+    boundsfile = parameters.get("boundsfile")
+    # The bounds of shorter trails do not hold for constrained models
+    chaining = not (parameters.get("fixedVariables") or parameters.get("blockedCharacteristics") or
+                    parameters.get("iterative"))
+    if chaining and boundsfile:
+        saved = roundbounds.load_bounds(boundsfile, parameters)
+        bounds = saved + bounds[len(saved):]
+        known = roundbounds.known_rounds(bounds)
+        if known >= parameters["rounds"]:
+            logger.info(f"Minimal weights of up to {known} rounds are known from {boundsfile}")
+            parameters["rounds"] = known + 1
+
     while True:
-        logger.info(f"Number of rounds: {parameters['rounds']}")
-        parameters["sweight"] = findMinWeightCharacteristic(cipher, parameters)
-        parameters["rounds"] = parameters["rounds"] + 1
+        rounds = parameters["rounds"]
+        # The weight found is B_r if the search starts at a lower bound
+        # and all lower weights are decided
+        lower = roundbounds.lower_bound(bounds, rounds)
+        proven = chaining and parameters["sweight"] <= lower
+        if chaining:
+            parameters["sweight"] = max(parameters["sweight"], lower)
+            parameters["roundbounds"] = bounds[:rounds] or None
+            logger.info(f"Number of rounds: {rounds}, lower bound {lower}")
+        else:
+            logger.info(f"Number of rounds: {rounds}")
+        weight, strategy = _run_strategy(_min_weight_strategy(parameters), cipher, parameters)
+        if weight >= parameters["endweight"]:
+            break
+        parameters["sweight"] = weight
+        if proven and not strategy.unknown_weights:
+            bounds.extend([None] * (rounds - len(bounds)))
+            bounds[rounds - 1] = weight
+            if boundsfile:
+                roundbounds.save_bounds(boundsfile, parameters, bounds)
+        parameters["rounds"] = rounds + 1
     return
@@ -1,28 +1,137 @@
-
 import time
 import os
 import logging
 import random
 from typing import Dict, Any
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 
-from .base import SearchStrategy
+from .base import SearchStrategy, open_session
+from parser import smtlib2
+import solvers
 
 logger = logging.getLogger("cryptosmt")
 
+def _cube_bits(num_threads: int) -> int:
+    # At least four cubes per worker, so that a few hard cubes do not
+    # leave the other workers idle
+    return max(1, (4 * num_threads - 1).bit_length())
+
+def _enumerate_cube_task(cipher, parameters, cube):
+    """
+    Finds all characteristics of a single weight in one cube. The worker
+    only blocks the characteristics it found itself. Returns the
+    characteristics and whether the solver returned UNKNOWN.
+    """
+    local_params = parameters.copy()
+    local_params["fixedVariables"] = dict(parameters.get("fixedVariables", {}), **cube)
+    local_params["blockedCharacteristics"] = list(parameters.get("blockedCharacteristics", []))
+    solver = solvers.get_solver(local_params)
+
+    session = None
+    if parameters.get("incremental"):
+        session = open_session(cipher, solver, local_params)
+    if session is not None:
+        with session:
+            return _enumerate_incremental(cipher, parameters, session, local_params.get("ignore_msbs", 0))
+
+    rnd_id = f"{random.randrange(16**10):010x}"
+    stp_file = f"tmp/{cipher.name}_cube_{rnd_id}.stp"
+    deadline = parameters.get("deadline")
+    found = []
+    unknown = False
+    try:
+        while deadline is None or time.time() < deadline:
+            cipher.createSTP(stp_file, local_params)
+            result = solver.solve(stp_file)
+            if not result.is_sat:
+                unknown = result.is_unknown
+                break
+            characteristic = solver.parse_characteristic(result, cipher, parameters["rounds"])
+            local_params["blockedCharacteristics"].append(characteristic)
+            found.append(characteristic)
+    finally:
+        if os.path.isfile(stp_file): os.remove(stp_file)
+    return found, unknown
+
+def _enumerate_session(cipher, rounds, session, ignore_msbs, stop, found):
+    """
+    Finds all characteristics which satisfy the assertions of the session
+    and adds a blocking clause for each of them. found is called with
+    each characteristic. Returns whether the solver returned UNKNOWN, or
+    None if stop() ended the enumeration.
+    """
+    while not stop():
+        result = session.check()
+        if not result.is_sat:
+            return result.is_unknown
+        characteristic = session.parse_characteristic(result, cipher, rounds)
+        blocking = smtlib2.blockCharacteristic(characteristic, session.declared, ignore_msbs)
+        if not blocking:
+            # The session would find the same characteristic again
+            raise RuntimeError("The characteristic found by the solver session can not be blocked, "
+                               "none of its variables were read from the model.")
+        session.add(blocking)
+        found(characteristic)
+    return None
+
+def _enumerate_incremental(cipher, parameters, session, ignore_msbs):
+    # As _enumerate_cube_task, the blocking clauses are added to the session
+    deadline = parameters.get("deadline")
+    session.add(smtlib2.getWeightAssertion(parameters["sweight"]))
+    found = []
+    unknown = _enumerate_session(cipher, parameters["rounds"], session, ignore_msbs,
+                                 lambda: deadline is not None and time.time() >= deadline, found.append)
+    return found, bool(unknown)
+
+def _trail_key(characteristic):
+    # Characteristics are equal if their state and weight variables are
+    return tuple(sorted(characteristic.characteristic_data.items()))
+
 class AllCharacteristicsStrategy(SearchStrategy):
     def run(self) -> None:
         logger.info(f"Finding all characteristics for {self.cipher.name} - Rounds: {self.parameters['rounds']}, Weight: {self.parameters['sweight']}")
-        
+
         rnd_id = f"{random.randrange(16**10):010x}"
-        total_num_characteristics = 0
-        pbar = tqdm(desc="Found", unit=" char", disable=self.parameters.get("quiet", False))
+        self.total_num_characteristics = 0
+        self.pbar = tqdm(desc="Found", unit=" char", disable=self.parameters.get("quiet", False))
 
         # We must maintain a LOCAL list of blocked characteristics because
         # self.parameters might be shared or modified.
         if "blockedCharacteristics" not in self.parameters:
             self.parameters["blockedCharacteristics"] = []
 
+        num_threads = self.parameters.get("threads", 1)
+        cube_variable = self._cube_variable() if num_threads > 1 else None
+
+        session = None
+        if self.parameters.get("incremental") and cube_variable is None:
+            model_params = self.parameters.copy()
+            session = self.open_session(model_params)
+
+        if session is not None:
+            with session:
+                self._run_incremental(session, model_params.get("ignore_msbs", 0))
+        elif cube_variable is not None:
+            self._run_cubes(cube_variable, num_threads)
+        else:
+            self._run_regenerating(rnd_id)
+
+        self.pbar.close()
+        logger.info(f"Search complete. Total Search Time: {self.get_elapsed_time()}s")
+
+        if self.parameters.get("dot"):
+            with open(self.parameters["dot"], "w") as f:
+                f.write("strict digraph graphname {")
+                dot_graph = "".join(c.getDOTString() for c in self.parameters["blockedCharacteristics"])
+                f.write(dot_graph)
+                f.write("}")
+
+    def _run_regenerating(self, rnd_id: str) -> None:
+        """
+        Rewrite the STP file with all blocked characteristics and restart
+        the solver for each new characteristic.
+        """
         while not self.reached_timelimit() and self.parameters["sweight"] < self.parameters["endweight"]:
             iteration_start_time = time.time()
             stp_file = f"tmp/{self.cipher.name}_all_{rnd_id}.stp"
@@ -32,30 +141,100 @@ class AllCharacteristicsStrategy(SearchStrategy):
             result = self.solver.solve(stp_file)
 
             iteration_time = round(time.time() - iteration_start_time, 2)
-            pbar.set_postfix({"last": f"{iteration_time}s"})
+            self.pbar.set_postfix({"last": f"{iteration_time}s"})
 
             if result.is_sat:
                 characteristic = self.solver.parse_characteristic(result, self.cipher, self.parameters["rounds"])
-                self.parameters["blockedCharacteristics"].append(characteristic)
-                total_num_characteristics += 1
-                pbar.update(1)
-                if self.reporter:
-                    self.reporter.add_trail(self.parameters["sweight"], "Found character", characteristic=characteristic)
+                self._add_characteristic(characteristic)
             else:
-                logger.info(f"Finished weight {self.parameters['sweight']}. Total found: {total_num_characteristics}")
-                if self.reporter:
-                    self.reporter.update_weight(self.parameters["sweight"] + 1)
-                self.parameters["sweight"] += 1
-                total_num_characteristics = 0
-                pbar.reset()
-                continue
-
-        pbar.close()
-        logger.info(f"Search complete. Total Search Time: {self.get_elapsed_time()}s")
-        
-        if self.parameters.get("dot"):
-            with open(self.parameters["dot"], "w") as f:
-                f.write("strict digraph graphname {")
-                dot_graph = "".join(c.getDOTString() for c in self.parameters["blockedCharacteristics"])
-                f.write(dot_graph)
-                f.write("}")
+                if result.is_unknown:
+                    self._warn_unknown()
+                self._finish_weight()
+
+    def _run_incremental(self, session, ignore_msbs: int) -> None:
+        """
+        Keep one solver process alive and only add the blocking clause of
+        each new characteristic, instead of regenerating the model.
+        """
+        last = time.time()
+
+        def found(characteristic):
+            nonlocal last
+            self.pbar.set_postfix({"last": f"{round(time.time() - last, 2)}s"})
+            last = time.time()
+            self._add_characteristic(characteristic)
+
+        while self.parameters["sweight"] < self.parameters["endweight"]:
+            session.push()
+            session.add(smtlib2.getWeightAssertion(self.parameters["sweight"]))
+            unknown = _enumerate_session(self.cipher, self.parameters["rounds"], session, ignore_msbs,
+                                         self.reached_timelimit, found)
+            if unknown is None:
+                return
+            if unknown:
+                self._warn_unknown()
+            session.pop()
+            self._finish_weight()
+
+    def _run_cubes(self, variable: str, num_threads: int) -> None:
+        """
+        Splits every weight into disjoint cubes, which fix the lowest bits
+        of the given input variable, and enumerates the cubes in a process
+        pool.
+        """
+        bits = _cube_bits(num_threads)
+        cubes = [{f"{variable}[{bits - 1}:0]": f"0bin{value:0{bits}b}"} for value in range(2**bits)]
+        logger.info(f"Enumerating {len(cubes)} cubes on {variable} with {num_threads} processes")
+        # Characteristics of the other weights do not have to be blocked
+        parameters = dict(self.parameters, blockedCharacteristics=list(self.parameters["blockedCharacteristics"]))
+
+        with ProcessPoolExecutor(max_workers=num_threads) as executor:
+            while not self.reached_timelimit() and self.parameters["sweight"] < self.parameters["endweight"]:
+                parameters["sweight"] = self.parameters["sweight"]
+                futures = [executor.submit(_enumerate_cube_task, self.cipher, parameters, cube)
+                           for cube in cubes]
+                seen = set()
+                unknown = False
+                for future in as_completed(futures):
+                    characteristics, cube_unknown = future.result()
+                    unknown = unknown or cube_unknown
+                    for characteristic in characteristics:
+                        key = _trail_key(characteristic)
+                        if key not in seen:
+                            seen.add(key)
+                            self._add_characteristic(characteristic)
+                if self.reached_timelimit():
+                    break
+                if unknown:
+                    self._warn_unknown()
+                self._finish_weight()
+
+    def _cube_variable(self):
+        """
+        Input difference which is split into cubes, the first variable of
+        the print format in round 0. None if it is already fixed.
+        """
+        variable = f"{self.cipher.getFormatString()[0]}0"
+        if variable in self.parameters.get("fixedVariables", {}):
+            logger.warning(f"{variable} is fixed, enumerating the characteristics with a single thread.")
+            return None
+        return variable
+
+    def _add_characteristic(self, characteristic) -> None:
+        self.parameters["blockedCharacteristics"].append(characteristic)
+        self.total_num_characteristics += 1
+        self.pbar.update(1)
+        if self.reporter:
+            self.reporter.add_trail(self.parameters["sweight"], "Found character", characteristic=characteristic)
+
+    def _warn_unknown(self) -> None:
+        logger.warning(f"Solver returned UNKNOWN for weight {self.parameters['sweight']}, "
+                       f"characteristics of this weight may be missing.")
+
+    def _finish_weight(self) -> None:
+        logger.info(f"Finished weight {self.parameters['sweight']}. Total found: {self.total_num_characteristics}")
+        if self.reporter:
+            self.reporter.update_weight(self.parameters["sweight"] + 1)
+        self.parameters["sweight"] += 1
+        self.total_num_characteristics = 0
+        self.pbar.reset()
@@ -2,17 +2,45 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional
 import time
+import os
+import random
 import logging
 from ciphers.cipher import AbstractCipher
 import solvers
 
 logger = logging.getLogger("cryptosmt")
 
+def open_session(cipher: AbstractCipher, solver, parameters: Dict[str, Any]):
+    """
+    SearchStrategy.open_session for a given solver, e.g. in a worker process.
+    """
+    parameters["sweight"] = None
+    rnd_id = f"{random.randrange(16**8):08x}"
+    stp_file = f"tmp/{cipher.name}_session_{rnd_id}.stp"
+    cipher.createSTP(stp_file, parameters)
+    try:
+        session = solver.open_session(stp_file)
+    except NotImplementedError as e:
+        logger.warning(f"{e} Falling back to one solver call per query.")
+        return None
+    finally:
+        if os.path.isfile(stp_file): os.remove(stp_file)
+
+    if "weight" not in session.declared:
+        logger.warning(f"{cipher.name} has no weight variable, incremental mode not available.")
+        session.close()
+        return None
+    return session
+
 class SearchStrategy(ABC):
     def __init__(self, cipher: AbstractCipher, parameters: Dict[str, Any], reporter=None):
         self.cipher = cipher
         self.parameters = parameters
         self.start_time = time.time()
+        # Solver calls are stopped when the time limit is reached
+        timelimit = parameters.get("timelimit", -1)
+        if timelimit != -1:
+            parameters["deadline"] = self.start_time + timelimit
         self.solver = solvers.get_solver(parameters)
         self.reporter = reporter
 
@@ -33,5 +61,13 @@ class SearchStrategy(ABC):
             return True
         return False
 
+    def open_session(self, parameters: Dict[str, Any]):
+        """
+        Generate the weight-parametric model for the given parameters and
+        load it into an incremental solver session. Returns None if the
+        solver or the cipher model do not support it.
+        """
+        return open_session(self.cipher, self.solver, parameters)
+
     def get_elapsed_time(self) -> float:
         return round(time.time() - self.start_time, 2)
@@ -4,6 +4,7 @@ import logging
 from typing import Dict, Any, List
 
 from .base import SearchStrategy
+from .template import write_model
 
 logger = logging.getLogger("cryptosmt")
 
@@ -35,14 +36,18 @@ class BestConstantsStrategy(SearchStrategy):
                 while weight < self.parameters["endweight"]:
                     if self.reached_timelimit(): break
                     
-                    self.parameters["rotationconstants"] = [alpha, beta, gamma]
+                    local_params = self.parameters.copy()
+                    local_params["rotationconstants"] = [alpha, beta, gamma]
+                    local_params["sweight"] = weight
                     stp_file = f"tmp/{self.cipher.name}_{gamma}const.stp"
-                    self.cipher.createSTP(stp_file, self.parameters)
+                    write_model(self.cipher, stp_file, local_params)
                     
                     result = self.solver.solve(stp_file)
                     if result.is_sat:
                         logger.info(f"Alpha: {alpha} Beta: {beta} Gamma: {gamma} Weight: {weight}")
                         break
+                    if result.is_unknown:
+                        logger.warning(f"Solver returned UNKNOWN for Alpha: {alpha} Beta: {beta} Weight: {weight}")
                     weight += 1
                 constantMinWeights.append(weight)
         
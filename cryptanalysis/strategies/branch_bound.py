@@ -0,0 +1,49 @@
+import logging
+import math
+
+from cryptanalysis.matsui import MatsuisAlgorithm, getSPN
+from cryptanalysis import roundbounds
+from .min_weight import MinWeightStrategy
+
+logger = logging.getLogger("cryptosmt")
+
+
+class BranchBoundStrategy(MinWeightStrategy):
+    """
+    Searches a characteristic of minimal weight with Matsui's
+    branch-and-bound algorithm instead of a solver. Only available for
+    SPNs with 4-bit S-boxes and bit permutations, the other ciphers and
+    constrained models are searched with the solver.
+    """
+    def run(self) -> int:
+        self.unknown_weights = []
+        try:
+            spn = getSPN(self.cipher, self.parameters)
+        except ValueError as e:
+            logger.warning(f"{e} Using the solver.")
+            return super().run()
+        if self.parameters.get("fixedVariables") or self.parameters.get("blockedCharacteristics") or \
+                self.parameters.get("iterative"):
+            logger.warning("The branch-and-bound search does not support constraints, using the solver.")
+            return super().run()
+
+        logger.info(f"Starting branch-and-bound search for characteristic with minimal weight")
+        algorithm = MatsuisAlgorithm(spn, self.parameters.get("deadline"))
+        # Known minimal weights of fewer rounds are not searched again
+        bounds = self.parameters.get("roundbounds") or []
+        algorithm.bounds = list(bounds[:roundbounds.known_rounds(bounds)])
+        rounds = self.parameters["rounds"]
+        if self.reporter:
+            self.reporter.update_weight(self.parameters["sweight"])
+        weight, trail = algorithm.search(rounds, self.parameters["sweight"], self.parameters["endweight"])
+        if weight is None:
+            logger.info(f"No characteristic found within limit. Total Search Time: {self.get_elapsed_time()}s")
+            return self.parameters["endweight"]
+
+        logger.info(f"Minimal weights of 1 to {rounds} rounds: {algorithm.bounds}")
+        self.characteristic = algorithm.getCharacteristic(trail, self.cipher)
+        # Rounded down like the weight of the SMT model
+        weight = math.floor(weight)
+        if self.report:
+            self._report(weight, self.characteristic)
+        return weight
@@ -4,39 +4,75 @@ import os
 import logging
 import random
 from typing import Dict, Any, Tuple
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from .base import SearchStrategy
-import solvers
+from .template import write_model, write_bounded_model
+from parser import smtlib2
 
 logger = logging.getLogger("cryptosmt")
 
-def _solve_min_weight_task(cipher, parameters, weight):
+def _solve_min_weight_task(cipher, parameters, solver, weight):
     """
-    Independent helper for ProcessPoolExecutor.
+    Checks a single weight in a worker thread. The solver runs in its own
+    process and can be killed with solver.cancel().
     """
     rnd_id = f"{random.randrange(16**10):010x}"
     stp_file = f"tmp/{cipher.name}_minw{weight}_{rnd_id}.stp"
     
     local_params = parameters.copy()
     local_params["sweight"] = weight
-    cipher.createSTP(stp_file, local_params)
+    write_model(cipher, stp_file, local_params)
     
-    solver = solvers.get_solver(local_params)
     result = solver.solve(stp_file)
     
     if os.path.isfile(stp_file): os.remove(stp_file)
-    return (weight, result.is_sat, result)
+    return result
 
 class MinWeightStrategy(SearchStrategy):
+    # Characteristic of minimal weight, set by run() if one was found
+    characteristic = None
+    # The characteristic is printed and written to the dot/latex files,
+    # searches on parts of the trail turn this off
+    report = True
+
     def run(self) -> int:
         logger.info(f"Starting search for characteristic with minimal weight")
 
         num_threads = self.parameters.get("threads", 1)
         sweight = self.parameters["sweight"]
         endweight = self.parameters["endweight"]
+        # Weights for which the solver gave no answer within the limits
+        self.unknown_weights = []
         
-        if num_threads <= 1:
+        session = None
+        if self.parameters.get("incremental"):
+            if num_threads <= 1:
+                session = self.open_session(self.parameters.copy())
+            else:
+                logger.warning("Incremental mode is only available with a single thread.")
+
+        if self.parameters.get("bisect"):
+            if num_threads > 1:
+                logger.warning("The bisection search is sequential, using a single thread.")
+            if session is not None:
+                with session:
+                    return self._bounded_search(session)
+            return self._bounded_search()
+
+        if session is not None:
+            with session:
+                for weight in range(sweight, endweight):
+                    if self.reached_timelimit(): break
+                    if self.reporter:
+                        self.reporter.update_weight(weight)
+
+                    result = session.check_assuming([smtlib2.getWeightAssertion(weight)])
+                    if result.is_sat:
+                        return self._process_result(weight, result, session)
+                    if result.is_unknown:
+                        self._skip_weight(weight)
+        elif num_threads <= 1:
             for weight in range(sweight, endweight):
                 if self.reached_timelimit(): break
                 if self.reporter:
@@ -48,40 +84,163 @@ class MinWeightStrategy(SearchStrategy):
                 # Use unique filename to avoid collisions in parallel tests
                 rnd_id = f"{random.randrange(16**8):08x}"
                 stp_file = f"tmp/{self.cipher.name}{self.parameters['wordsize']}_{rnd_id}.stp"
-                self.cipher.createSTP(stp_file, local_params)
+                write_model(self.cipher, stp_file, local_params)
                 
                 result = self.solver.solve(stp_file)
                 if os.path.isfile(stp_file): os.remove(stp_file)
                 if result.is_sat:
                     return self._process_result(weight, result)
+                if result.is_unknown:
+                    self._skip_weight(weight)
         else:
-            with ProcessPoolExecutor(max_workers=num_threads) as executor:
-                curr_weight = sweight
-                while curr_weight < endweight:
-                    if self.reached_timelimit(): break
-                    
-                    batch_size = num_threads
-                    batch = range(curr_weight, min(curr_weight + batch_size, endweight))
-                    
-                    future_to_weight = {executor.submit(_solve_min_weight_task, self.cipher, self.parameters, w): w for w in batch}
-                    
-                    batch_results = {}
-                    for future in as_completed(future_to_weight):
-                        w, is_sat, res = future.result()
-                        batch_results[w] = (is_sat, res)
-                    
-                    for w in sorted(batch_results.keys()):
-                        if self.reporter: self.reporter.update_weight(w)
-                        is_sat, res = batch_results[w]
-                        if is_sat:
-                            return self._process_result(w, res)
-                    curr_weight += batch_size
+            weight, result = self._speculative_search(num_threads)
+            if result is not None:
+                return self._process_result(weight, result)
 
         logger.info(f"No characteristic found within limit. Total Search Time: {self.get_elapsed_time()}s")
         return endweight
 
-    def _process_result(self, weight, result):
-        characteristic = self.solver.parse_characteristic(result, self.cipher, self.parameters["rounds"])
+    def _speculative_search(self, num_threads):
+        """
+        Checks weights in parallel, each worker starts with the next weight
+        as soon as it is done. If a weight is SAT, the solvers of all higher
+        weights are killed. The search ends when all weights below the
+        lowest SAT weight are decided. Returns the weight and its result,
+        or (None, None) if no characteristic was found.
+        """
+        sweight = self.parameters["sweight"]
+        endweight = self.parameters["endweight"]
+        running = {}
+        results = {}
+        best = None
+        next_weight = sweight
+
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            while True:
+                limit = best if best is not None else endweight
+                while len(running) < num_threads and next_weight < limit and not self.reached_timelimit():
+                    solver = self.solver.copy()
+                    future = executor.submit(_solve_min_weight_task, self.cipher,
+                                             self.parameters, solver, next_weight)
+                    running[future] = (next_weight, solver)
+                    next_weight += 1
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    weight, _ = running.pop(future)
+                    results[weight] = future.result()
+                    if results[weight].is_sat and (best is None or weight < best):
+                        best = weight
+                        for other_weight, solver in running.values():
+                            if other_weight > best:
+                                solver.cancel()
+
+                lowest = sweight
+                while lowest in results and not results[lowest].is_sat:
+                    lowest += 1
+                if self.reporter:
+                    self.reporter.update_weight(lowest)
+                if best is not None and lowest == best:
+                    break
+
+            for _, solver in running.values():
+                solver.cancel()
+
+        for weight in sorted(results):
+            if best is not None and weight >= best:
+                break
+            if results[weight].is_unknown:
+                self._skip_weight(weight)
+        if best is None:
+            return (None, None)
+        return (best, results[best])
+
+    def _bounded_search(self, session=None) -> int:
+        """
+        Gallops upwards from sweight with weight <= bound queries until one
+        is satisfiable, then bisects between the last unsatisfiable bound
+        and the weight of the found characteristic.
+        """
+        backend = session or self.solver
+        endweight = self.parameters["endweight"]
+        # There is no characteristic with a weight below lower
+        lower = self.parameters["sweight"]
+        upper, best = None, None
+        step = 1
+        while best is None and lower < endweight:
+            if self.reached_timelimit(): break
+            bound = min(lower + step - 1, endweight - 1)
+            result = self._check_bound(bound, session)
+            if result.is_sat:
+                best = result
+                upper = self._result_weight(result, backend)
+            else:
+                if result.is_unknown:
+                    self._skip_bound(lower, bound)
+                lower = bound + 1
+                step *= 2
+
+        if best is None:
+            logger.info(f"No characteristic found within limit. Total Search Time: {self.get_elapsed_time()}s")
+            return endweight
+
+        while lower < upper:
+            if self.reached_timelimit():
+                self.unknown_weights.extend(range(lower, upper))
+                break
+            bound = (lower + upper - 1) // 2
+            result = self._check_bound(bound, session)
+            if result.is_sat:
+                best = result
+                upper = self._result_weight(result, backend)
+            else:
+                if result.is_unknown:
+                    self._skip_bound(lower, bound)
+                lower = bound + 1
+        return self._process_result(upper, best, session)
+
+    def _check_bound(self, bound, session=None):
+        logger.debug(f"Checking for characteristics with weight <= {bound}")
+        if self.reporter:
+            self.reporter.update_weight(bound)
+        if session is not None:
+            return session.check_assuming([smtlib2.getWeightBoundAssertion(bound)])
+
+        rnd_id = f"{random.randrange(16**8):08x}"
+        stp_file = f"tmp/{self.cipher.name}{self.parameters['wordsize']}_bound_{rnd_id}.stp"
+        write_bounded_model(self.cipher, stp_file, self.parameters, bound)
+        result = self.solver.solve(stp_file)
+        if os.path.isfile(stp_file): os.remove(stp_file)
+        return result
+
+    def _result_weight(self, result, backend) -> int:
+        characteristic = backend.parse_characteristic(result, self.cipher, self.parameters["rounds"])
+        return characteristic.getWeight()
+
+    def _skip_bound(self, lower, bound):
+        logger.warning(f"Solver returned UNKNOWN for weight <= {bound}, assuming there is no characteristic.")
+        self.unknown_weights.extend(range(lower, bound + 1))
+
+    def _skip_weight(self, weight):
+        logger.warning(f"Solver returned UNKNOWN for weight {weight}, continuing with the next weight.")
+        self.unknown_weights.append(weight)
+
+    def _process_result(self, weight, result, backend=None):
+        backend = backend or self.solver
+        self.characteristic = backend.parse_characteristic(result, self.cipher, self.parameters["rounds"])
+        if self.report:
+            self._report(weight, self.characteristic)
+        return weight
+
+    def _report(self, weight, characteristic):
+        if self.unknown_weights:
+            logger.warning(f"Weights {self.unknown_weights} could not be decided, "
+                           f"the characteristic is not proven to be optimal.")
+        if characteristic.getFractionalWeight() is not None:
+            logger.warning("Some S-box weights are not integers and are rounded down, "
+                           "the minimal weight is a lower bound.")
         
         if self.reporter:
             self.reporter.add_trail(weight, "Found optimal trail", characteristic=characteristic)
@@ -98,4 +257,3 @@ class MinWeightStrategy(SearchStrategy):
         if self.parameters.get("latex"):
             with open(self.parameters["latex"], "w") as f:
                 f.write(characteristic.getTexString())
-        return weight
@@ -4,33 +4,159 @@ import os
 import logging
 import random
 import math
-from typing import Dict, Any, Tuple
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import functools
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 from .base import SearchStrategy
+from .template import write_model, write_parametric_model
 import solvers
+from config import APPROXMC_EPSILON, APPROXMC_DELTA, STOPFRACTION_EPSILON
 
 logger = logging.getLogger("cryptosmt")
 
-def _solve_weight_count_task(cipher, parameters, weight, approxmc):
+def _sat_logfile(parameters, weight):
     """
-    Independent helper for counting solutions in parallel.
+    Log of the model counter, only kept if a directory is given with --satlog.
+    """
+    if not parameters.get("satlog"):
+        return None
+    os.makedirs(parameters["satlog"], exist_ok=True)
+    return os.path.join(parameters["satlog"], f"satlog_w{weight}.log")
+
+def _result(solver, solutions, approxmc):
+    """
+    An approximate count is None if ApproxMC did not finish, e.g. after a
+    timeout. Interrupted exact counts are kept as lower bounds.
+    """
+    if approxmc and not getattr(solver, "count_complete", True):
+        return None
+    return solutions
+
+def _solve_weight_count_task(cipher, parameters, projection, weight, approxmc, progress=None, tolerance=None,
+                             solver=None):
+    """
+    Independent helper for counting solutions in parallel. Characteristics
+    are counted once for every sequence of states, the values of auxiliary
+    variables, e.g. of the weight encoding, are ignored. The projection is
+    given by the caller, as the cipher of a worker does not know its state
+    variables once the model is rendered from a template. A solver can be
+    given to kill the counter with solver.cancel().
     """
     rnd_id = f"{random.randrange(16**10):010x}"
     stp_file = f"tmp/{cipher.name}_w{weight}_{rnd_id}.stp"
-    sat_logfile = f"tmp/satlog_w{weight}_{rnd_id}.tmp"
     
     local_params = parameters.copy()
     local_params["sweight"] = weight
-    cipher.createSTP(stp_file, local_params)
+    write_model(cipher, stp_file, local_params)
     
-    solver = solvers.get_solver(local_params)
-    solutions = solver.solve_and_count(stp_file, sat_logfile, approxmc=approxmc)
+    solver = solver or solvers.get_solver(local_params)
+    solutions = solver.solve_and_count(stp_file, _sat_logfile(parameters, weight), approxmc=approxmc,
+                                       projection=projection, progress=progress, tolerance=tolerance)
     
     if os.path.isfile(stp_file): os.remove(stp_file)
-    if os.path.isfile(sat_logfile): os.remove(sat_logfile)
 
-    return (weight, solutions // 2)
+    return (weight, _result(solver, solutions, approxmc))
+
+def _count_weight_task(parameters, cnf, weight, approxmc, progress=None, tolerance=None, solver=None):
+    """
+    Counts the solutions of one weight on the shared CNF of all weights.
+    """
+    solver = solver or solvers.get_solver(parameters)
+    solutions = solver.count_weight(cnf, weight, _sat_logfile(parameters, weight), approxmc=approxmc,
+                                    progress=progress, tolerance=tolerance)
+    return (weight, _result(solver, solutions, approxmc))
+
+def _bound_weight_task(count, tolerance, weight):
+    """
+    Upper bound on the number of characteristics of the weight from an
+    ApproxMC count with the given tolerance (epsilon, delta), which holds
+    with probability at least 1 - delta. None if ApproxMC did not finish.
+    """
+    _, solutions = count(weight, True, None, tolerance)
+    if solutions is None:
+        return (weight, None)
+    return (weight, math.floor(solutions * (1 + tolerance[0])))
+
+class WeightScheduler(object):
+    """
+    Predicts the number of characteristics of a weight from the counts of
+    the weights done so far. The counts are assumed to grow at most by
+    the factor growth per weight, which is the largest growth seen between
+    two weights with characteristics. The time to count a weight grows with
+    its number of characteristics, so parallel searches start the weight
+    with the largest prediction first.
+    With fraction, every weight is first bounded with add_bound, and it is
+    not counted if 2^-w times its upper bound is below fraction times the
+    probability found so far.
+    """
+
+    def __init__(self, weights, fraction: Optional[float] = None):
+        self.pending = sorted(weights)
+        self.fraction = fraction
+        self.counts: Dict[int, int] = {}
+        self.bounds: Dict[int, float] = {}
+        self.skipped: List[int] = []
+
+    def add(self, weight: int, count: int) -> None:
+        self.counts[weight] = count
+
+    def needs_bound(self, weight: int) -> bool:
+        return self.fraction is not None and weight not in self.bounds
+
+    def add_bound(self, weight: int, upper: Optional[int]) -> None:
+        """
+        Adds the upper bound of a weight returned by next_weight, None if
+        it could not be bounded. The weight is scheduled again.
+        """
+        self.bounds[weight] = math.inf if upper is None else upper
+        self.pending = sorted(self.pending + [weight])
+
+    def skipped_contribution(self) -> float:
+        """
+        Upper bound on the probability of the skipped weights.
+        """
+        return sum(math.pow(2, -weight) * self.bounds[weight] for weight in self.skipped)
+
+    def growth(self) -> Optional[float]:
+        weights = sorted(w for w, count in self.counts.items() if count > 0)
+        if len(weights) < 2:
+            return None
+        return max((self.counts[b] / self.counts[a]) ** (1 / (b - a)) for a, b in zip(weights, weights[1:]))
+
+    def predict(self, weight: int) -> Optional[float]:
+        """
+        Estimate of the number of characteristics of the weight, from
+        the closest weight below it with characteristics. None as long as
+        there are not enough counts.
+        """
+        growth = self.growth()
+        below = [w for w, count in self.counts.items() if count > 0 and w < weight]
+        if growth is None or not below:
+            return None
+        start = max(below)
+        return self.counts[start] * growth ** (weight - start)
+
+    def next_weight(self, probability: float, expensive_first: bool = True) -> Optional[int]:
+        """
+        Removes and returns the next weight to count or to bound, None if
+        all weights are done or skipped. Without predictions, or if
+        expensive_first is not set, the weights are counted from the lowest.
+        """
+        if self.fraction is not None:
+            for weight in list(self.pending):
+                if math.pow(2, -weight) * self.bounds.get(weight, math.inf) < self.fraction * probability:
+                    self.pending.remove(weight)
+                    self.skipped.append(weight)
+        if not self.pending:
+            return None
+        predictions = [(self.predict(weight), weight) for weight in self.pending]
+        if not expensive_first or any(prediction is None for prediction, _ in predictions):
+            weight = self.pending[0]
+        else:
+            weight = max(predictions)[1]
+        self.pending.remove(weight)
+        return weight
 
 class ProbabilityStrategy(SearchStrategy):
     def run(self) -> float:
@@ -50,37 +176,124 @@ class ProbabilityStrategy(SearchStrategy):
         characteristics_found = 0
         weight_results = {}
 
+        cnf, count = self._counter()
+        scheduler = WeightScheduler(weight_range, self.parameters.get("stopfraction"))
+        # Every weight is bounded with this tolerance before it is counted
+        bound = functools.partial(_bound_weight_task, count,
+                                  (STOPFRACTION_EPSILON, APPROXMC_DELTA / max(1, len(weight_range))))
         try:
             if num_threads > 1:
                 with ProcessPoolExecutor(max_workers=num_threads) as executor:
-                    future_to_weight = {executor.submit(_solve_weight_count_task, self.cipher, 
-                                                       self.parameters, w, approxmc): w for w in weight_range}
-                    
-                    for future in as_completed(future_to_weight):
-                        weight, solutions = future.result()
-                        weight_results[weight] = solutions
-                        diff_prob += math.pow(2, -weight) * solutions
-                        characteristics_found += solutions
-                        if self.reporter:
-                            self.reporter.update_weight(weight)
-                            self.reporter.add_trail(weight, f"Found {solutions} trails", count=solutions, prob=diff_prob)
+                    running = {}
+                    while True:
+                        # Only as many weights as workers are started, so the
+                        # next one can be chosen with the counts done so far
+                        while len(running) < num_threads and not self.reached_timelimit():
+                            weight = scheduler.next_weight(diff_prob)
+                            if weight is None:
+                                break
+                            if scheduler.needs_bound(weight):
+                                running[executor.submit(bound, weight)] = True
+                            else:
+                                running[executor.submit(count, weight, approxmc)] = False
+                        if not running:
+                            break
+
+                        done, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            is_bound = running.pop(future)
+                            weight, solutions = future.result()
+                            if is_bound:
+                                scheduler.add_bound(weight, solutions)
+                                continue
+                            if solutions is None:
+                                logger.warning(f"Weight {weight} was not counted.")
+                                continue
+                            scheduler.add(weight, solutions)
+                            weight_results[weight] = solutions
+                            diff_prob += math.pow(2, -weight) * solutions
+                            characteristics_found += solutions
+                            if self.reporter:
+                                self.reporter.update_weight(weight)
+                                self.reporter.add_trail(weight, f"Found {solutions} trails", count=solutions, prob=diff_prob)
             else:
-                for weight in weight_range:
-                    if self.reached_timelimit(): break
+                while not self.reached_timelimit():
+                    weight = scheduler.next_weight(diff_prob, expensive_first=False)
+                    if weight is None:
+                        break
                     if self.reporter: self.reporter.update_weight(weight)
+                    if scheduler.needs_bound(weight):
+                        scheduler.add_bound(*bound(weight))
+                        continue
                     
-                    _, solutions = _solve_weight_count_task(self.cipher, self.parameters, weight, approxmc)
+                    # Solutions found so far are shown while counting
+                    progress = functools.partial(self.reporter.update_count, weight) if self.reporter else None
+                    _, solutions = count(weight, approxmc, progress)
+                    if solutions is None:
+                        logger.warning(f"Weight {weight} was not counted.")
+                        continue
+                    scheduler.add(weight, solutions)
                     weight_results[weight] = solutions
                     diff_prob += math.pow(2, -weight) * solutions
                     characteristics_found += solutions
                     if self.reporter:
                         self.reporter.add_trail(weight, f"Found {solutions} trails", count=solutions, prob=diff_prob)
         finally:
-            pass
+            if cnf is not None and os.path.isfile(cnf.path):
+                os.remove(cnf.path)
 
+        if scheduler.skipped:
+            logger.warning(f"Weights {sorted(scheduler.skipped)} were not counted, each contributes less than "
+                           f"{scheduler.fraction} of the probability and together at most "
+                           f"{scheduler.skipped_contribution():.3g}, with probability at least {1 - APPROXMC_DELTA}.")
         self._print_summary(weight_results, characteristics_found, diff_prob)
         return diff_prob
 
+    def _counter(self):
+        """
+        Returns the CNF of all weights and the function counting the
+        solutions of one weight. All weights are counted on the CNF of the
+        weight-parametric model if the solver supports it, otherwise a model
+        is built per weight and the CNF is None.
+        """
+        cnf = self._write_weight_cnf()
+        if cnf is not None:
+            return cnf, functools.partial(_count_weight_task, self.parameters, cnf)
+        return None, functools.partial(_solve_weight_count_task, self.cipher, self.parameters,
+                                       self._projection())
+
+    def _projection(self) -> Optional[List[str]]:
+        """
+        State variables of the model, the model is generated once if the
+        cipher does not know them yet.
+        """
+        if not self.cipher.state_variables:
+            stp_file = f"tmp/{self.cipher.name}_state_{random.randrange(16**10):010x}.stp"
+            try:
+                self.cipher.createSTP(stp_file, self.parameters.copy())
+            finally:
+                if os.path.isfile(stp_file): os.remove(stp_file)
+        return list(self.cipher.state_variables) or None
+
+    def _write_weight_cnf(self):
+        """
+        Bit-blasts the weight-parametric model once, returns None if the
+        solver or the cipher does not support it.
+        """
+        if not hasattr(self.solver, "write_weight_cnf"):
+            return None
+        rnd_id = f"{random.randrange(16**10):010x}"
+        stp_file = f"tmp/{self.cipher.name}_weights_{rnd_id}.stp"
+        try:
+            write_parametric_model(self.cipher, stp_file, self.parameters)
+            return self.solver.write_weight_cnf(stp_file, f"tmp/{self.cipher.name}_weights_{rnd_id}.cnf",
+                                                self._projection())
+        except ValueError as e:
+            logger.debug(f"Counting every weight on its own model: {e}")
+            return None
+        finally:
+            if os.path.isfile(stp_file): os.remove(stp_file)
+
     def _print_summary(self, weight_results, found, prob):
         if prob > 0:
             # Print summary table only if interactive?
@@ -96,3 +309,151 @@ class ProbabilityStrategy(SearchStrategy):
             logger.info(f"Total Search Time: {self.get_elapsed_time()}s")
         else:
             logger.info(f"No characteristics found. Total Search Time: {self.get_elapsed_time()}s")
+
+def refinement_tolerances(epsilon: float, delta: float, num_weights: int,
+                          coarsest: float = 4.0) -> List[Tuple[float, float]]:
+    """
+    Tolerances (epsilon, delta) of ApproxMC for every weight in the rounds
+    of the anytime estimation. epsilon is halved from coarsest down to the
+    requested one. Every weight of round k is counted with delta / (n 2^k)
+    for n weights, so all counts hold together with probability at least
+    1 - delta.
+    """
+    epsilons = []
+    current = coarsest
+    while current > epsilon:
+        epsilons.append(current)
+        current /= 2
+    epsilons.append(epsilon)
+    return [(eps, delta / (num_weights * 2 ** k)) for k, eps in enumerate(epsilons, 1)]
+
+class ProbabilityInterval(object):
+    """
+    Bounds on the number of characteristics of each weight from approximate
+    counts. A count c with tolerance epsilon bounds the number of
+    characteristics by c / (1 + epsilon) and c (1 + epsilon), each weight
+    keeps the tightest bounds of all its counts. A count of 0 is exact.
+    The bounds hold together with probability at least confidence(), the
+    probability bounds only cover the weights of the estimation.
+    """
+
+    def __init__(self, weights):
+        self.weights = sorted(weights)
+        self.bounds: Dict[int, Tuple[int, int]] = {}
+        self.failure = 0.0
+
+    def add(self, weight: int, count: int, epsilon: float, delta: float) -> None:
+        self.failure += delta
+        if count == 0:
+            self.bounds[weight] = (0, 0)
+            return
+        # The counter only returns 0 for unsatisfiable models, so there is
+        # at least one characteristic
+        lower = max(1, math.ceil(count / (1 + epsilon)))
+        upper = math.floor(count * (1 + epsilon))
+        if weight in self.bounds:
+            previous_lower, previous_upper = self.bounds[weight]
+            if max(lower, previous_lower) <= min(upper, previous_upper):
+                lower, upper = max(lower, previous_lower), min(upper, previous_upper)
+        self.bounds[weight] = (lower, upper)
+
+    def exact(self, weight: int) -> bool:
+        return self.bounds.get(weight) == (0, 0)
+
+    def lower(self) -> float:
+        return sum(math.pow(2, -w) * lower for w, (lower, _) in self.bounds.items())
+
+    def upper(self) -> float:
+        """
+        Upper bound of the probability, infinite as long as a weight was not
+        counted.
+        """
+        if len(self.bounds) < len(self.weights):
+            return math.inf
+        return sum(math.pow(2, -w) * upper for w, (_, upper) in self.bounds.items())
+
+    def confidence(self) -> float:
+        return max(0.0, 1 - self.failure)
+
+    def __str__(self) -> str:
+        def log2(p):
+            if p == 0:
+                return "-inf"
+            return "inf" if p == math.inf else f"{math.log(p, 2):.2f}"
+        return f"[{log2(self.lower())}, {log2(self.upper())}] (log2) with confidence {self.confidence():.3f}"
+
+class AnytimeProbabilityStrategy(ProbabilityStrategy):
+    """
+    Estimates the probability with ApproxMC in rounds of decreasing epsilon.
+    Every round counts all weights, so the interval of the probability
+    covers all weights early and is refined as long as the search runs. The
+    search can be stopped at any time, by the timelimit or with Ctrl-C,
+    which kills the running counters, and returns the lower bound of the
+    interval found so far.
+    """
+    def run(self) -> float:
+        if not hasattr(self.solver, "solve_and_count"):
+            logger.error(f"Solver {type(self.solver).__name__} does not support counting solutions.")
+            return 0.0
+
+        num_threads = self.parameters.get("threads", 1)
+        weights = range(self.parameters["sweight"], self.parameters["endweight"])
+        tolerances = refinement_tolerances(self.parameters.get("epsilon") or APPROXMC_EPSILON,
+                                           self.parameters.get("delta") or APPROXMC_DELTA, len(weights))
+        interval = ProbabilityInterval(weights)
+
+        logger.info(f"Estimating probability for {self.cipher.name} - Rounds: {self.parameters['rounds']} "
+                    f"in {len(tolerances)} rounds of ApproxMC using {num_threads} threads")
+
+        cnf, count = self._counter()
+        try:
+            for epsilon, delta in tolerances:
+                pending = [w for w in weights if not interval.exact(w)]
+                if not pending or self.reached_timelimit():
+                    break
+                if num_threads > 1:
+                    # ApproxMC runs in its own process, every task has its
+                    # own solver to kill it when the search is stopped
+                    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                        running = {}
+                        for w in pending:
+                            solver = self.solver.copy()
+                            running[executor.submit(count, w, True, None, (epsilon, delta), solver)] = solver
+                        try:
+                            for future in as_completed(running):
+                                weight, solutions = future.result()
+                                self._refine(interval, weight, solutions, epsilon, delta)
+                                if self.reached_timelimit():
+                                    break
+                        finally:
+                            for solver in running.values():
+                                solver.cancel()
+                            executor.shutdown(cancel_futures=True)
+                else:
+                    for weight in pending:
+                        if self.reached_timelimit():
+                            break
+                        if self.reporter: self.reporter.update_weight(weight)
+                        _, solutions = count(weight, True, None, (epsilon, delta))
+                        self._refine(interval, weight, solutions, epsilon, delta)
+                logger.info(f"Probability with epsilon {epsilon}: {interval}")
+        except KeyboardInterrupt:
+            logger.info("Estimation interrupted.")
+        finally:
+            if cnf is not None and os.path.isfile(cnf.path):
+                os.remove(cnf.path)
+
+        logger.info(f"Final probability {interval}")
+        logger.info(f"Total Search Time: {self.get_elapsed_time()}s")
+        return interval.lower()
+
+    def _refine(self, interval, weight, solutions, epsilon, delta):
+        # A count which did not finish gives no bounds, the weight is
+        # counted again in the next round
+        if solutions is None:
+            logger.warning(f"ApproxMC did not count weight {weight} with epsilon {epsilon}.")
+            return
+        interval.add(weight, solutions, epsilon, delta)
+        logger.debug(f"Weight {weight}: {solutions} characteristics (epsilon {epsilon}, delta {delta:.2e})")
+        if self.reporter:
+            self.reporter.update_interval(interval.lower(), interval.upper(), interval.confidence())
@@ -0,0 +1,176 @@
+import os
+import re
+import logging
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from cryptanalysis.diffchars import DifferentialCharacteristic
+from .min_weight import MinWeightStrategy
+from . import template
+
+logger = logging.getLogger("cryptosmt")
+
+# Variables of a round, e.g. x3 or w12
+_ROUND_VARIABLE = re.compile(r"(\D+)(\d+)")
+
+
+def _split_name(name: str) -> Optional[Tuple[str, int]]:
+    match = _ROUND_VARIABLE.fullmatch(name)
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def stitch_characteristics(first, second, cipher, rounds: int) -> DifferentialCharacteristic:
+    """
+    Joins a characteristic of the first rounds with a characteristic of the
+    remaining rounds whose input is the output of the first. The round
+    indices of the second characteristic are shifted behind the first.
+    """
+    data = dict(first.characteristic_data)
+    for name, value in second.characteristic_data.items():
+        split = _split_name(name)
+        if split is not None:
+            data[f"{split[0]}{split[1] + first.num_rounds}"] = value
+    weight = first.getWeight() + second.getWeight()
+    return DifferentialCharacteristic(data, cipher, rounds, hex(weight))
+
+
+class StitchStrategy(MinWeightStrategy):
+    """
+    Meet-in-the-middle search for a characteristic of minimal weight. An
+    optimal characteristic for the first half of the rounds is extended by
+    an optimal characteristic for the second half, whose input difference
+    is fixed to the output of the first. The stitched characteristic is
+    optimal if its weight matches the lower bound B_{R1} + B_{R2} of the
+    two halves, otherwise the full model is searched below its weight.
+    """
+    def run(self) -> int:
+        rounds = self.parameters["rounds"]
+        endweight = self.parameters["endweight"]
+        self.unknown_weights = []
+        if rounds < 2:
+            return super().run()
+
+        first_rounds = rounds // 2
+        second_rounds = rounds - first_rounds
+        try:
+            self._state_prefixes()
+            first_fixed, second_fixed = self._split_fixed_variables(first_rounds)
+        except ValueError as e:
+            logger.warning(f"{e} Searching the full model.")
+            return super().run()
+        logger.info(f"Stitching characteristics of {first_rounds} and {second_rounds} rounds")
+
+        weight1, first = self._min_weight(first_rounds, first_fixed, self._round_bound(first_rounds))
+        if first is None:
+            logger.info(f"No characteristic found within limit. Total Search Time: {self.get_elapsed_time()}s")
+            return endweight
+
+        # Lower bound of the second half, without the junction
+        bound2 = self._round_bound(second_rounds)
+        if second_fixed or not bound2:
+            bound2, _ = self._min_weight(second_rounds, second_fixed, bound2)
+
+        junction = dict(second_fixed)
+        for prefix in self._state_prefixes():
+            junction[f"{prefix}0"] = first.characteristic_data[f"{prefix}{first_rounds}"]
+        weight2, second = self._min_weight(second_rounds, junction, bound2)
+
+        lower = max(self.parameters["sweight"], weight1 + bound2)
+        if second is None:
+            logger.info(f"The characteristic of {first_rounds} rounds can not be extended, "
+                        f"searching the full model from weight {lower}")
+            return self._full_search(lower, endweight)
+
+        stitched = stitch_characteristics(first, second, self.cipher, rounds)
+        weight = weight1 + weight2
+        logger.info(f"Stitched characteristic of weight {weight1} + {weight2}, lower bound {lower}")
+        if weight > lower:
+            # The full model is only searched below the stitched weight
+            found = self._full_search(lower, weight, report=False)
+            if found < weight:
+                self._report(found, self.characteristic)
+                return found
+
+        self.characteristic = stitched
+        self._report(weight, stitched)
+        return weight
+
+    def _full_search(self, sweight: int, endweight: int, report: bool = True) -> int:
+        logger.info(f"Searching the full model for weights {sweight} to {endweight - 1}")
+        parameters = self._sub_parameters(self.parameters["rounds"], self.parameters.get("fixedVariables", {}))
+        parameters["sweight"] = sweight
+        parameters["endweight"] = endweight
+        strategy = MinWeightStrategy(self.cipher, parameters, reporter=self.reporter)
+        strategy.report = report
+        weight = strategy.run()
+        self.unknown_weights.extend(strategy.unknown_weights)
+        self.characteristic = strategy.characteristic
+        return weight
+
+    def _min_weight(self, rounds: int, fixed: Dict[str, str], sweight: int):
+        """
+        Minimal weight of a characteristic for the given rounds and fixed
+        variables, and the characteristic. None if none was found.
+        """
+        parameters = self._sub_parameters(rounds, fixed)
+        parameters["sweight"] = sweight
+        strategy = MinWeightStrategy(self.cipher, parameters)
+        strategy.report = False
+        weight = strategy.run()
+        self.unknown_weights.extend(strategy.unknown_weights)
+        return weight, strategy.characteristic
+
+    def _sub_parameters(self, rounds: int, fixed: Dict[str, str]) -> Dict[str, Any]:
+        parameters = self.parameters.copy()
+        parameters["rounds"] = rounds
+        parameters["fixedVariables"] = fixed
+        parameters["stitch"] = False
+        if self.parameters.get("timelimit", -1) != -1:
+            parameters["timelimit"] = max(0, self.parameters["timelimit"] - self.get_elapsed_time())
+        return parameters
+
+    def _round_bound(self, rounds: int) -> int:
+        # Minimal weights of 1, 2, ... rounds given with --roundbounds
+        bounds = self.parameters.get("roundbounds") or []
+        return bounds[rounds - 1] if rounds <= len(bounds) else 0
+
+    def _split_fixed_variables(self, first_rounds: int) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Assigns the fixed variables to the half of the trail they belong to.
+        Variables without round index are fixed in both halves.
+        """
+        first, second = {}, {}
+        for name, value in self.parameters.get("fixedVariables", {}).items():
+            split = _split_name(name)
+            if split is None:
+                first[name] = second[name] = value
+            elif split[1] < first_rounds:
+                first[name] = value
+            else:
+                second[f"{split[0]}{split[1] - first_rounds}"] = value
+                if split[1] == first_rounds and split[0] in self._state_prefixes():
+                    first[name] = value
+        return first, second
+
+    def _state_prefixes(self) -> List[str]:
+        """
+        Names of the state vectors which hold the difference between two
+        rounds, e.g. x and y for x0, ..., xR. Taken from a model of a
+        single round, in which they have indices 0 and 1.
+        """
+        if getattr(self, "_prefixes", None) is None:
+            parameters = self._sub_parameters(1, {})
+            stp_file = f"tmp/{self.cipher.name}_stitch_{random.randrange(16**8):08x}.stp"
+            with template._lock:
+                try:
+                    self.cipher.createSTP(stp_file, parameters)
+                finally:
+                    if os.path.isfile(stp_file): os.remove(stp_file)
+                state = set(self.cipher.state_variables)
+            self._prefixes = sorted(name[:-1] for name in state if name.endswith("0") and f"{name[:-1]}1" in state)
+            if not self._prefixes:
+                raise ValueError(f"{self.cipher.name} does not declare its state variables, "
+                                 f"characteristics can not be stitched.")
+        return self._prefixes
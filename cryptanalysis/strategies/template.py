@@ -0,0 +1,142 @@
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from parser import stpcommands
+
+logger = logging.getLogger("cryptosmt")
+
+# Maximum number of templates kept in memory
+MAX_TEMPLATES = 8
+
+# Templates of the current process by parameter set. Worker processes of
+# the parallel strategies build their own templates.
+_templates: Dict[str, Optional["ModelTemplate"]] = {}
+# Weight-parametric models by parameter set, see write_bounded_model and
+# write_parametric_model
+_parametric: Dict[str, "ModelTemplate"] = {}
+# createSTP keeps state in the cipher object, models are written by one
+# thread at a time
+_lock = threading.Lock()
+
+
+class ModelTemplate:
+    """
+    Weight-independent part of a STP model. The models for different
+    weights only differ in the assertion on the weight variable, which
+    is inserted between prefix and suffix.
+    """
+    def __init__(self, prefix: str, suffix: str, weight: int):
+        self.prefix = prefix
+        self.suffix = suffix
+        # Weight of the model the template was taken from
+        self.weight = weight
+        # Set once the template reproduced a model of another weight
+        self.verified = False
+
+    @classmethod
+    def from_model(cls, model: str, weight: int) -> Optional["ModelTemplate"]:
+        """
+        Splits a model at its weight assertion. Returns None if the model
+        does not contain exactly one assertion for the given weight.
+        """
+        assertion = stpcommands.getWeightAssertion(weight) + "\n"
+        if model.count(assertion) != 1:
+            return None
+        prefix, suffix = model.split(assertion)
+        return cls(prefix, suffix, weight)
+
+    def render(self, weight: int) -> str:
+        return self.render_assertion(stpcommands.getWeightAssertion(weight))
+
+    def render_assertion(self, assertion: str) -> str:
+        return self.prefix + assertion + "\n" + self.suffix
+
+
+def _template_key(cipher, parameters: Dict[str, Any]) -> str:
+    items = sorted((key, value) for key, value in parameters.items() if key != "sweight")
+    return cipher.name + repr(items)
+
+
+def write_model(cipher, stp_file: str, parameters: Dict[str, Any]) -> None:
+    """
+    Writes the model for parameters["sweight"] to stp_file. The first
+    model of a parameter set is generated with createSTP and used as
+    template. It is checked against the generated model of a second
+    weight, afterwards the models of all weights are rendered from the
+    template. Models with weight-dependent constraints apart from the
+    weight assertion, e.g. the sorter encoding, are always generated.
+    """
+    with _lock:
+        _write_model(cipher, stp_file, parameters)
+
+
+def _write_model(cipher, stp_file: str, parameters: Dict[str, Any]) -> None:
+    weight = parameters.get("sweight")
+    key = _template_key(cipher, parameters)
+    template = _templates.get(key)
+    if weight is not None and template is not None and template.verified:
+        with open(stp_file, "w") as f:
+            f.write(template.render(weight))
+        return
+
+    cipher.createSTP(stp_file, parameters)
+    if weight is None or (key in _templates and template is None):
+        return
+
+    with open(stp_file, "r") as f:
+        model = f.read()
+    if template is None:
+        if len(_templates) >= MAX_TEMPLATES:
+            del _templates[next(iter(_templates))]
+        _templates[key] = ModelTemplate.from_model(model, weight)
+    elif template.weight != weight:
+        template.verified = template.render(weight) == model
+        if not template.verified:
+            logger.debug(f"The model of {cipher.name} depends on the weight, not using a template.")
+            _templates[key] = None
+
+
+def write_bounded_model(cipher, stp_file: str, parameters: Dict[str, Any], bound: int) -> None:
+    """
+    Writes the model with the assertion weight <= bound to stp_file. The
+    weight-parametric model is generated once per parameter set and the
+    bound is inserted before its query.
+    """
+    with _lock:
+        _write_bounded_model(cipher, stp_file, parameters, bound)
+
+
+def _write_bounded_model(cipher, stp_file: str, parameters: Dict[str, Any], bound: int) -> None:
+    template = _parametric_template(cipher, stp_file, parameters)
+    with open(stp_file, "w") as f:
+        f.write(template.render_assertion(stpcommands.getWeightBoundAssertion(bound)))
+
+
+def write_parametric_model(cipher, stp_file: str, parameters: Dict[str, Any]) -> None:
+    """
+    Writes the weight-parametric model, in which the weight variable is
+    not constrained, to stp_file.
+    """
+    with _lock:
+        template = _parametric_template(cipher, stp_file, parameters)
+        with open(stp_file, "w") as f:
+            f.write(template.prefix + template.suffix)
+
+
+def _parametric_template(cipher, stp_file: str, parameters: Dict[str, Any]) -> ModelTemplate:
+    # The weight-parametric model is generated once per parameter set
+    key = _template_key(cipher, parameters)
+    if key not in _parametric:
+        local_params = parameters.copy()
+        local_params["sweight"] = None
+        cipher.createSTP(stp_file, local_params)
+        with open(stp_file, "r") as f:
+            model = f.read()
+        if "weight: BITVECTOR(16);" not in model or model.count("QUERY(") != 1:
+            raise ValueError(f"{cipher.name} does not provide a weight-parametric model.")
+        prefix, suffix = model.split("QUERY(")
+        if len(_parametric) >= MAX_TEMPLATES:
+            del _parametric[next(iter(_parametric))]
+        _parametric[key] = ModelTemplate(prefix, "QUERY(" + suffix, None)
+    return _parametric[key]
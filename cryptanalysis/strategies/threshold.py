@@ -0,0 +1,69 @@
+import time
+import logging
+
+from config import PDDT_DIRECTORY, PDDT_THRESHOLD, THRESHOLD_SEARCH_TIME
+from cryptanalysis.threshold import ThresholdSearch, getARXRound, loadPDDT
+from cryptanalysis import roundbounds
+from .min_weight import MinWeightStrategy
+
+logger = logging.getLogger("cryptosmt")
+
+
+class ThresholdStrategy(MinWeightStrategy):
+    """
+    Searches a characteristic of minimal weight with the threshold search
+    for ARX ciphers. If its result is not proven to be optimal, the solver
+    searches the weights below it, the characteristic of the threshold
+    search is the upper bound. Only available for Speck and SPECKEY, the
+    other ciphers and constrained models are searched with the solver.
+    """
+    def run(self) -> int:
+        self.unknown_weights = []
+        try:
+            round_function = getARXRound(self.cipher, self.parameters)
+        except ValueError as e:
+            logger.warning(f"{e} Using the solver.")
+            return super().run()
+        if self.parameters.get("fixedVariables") or self.parameters.get("blockedCharacteristics") or \
+                self.parameters.get("iterative"):
+            logger.warning("The threshold search does not support constraints, using the solver.")
+            return super().run()
+
+        threshold = self.parameters.get("pddtthreshold") or PDDT_THRESHOLD
+        pddt = loadPDDT(round_function.n, threshold, PDDT_DIRECTORY)
+        deadline = time.time() + THRESHOLD_SEARCH_TIME
+        if self.parameters.get("deadline"):
+            deadline = min(deadline, self.parameters["deadline"])
+
+        logger.info(f"Starting threshold search with a pDDT of {len(pddt)} transitions")
+        search = ThresholdSearch(round_function, pddt, threshold, deadline)
+        # Known minimal weights of fewer rounds are not searched again
+        bounds = self.parameters.get("roundbounds") or []
+        search.bounds = list(bounds[:roundbounds.known_rounds(bounds)])
+        rounds = self.parameters["rounds"]
+        if self.reporter:
+            self.reporter.update_weight(self.parameters["sweight"])
+        weight, trail = search.search(rounds, self.parameters["sweight"], self.parameters["endweight"])
+        if weight is None:
+            logger.info("The threshold search found no characteristic, using the solver.")
+            return super().run()
+
+        characteristic = search.getCharacteristic(trail, self.cipher)
+        if not search.exact:
+            logger.info(f"Threshold search found a characteristic of weight {weight}, "
+                        f"searching the weights below with the solver")
+            parameters, report = self.parameters, self.report
+            self.parameters, self.report = dict(parameters, endweight=weight), False
+            try:
+                found = super().run()
+            finally:
+                self.parameters, self.report = parameters, report
+            if found < weight:
+                if self.report:
+                    self._report(found, self.characteristic)
+                return found
+
+        self.characteristic = characteristic
+        if self.report:
+            self._report(weight, characteristic)
+        return weight
@@ -0,0 +1,318 @@
+'''
+Threshold search of Biryukov and Velichkov for differential
+characteristics of ARX ciphers, with a partial DDT (pDDT) of the modular
+addition which is cached on disk.
+'''
+
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from cryptanalysis.diffchars import DifferentialCharacteristic
+
+logger = logging.getLogger("cryptosmt")
+
+
+def _mask(n: int) -> int:
+    return (1 << n) - 1
+
+
+def xdpAddWeight(a: int, b: int, c: int, n: int) -> Optional[int]:
+    """
+    Weight -log2 of the probability that the input differences a, b of
+    the addition modulo 2^n give the output difference c, by Lipmaa and
+    Moriai. None if the transition is not possible. The weight is the
+    same as in the SMT model, see stpcommands.getStringAdd.
+    """
+    mask = _mask(n)
+    a2, b2, c2 = (a << 1) & mask, (b << 1) & mask, (c << 1) & mask
+    eq2 = ~(a2 ^ b2) & ~(a2 ^ c2) & mask
+    if eq2 & (a ^ b ^ c ^ b2):
+        return None
+    eq = ~(a ^ b) & ~(a ^ c) & _mask(n - 1)
+    return bin(~eq & _mask(n - 1)).count("1")
+
+
+def _weights(a: np.ndarray, b: np.ndarray, c: np.ndarray, n: int) -> np.ndarray:
+    """
+    xdpAddWeight for arrays of n-bit differences, -1 for transitions which
+    are not possible.
+    """
+    mask = np.uint64(_mask(n))
+    one = np.uint64(1)
+    a2, b2, c2 = (a << one) & mask, (b << one) & mask, (c << one) & mask
+    eq2 = ~(a2 ^ b2) & ~(a2 ^ c2) & mask
+    valid = (eq2 & (a ^ b ^ c ^ b2)) == 0
+    neq = ~(~(a ^ b) & ~(a ^ c)) & np.uint64(_mask(n - 1))
+    return np.where(valid, _popcount(neq, n - 1), -1)
+
+
+def _popcount(values: np.ndarray, bits: int) -> np.ndarray:
+    counts = np.zeros(len(values), dtype=np.int64)
+    for bit in range(bits):
+        counts += ((values >> np.uint64(bit)) & np.uint64(1)).astype(np.int64)
+    return counts
+
+
+def buildPDDT(n: int, threshold: int) -> np.ndarray:
+    """
+    All transitions (a, b, c) of the addition modulo 2^n with weight at
+    most threshold, as rows (a, b, c, weight) sorted by weight. The
+    transitions are extended from the least significant bit. The weight
+    of the lower k bits never exceeds the weight of all bits, so prefixes
+    above the threshold are dropped.
+    """
+    prefixes = np.zeros((1, 3), dtype=np.uint64)
+    for k in range(1, n + 1):
+        bits = np.array([[(i >> 2) & 1, (i >> 1) & 1, i & 1] for i in range(8)], dtype=np.uint64)
+        extended = (prefixes[:, None, :] | (bits[None, :, :] << np.uint64(k - 1))).reshape(-1, 3)
+        weights = _weights(extended[:, 0], extended[:, 1], extended[:, 2], k)
+        keep = (weights >= 0) & (weights <= threshold)
+        prefixes = extended[keep]
+        weights = weights[keep]
+    table = np.column_stack([prefixes.astype(np.int64), weights])
+    # The zero transition is not part of a characteristic
+    table = table[(table[:, 0] != 0) | (table[:, 1] != 0)]
+    return table[np.lexsort((table[:, 2], table[:, 1], table[:, 0], table[:, 3]))]
+
+
+def loadPDDT(n: int, threshold: int, directory: Optional[str]) -> np.ndarray:
+    """
+    pDDT of buildPDDT, which is cached in directory by wordsize and
+    threshold.
+    """
+    if directory is None:
+        return buildPDDT(n, threshold)
+    path = os.path.join(directory, f"pddt_n{n}_t{threshold}.npy")
+    if os.path.isfile(path):
+        return np.load(path)
+    start = time.time()
+    table = buildPDDT(n, threshold)
+    logger.info(f"Built pDDT with {len(table)} entries for n={n}, threshold {threshold} "
+                f"in {time.time() - start:.2f}s")
+    os.makedirs(directory, exist_ok=True)
+    # Written to a temporary file first, parallel searches may build the same table
+    tmp_path = f"{path}.{os.getpid()}.npy"
+    np.save(tmp_path, table)
+    os.replace(tmp_path, path)
+    return table
+
+
+class SpeckRound(object):
+    """
+    Differential round of Speck: x' = (x >>> alpha) + y and
+    y' = (y <<< beta) ^ x'.
+    """
+
+    def __init__(self, n: int, alpha: int, beta: int, format_string=('x', 'y', 'w')):
+        self.n = n
+        self.alpha = alpha
+        self.beta = beta
+        # Names of the two words of the state and the weight
+        self.format_string = format_string
+
+    def rotl(self, value, rotation: int):
+        # Also used for arrays of differences
+        rotation %= self.n
+        if isinstance(value, np.ndarray):
+            return ((value << np.uint64(rotation)) | (value >> np.uint64(self.n - rotation))) & \
+                np.uint64(_mask(self.n))
+        return ((value << rotation) | (value >> (self.n - rotation))) & _mask(self.n)
+
+    def rotr(self, value, rotation: int):
+        return self.rotl(value, self.n - rotation)
+
+    def addition_inputs(self, x: int, y: int) -> Tuple[int, int]:
+        return self.rotr(x, self.alpha), y
+
+    def state(self, a: int, b: int) -> Tuple[int, int]:
+        # Input state of a round with the addition inputs a and b
+        return self.rotl(a, self.alpha), b
+
+    def next_state(self, y: int, c: int) -> Tuple[int, int]:
+        return c, self.rotl(y, self.beta) ^ c
+
+
+def getARXRound(cipher, parameters) -> SpeckRound:
+    """
+    Round description of Speck or SPECKEY, with the rotation constants of
+    the cipher model.
+    """
+    if cipher.name not in ("speck", "speckey"):
+        raise ValueError(f"{cipher.name} is not supported by the threshold search.")
+    wordsize = parameters["wordsize"]
+    if cipher.name == "speck" and wordsize != 16:
+        alpha, beta = 8, 3
+    else:
+        alpha, beta = 7, 2
+    if parameters.get("rotationconstants"):
+        alpha, beta = parameters["rotationconstants"][:2]
+    return SpeckRound(wordsize, alpha, beta, cipher.getFormatString())
+
+
+class ThresholdSearch(object):
+    """
+    Threshold search for differential characteristics of minimal weight.
+    The transitions of the first round, in which the input differences are
+    free, are taken from the pDDT. In the following rounds the inputs of
+    the addition are fixed and the outputs are searched bit by bit. As in
+    Matsui's algorithm, the characteristic is only extended while its
+    weight plus the minimal weight B_(r-i) of the remaining rounds is
+    within the threshold, which is increased until a characteristic is
+    found.
+
+    If the weight left for the first round never exceeds the threshold of
+    the pDDT, no transition is missed and the weights are exact. Otherwise
+    they are upper bounds, which are also used as B_(r-i), and exact is
+    False.
+    """
+
+    def __init__(self, round_function: SpeckRound, pddt: np.ndarray, pddt_threshold: int,
+                 deadline: Optional[float] = None):
+        self.round = round_function
+        self.pddt = pddt
+        self.pddt_threshold = pddt_threshold
+        self.deadline = deadline
+        # Minimal weights B_1, B_2, ... found so far, and whether they are exact
+        self.bounds: List[int] = []
+        self.exact = True
+
+    def findMinimalWeights(self, rounds: int) -> List[int]:
+        while len(self.bounds) < rounds:
+            weight, _ = self.search(len(self.bounds) + 1)
+            if weight is None:
+                break
+        return self.bounds
+
+    def search(self, rounds: int, start: int = 0, end: Optional[int] = None):
+        """
+        Weight of the characteristic of the given rounds and the
+        characteristic as list of (x, y, weight) of each round, with the
+        output difference as last entry. Returns (None, None) if there is
+        no characteristic below end, or if the deadline is reached.
+        """
+        if len(self.bounds) < rounds - 1:
+            self.findMinimalWeights(rounds - 1)
+            if len(self.bounds) < rounds - 1:
+                return None, None
+
+        threshold = max(start, self._lower_bound(rounds))
+        while end is None or threshold < end:
+            self.nodes = 0
+            self.truncated = False
+            trail = self._search_round_1(rounds, threshold)
+            if trail is not None:
+                weight = sum(round_weight for _, _, round_weight in trail)
+                if len(self.bounds) == rounds - 1 and start <= self._lower_bound(rounds):
+                    self.bounds.append(weight)
+                return weight, trail
+            if self._reached_deadline():
+                break
+            # A characteristic of this weight may be missed
+            if self.truncated:
+                self.exact = False
+            threshold += 1
+        return None, None
+
+    def _lower_bound(self, rounds: int) -> int:
+        if rounds == 1:
+            return 0
+        return max(self._bound(i) + self._bound(rounds - i) for i in range(1, rounds))
+
+    def _bound(self, rounds: int) -> int:
+        if rounds == 0:
+            return 0
+        return self.bounds[rounds - 1]
+
+    def _limit(self, budget: int) -> int:
+        if budget > self.pddt_threshold:
+            self.truncated = True
+            return self.pddt_threshold
+        return budget
+
+    def _reached_deadline(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def _search_round_1(self, rounds: int, threshold: int):
+        budget = self._limit(threshold - self._bound(rounds - 1))
+        candidates = self.pddt[self.pddt[:, 3] <= budget]
+        if rounds > 1:
+            # Lower bound on the weight of the second round, see _search_round_i
+            a, b, c = (candidates[:, j].astype(np.uint64) for j in range(3))
+            a2, b2 = self.round.addition_inputs(*self.round.next_state(b, c))
+            second = _popcount(a2 ^ b2, self.round.n - 1)
+            candidates = candidates[candidates[:, 3] + second + self._bound(rounds - 2) <= threshold]
+        for a, b, c, weight in candidates.tolist():
+            x, y = self.round.state(a, b)
+            if rounds == 1:
+                return [(x, y, weight)] + [self.round.next_state(y, c) + (0,)]
+            trail = self._search_round_i(2, rounds, *self.round.next_state(y, c), weight, threshold)
+            if trail is not None:
+                return [(x, y, weight)] + trail
+            if self._reached_deadline():
+                return None
+        return None
+
+    def _search_round_i(self, i: int, rounds: int, x: int, y: int, weight: int, threshold: int):
+        self.nodes += 1
+        if self.nodes % 1024 == 0 and self._reached_deadline():
+            return None
+        a, b = self.round.addition_inputs(x, y)
+        budget = threshold - weight - self._bound(rounds - i)
+        # Every bit below the MSB in which a and b differ adds to the weight
+        if bin((a ^ b) & _mask(self.round.n - 1)).count("1") > budget:
+            return None
+        for c, round_weight in self._outputs(a, b, budget):
+            if i == rounds:
+                return [(x, y, round_weight)] + [self.round.next_state(y, c) + (0,)]
+            trail = self._search_round_i(i + 1, rounds, *self.round.next_state(y, c),
+                                         weight + round_weight, threshold)
+            if trail is not None:
+                return [(x, y, round_weight)] + trail
+        return None
+
+    def _outputs(self, a: int, b: int, budget: int):
+        """
+        Yields the output differences c of the addition with the inputs a
+        and b, and their weight, if it is at most budget. The bits of c are
+        chosen from the least significant bit. If a, b and c are equal in
+        bit k - 1, bit k of c is fixed to a ^ b ^ b_(k-1), otherwise both
+        values are possible and bit k - 1 adds one to the weight.
+        """
+        n = self.round.n
+        if budget < 0:
+            return
+        stack = [(0, 0, 0, True, 0)]
+        while stack:
+            k, c, weight, equal, carry = stack.pop()
+            if k == n:
+                yield c, weight
+                continue
+            if not equal:
+                weight += 1
+                if weight > budget:
+                    continue
+            a_k, b_k = (a >> k) & 1, (b >> k) & 1
+            choices = (a_k ^ b_k ^ carry,) if equal else (0, 1)
+            for c_k in choices:
+                # The MSB is yielded before its weight is added
+                stack.append((k + 1, c | (c_k << k), weight, a_k == b_k == c_k, b_k))
+
+    def getCharacteristic(self, trail, cipher) -> DifferentialCharacteristic:
+        """
+        Characteristic in the variables of the cipher model. The weight of
+        a round is given by the number of bits set in its weight variable.
+        """
+        left, right, weight_name = self.round.format_string
+        digits = (self.round.n + 3) // 4
+        data = {}
+        for r, (x, y, weight) in enumerate(trail):
+            data[f"{left}{r}"] = "0x" + hex(x)[2:].zfill(digits)
+            data[f"{right}{r}"] = "0x" + hex(y)[2:].zfill(digits)
+            if r + 1 < len(trail):
+                data[f"{weight_name}{r}"] = "0x" + hex((1 << weight) - 1)[2:].zfill(digits)
+        total = sum(weight for _, _, weight in trail)
+        return DifferentialCharacteristic(data, cipher, len(trail) - 1, hex(total))
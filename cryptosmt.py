@@ -7,13 +7,14 @@ Created on Mar 28, 2014
 # Structured configuration refactoring
 from cryptanalysis import search
 import ciphers
-from config import PATH_STP, PATH_CRYPTOMINISAT, PATH_BOOLECTOR, PATH_BITWUZLA, PATH_CVC5
+from config import PATH_STP, PATH_CRYPTOMINISAT, PATH_BOOLECTOR, PATH_BITWUZLA, PATH_CVC5, PATH_APPROXMC
 
 from argparse import ArgumentParser, RawTextHelpFormatter
 from dataclasses import dataclass, field, asdict
 from typing import Dict, List, Optional, Any
 
 import yaml
+import importlib.util
 import os
 import shutil
 import logging
@@ -34,17 +35,38 @@ class ToolParameters:
     sweight: int = 0
     endweight: int = 1000
     iterative: bool = False
+    incremental: bool = False
+    bisect: bool = False
+    stitch: bool = False
+    branchbound: bool = False
+    thresholdsearch: bool = False
+    pddtthreshold: Optional[int] = None
     boolector: bool = False
     bitwuzla: bool = False
     cvc5: bool = False
     stp: bool = False
+    portfolio: bool = False
+    inprocess: bool = False
+    pysat: bool = False
+    cryptominisat: bool = False
     approxmc: bool = False
+    satlog: Optional[str] = None
+    stopfraction: Optional[float] = None
+    anytime: bool = False
+    epsilon: Optional[float] = None
+    delta: Optional[float] = None
     weightencoding: str = "bvplus"
+    roundbounds: Optional[List[int]] = None
+    boundsfile: Optional[str] = None
     threads: int = 1
     dot: Optional[str] = None
     latex: Optional[str] = None
     nummessages: int = 1
     timelimit: int = -1
+    solvertimeout: Optional[float] = None
+    solvermemory: Optional[int] = None
+    cachedir: Optional[str] = None
+    cachesize: Optional[int] = None
     fixedVariables: Dict[str, str] = field(default_factory=dict)
     blockedCharacteristics: List[Any] = field(default_factory=list)
     rotationconstants: Optional[List[int]] = None
@@ -104,7 +126,7 @@ def startsearch(params: ToolParameters):
 
     return
 
-def checkenviroment():
+def checkenviroment(params: ToolParameters):
     """
     Basic checks if the enviroment is set up correctly
     """
@@ -112,9 +134,30 @@ def checkenviroment():
     if not os.path.exists("./tmp/"):
         os.makedirs("./tmp/")
 
+    # STP is only required if it is used as solver, the other backends
+    # read the SMT-LIB2 translation of the model directly. The portfolio
+    # races all solvers which are installed.
+    uses_stp = not params.portfolio and \
+        (params.stp or not (params.bitwuzla or params.boolector or params.cvc5 or params.pysat or
+                         params.cryptominisat or params.branchbound))
     if not os.path.exists(PATH_STP):
-        logger.error(f"Could not find STP binary at {PATH_STP}, please check config.py")
-        exit()
+        if uses_stp:
+            logger.error(f"Could not find STP binary at {PATH_STP}, please check config.py")
+            exit()
+        logger.warning(f"Could not find STP binary at {PATH_STP}, \"--stp\" option not available.")
+
+    # The Python bindings of the in-process solvers are optional
+    bindings = []
+    if params.pysat:
+        bindings.append("pysat")
+    if params.inprocess and params.bitwuzla:
+        bindings.append("bitwuzla")
+    if params.inprocess and params.cvc5:
+        bindings.append("cvc5")
+    for module in bindings:
+        if importlib.util.find_spec(module) is None:
+            logger.error(f"Could not import the Python module {module}, please install its bindings.")
+            exit()
 
     if not os.path.exists(PATH_CRYPTOMINISAT):
         logger.warning(f"Could not find CRYPTOMINISAT binary at {PATH_CRYPTOMINISAT}, please check config.py.")
@@ -130,6 +173,12 @@ def checkenviroment():
         if shutil.which(PATH_CVC5) is None:
             logger.warning(f"Could not find CVC5 binary at {PATH_CVC5}, \"--cvc5\" option not available.")
 
+    # The weights are bounded with ApproxMC before they are skipped
+    if params.stopfraction is not None and not os.path.exists(PATH_APPROXMC) and shutil.which(PATH_APPROXMC) is None:
+        logger.warning(f"Could not find APPROXMC binary at {PATH_APPROXMC}, \"--stopfraction\" is ignored "
+                       f"and all weights are counted.")
+        params.stopfraction = None
+
     return
 
 
@@ -193,9 +242,39 @@ def loadparameters(args) -> ToolParameters:
     if args.timelimit is not None:
         params.timelimit = args.timelimit[0]
 
+    if args.solvertimeout is not None:
+        params.solvertimeout = args.solvertimeout[0]
+
+    if args.solvermemory is not None:
+        params.solvermemory = args.solvermemory[0]
+
+    if args.cachedir is not None:
+        params.cachedir = args.cachedir[0]
+
+    if args.cachesize is not None:
+        params.cachesize = args.cachesize[0]
+
     if args.iterative:
         params.iterative = args.iterative
 
+    if args.incremental:
+        params.incremental = args.incremental
+
+    if args.bisect:
+        params.bisect = args.bisect
+
+    if args.stitch:
+        params.stitch = args.stitch
+
+    if args.branchbound:
+        params.branchbound = args.branchbound
+
+    if args.thresholdsearch:
+        params.thresholdsearch = args.thresholdsearch
+
+    if args.pddtthreshold is not None:
+        params.pddtthreshold = args.pddtthreshold
+
     if args.boolector:
         params.boolector = args.boolector
 
@@ -208,12 +287,45 @@ def loadparameters(args) -> ToolParameters:
     if args.stp:
         params.stp = args.stp
 
+    if args.portfolio:
+        params.portfolio = args.portfolio
+
+    if args.inprocess:
+        params.inprocess = args.inprocess
+
+    if args.pysat:
+        params.pysat = args.pysat
+
+    if args.cryptominisat:
+        params.cryptominisat = args.cryptominisat
+
     if args.approxmc:
         params.approxmc = args.approxmc
 
+    if args.satlog is not None:
+        params.satlog = args.satlog[0]
+
+    if args.stopfraction is not None:
+        params.stopfraction = args.stopfraction
+
+    if args.anytime:
+        params.anytime = args.anytime
+
+    if args.epsilon is not None:
+        params.epsilon = args.epsilon
+
+    if args.delta is not None:
+        params.delta = args.delta
+
     if args.weightencoding:
         params.weightencoding = args.weightencoding
 
+    if args.roundbounds is not None:
+        params.roundbounds = args.roundbounds
+
+    if args.boundsfile is not None:
+        params.boundsfile = args.boundsfile[0]
+
     if args.threads is not None:
         params.threads = args.threads[0]
 
@@ -278,8 +390,37 @@ def main():
                         "4 = determine the probability of the differential\n")
     parser.add_argument('--timelimit', nargs=1, type=int,
                         help="Set a timelimit for the search in seconds.")
+    parser.add_argument('--solvertimeout', nargs=1, type=float,
+                        help="Stop a single solver call after this many seconds.")
+    parser.add_argument('--solvermemory', nargs=1, type=int,
+                        help="Memory limit of a single solver process in MB.")
+    parser.add_argument('--cachedir', nargs=1,
+                        help="Directory of a persistent cache for solver results.")
+    parser.add_argument('--cachesize', nargs=1, type=int,
+                        help="Maximum size of the result cache in MB.")
     parser.add_argument('--iterative', action="store_true",
                         help="Only search for iterative characteristics")
+    parser.add_argument('--incremental', action="store_true",
+                        help="Keep one solver process alive and check each weight\n"
+                             "with push/pop instead of restarting the solver.")
+    parser.add_argument('--bisect', action="store_true",
+                        help="Search the minimal weight with weight <= W queries,\n"
+                             "doubling W until a characteristic is found and then\n"
+                             "bisecting, instead of checking every weight.")
+    parser.add_argument('--stitch', action="store_true",
+                        help="Join optimal characteristics of the two halves of the\n"
+                             "rounds, and only search the full model if the joined\n"
+                             "characteristic is not proven to be optimal.")
+    parser.add_argument('--branchbound', action="store_true",
+                        help="Search the minimal weight with Matsui's branch-and-bound\n"
+                             "algorithm instead of a solver (PRESENT, GIFT, Rectangle).")
+    parser.add_argument('--thresholdsearch', action="store_true",
+                        help="Search the minimal weight with the threshold search for\n"
+                             "ARX ciphers (Speck, SPECKEY), the solver only checks the\n"
+                             "weights below its result if it is not proven optimal.")
+    parser.add_argument('--pddtthreshold', type=int,
+                        help="Maximum weight of the transitions in the partial DDT of\n"
+                             "the threshold search (default PDDT_THRESHOLD in config.py).")
     parser.add_argument('--boolector', action="store_true",
                         help="Use boolector to find solutions")
     parser.add_argument('--bitwuzla', action="store_true",
@@ -288,10 +429,41 @@ def main():
                         help="Use cvc5 to find solutions")
     parser.add_argument('--stp', action="store_true",
                         help="Use STP to find solutions (default)")
+    parser.add_argument('--portfolio', action="store_true",
+                        help="Race all installed solvers on each query and use\n"
+                             "the first answer.")
+    parser.add_argument('--inprocess', action="store_true",
+                        help="Run --bitwuzla or --cvc5 through their Python bindings\n"
+                             "instead of starting a solver process.")
+    parser.add_argument('--pysat', action="store_true",
+                        help="Bit-blast the model and solve it with PySAT.")
+    parser.add_argument('--cryptominisat', action="store_true",
+                        help="Bit-blast the model and solve the CNF with CryptoMiniSat.")
     parser.add_argument('--approxmc', action="store_true",
                         help="Use ApproxMC for model counting in Mode 4.")
-    parser.add_argument('--weightencoding', choices=['bvplus', 'sorter', 'totalizer'], 
+    parser.add_argument('--satlog', nargs=1,
+                        help="Keep the output of the model counter, including all\n"
+                             "solutions, in this directory (Mode 4).")
+    parser.add_argument('--stopfraction', type=float,
+                        help="Do not count weights whose contribution is below this\n"
+                             "fraction of the probability found, by an upper bound\n"
+                             "from a coarse ApproxMC count (Mode 4).")
+    parser.add_argument('--anytime', action="store_true",
+                        help="Estimate the probability with ApproxMC in rounds of\n"
+                             "decreasing tolerance and report bounds on it (Mode 4).")
+    parser.add_argument('--epsilon', type=float,
+                        help="Tolerance of the last round of --anytime.")
+    parser.add_argument('--delta', type=float,
+                        help="Probability that the bounds of --anytime are wrong.")
+    parser.add_argument('--weightencoding', choices=['bvplus', 'sorter', 'totalizer', 'seqcounter', 'matsui'],
                         default='bvplus', help="Encoding used for weight computation.")
+    parser.add_argument('--roundbounds', nargs='+', type=int,
+                        help="Minimum weights B_1, B_2, ... of 1, 2, ... rounds.\n"
+                             "Any i consecutive rounds of a characteristic weigh\n"
+                             "at least B_i.")
+    parser.add_argument('--boundsfile', nargs=1,
+                        help="Save the minimum weights found in Mode 1 to this file,\n"
+                             "and continue after the last round in it.")
     parser.add_argument('--threads', nargs=1, type=int, default=[1],
                         help="Number of threads to use for parallel search.")
     parser.add_argument('--inputfile', nargs=1, help="Use an yaml input file to"
@@ -321,7 +493,7 @@ def main():
         logging.basicConfig(level=log_level, format='INFO: %(message)s')
 
     # Check if enviroment is setup correctly.
-    checkenviroment()
+    checkenviroment(params)
 
     # Start the solver
     startsearch(params)
@@ -0,0 +1,357 @@
+'''
+Bit-blasting of SMT-LIB2 models into CNF, used by the SAT backends.
+'''
+
+import re
+from typing import Dict, List, Optional, Union
+
+_SEXPR_TOKEN = re.compile(r"\(|\)|[^\s()]+")
+
+# A formula is a single literal, a bit vector a list of literals with the
+# least significant bit first.
+Literal = int
+BitVector = List[int]
+
+
+def parseSExpressions(text: str) -> List[Union[str, list]]:
+    """
+    Parses a sequence of s-expressions into nested lists of atoms.
+    """
+    stack = [[]]
+    for token in _SEXPR_TOKEN.findall(text):
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            expression = stack.pop()
+            stack[-1].append(expression)
+        else:
+            stack[-1].append(token)
+    return stack[0]
+
+
+class CNFBuilder(object):
+    """
+    Bit-blasts SMT-LIB2 models, as produced by smtlib2.translate, into
+    clauses. Gates are shared by structural hashing and constants are
+    propagated. The variables of the model are mapped to lists of
+    literals, which is used to decode the models of the SAT solver.
+    """
+
+    def __init__(self):
+        # Variable 1 is constant true
+        self.num_vars = 1
+        self.true = 1
+        self.clauses: List[List[int]] = [[1]]
+        self.widths: Dict[str, int] = {}
+        self.variables: Dict[str, BitVector] = {}
+        # Assertions are guarded with -selector, see SATSession
+        self.selector: Optional[int] = None
+        self._gates = {}
+        # Terms defined with define-fun, see parser.ir
+        self._definitions: Dict[str, Union[Literal, BitVector]] = {}
+
+    def add_smtlib2(self, text: str) -> None:
+        """
+        Adds the declarations and assertions of a SMT-LIB2 model.
+        """
+        for command in parseSExpressions(text):
+            if command[0] == "declare-fun":
+                self.widths[command[1]] = int(command[3][2])
+            elif command[0] == "define-fun":
+                self._definitions[command[1]] = self._term(command[4])
+            elif command[0] == "assert":
+                self.assert_formula(command[1])
+
+    def new_var(self) -> int:
+        self.num_vars += 1
+        return self.num_vars
+
+    def values(self, model: List[int]) -> Dict[str, int]:
+        """
+        Decodes the values of all variables from a model of the SAT solver.
+        """
+        assignment = set(lit for lit in model if lit > 0)
+        assignment.add(self.true)
+        values = {}
+        for name, bits in self.variables.items():
+            value = 0
+            for i, lit in enumerate(bits):
+                if (lit > 0 and lit in assignment) or (lit < 0 and -lit not in assignment):
+                    value |= 1 << i
+            values[name] = value
+        return values
+
+    def dimacs(self, projection: Optional[List[str]] = None) -> str:
+        """
+        Prints the clauses in DIMACS CNF. For every variable of the model,
+        a comment line "c var <name> <literals>" lists the literals of its
+        bits, least significant bit first. If projection is given, the CNF
+        variables of these model variables are the sampling set in "c ind"
+        lines, which restricts model counting to their values.
+        """
+        output = []
+        for name, bits in self.variables.items():
+            output.append(f"c var {name} {' '.join(str(lit) for lit in bits)}")
+        if projection is not None:
+            sampling_set = self.sampling_set(projection)
+            for i in range(0, len(sampling_set), 10):
+                output.append(f"c ind {' '.join(str(var) for var in sampling_set[i:i + 10])} 0")
+        output.append(f"p cnf {self.num_vars} {len(self.clauses)}")
+        output.extend(" ".join(str(lit) for lit in clause) + " 0" for clause in self.clauses)
+        return "\n".join(output) + "\n"
+
+    def sampling_set(self, names: List[str]) -> List[int]:
+        """
+        CNF variables of the bits of the given model variables. Bits which
+        are constant are left out, as are variables which do not occur in
+        the model.
+        """
+        sampling_set = set()
+        for name in names:
+            for lit in self.variables.get(name, []):
+                if abs(lit) != self.true:
+                    sampling_set.add(abs(lit))
+        return sorted(sampling_set)
+
+    def assert_formula(self, formula) -> None:
+        """
+        Adds clauses which enforce the given formula.
+        """
+        if isinstance(formula, list):
+            operator = formula[0]
+            if operator == "and":
+                for argument in formula[1:]:
+                    self.assert_formula(argument)
+                return
+            if operator == "or":
+                self._add_clause([self._bool(argument) for argument in formula[1:]])
+                return
+            if operator == "=" and len(formula) == 3:
+                left, right = formula[1], formula[2]
+                if self._is_unused_variable(right):
+                    left, right = right, left
+                if self.selector is None and self._is_unused_variable(left):
+                    # Define the variable directly as the expression, unless
+                    # the expression depends on the variable itself
+                    right = self._bits(right)
+                    if left not in self.variables:
+                        self.variables[left] = right
+                        return
+                else:
+                    right = self._term(right)
+                left = self._term(left)
+                if isinstance(left, list):
+                    for a, b in zip(left, right):
+                        self._add_clause([-a, b])
+                        self._add_clause([a, -b])
+                    return
+        self._add_clause([self._bool(formula)])
+
+    def _add_clause(self, clause: List[int]) -> None:
+        if self.true in clause:
+            return
+        clause = [lit for lit in clause if lit != -self.true]
+        if self.selector is not None:
+            clause.append(-self.selector)
+        self.clauses.append(clause)
+
+    def _is_unused_variable(self, term) -> bool:
+        return isinstance(term, str) and term in self.widths and term not in self.variables
+
+    def _bool(self, formula) -> Literal:
+        term = self._term(formula)
+        if isinstance(term, list):
+            raise ValueError(f"Expected a formula, got a bit vector: {formula}")
+        return term
+
+    def _bits(self, formula) -> BitVector:
+        term = self._term(formula)
+        if not isinstance(term, list):
+            raise ValueError(f"Expected a bit vector, got a formula: {formula}")
+        return term
+
+    def _term(self, e) -> Union[Literal, BitVector]:
+        if isinstance(e, str):
+            return self._atom(e)
+
+        operator = e[0]
+        if isinstance(operator, list):
+            # Indexed operators (_ extract i j) and (_ zero_extend k)
+            bits = self._bits(e[1])
+            if operator[1] == "extract":
+                return bits[int(operator[3]):int(operator[2]) + 1]
+            if operator[1] == "zero_extend":
+                return bits + [-self.true] * int(operator[2])
+            raise ValueError(f"Unsupported operator {operator}")
+
+        arguments = [self._term(argument) for argument in e[1:]]
+        if operator == "not":
+            return -arguments[0]
+        if operator == "and":
+            return self._and_all(arguments)
+        if operator == "or":
+            return -self._and_all([-a for a in arguments])
+        if operator == "=":
+            return self._equal(arguments[0], arguments[1])
+        if operator == "distinct":
+            return -self._equal(arguments[0], arguments[1])
+        if operator == "ite":
+            condition, then_term, else_term = arguments
+            if isinstance(then_term, list):
+                return [self._ite(condition, t, f) for t, f in zip(then_term, else_term)]
+            return self._ite(condition, then_term, else_term)
+        if operator == "bvnot":
+            return [-a for a in arguments[0]]
+        if operator in ["bvand", "bvor", "bvxor"]:
+            gate = {"bvand": self._and, "bvor": self._or, "bvxor": self._xor}[operator]
+            result = arguments[0]
+            for argument in arguments[1:]:
+                result = [gate(a, b) for a, b in zip(result, argument)]
+            return result
+        if operator == "concat":
+            result = []
+            for argument in reversed(arguments):
+                result = result + argument
+            return result
+        if operator == "bvadd":
+            result = arguments[0]
+            for argument in arguments[1:]:
+                result = self._add(result, argument)
+            return result
+        if operator == "bvsub":
+            return self._add(arguments[0], [-a for a in arguments[1]], self.true)
+        if operator == "bvurem":
+            return self._urem(arguments[0], arguments[1])
+        if operator == "bvult":
+            return self._ult(arguments[0], arguments[1])
+        if operator == "bvule":
+            return -self._ult(arguments[1], arguments[0])
+        if operator == "bvugt":
+            return self._ult(arguments[1], arguments[0])
+        if operator == "bvuge":
+            return -self._ult(arguments[0], arguments[1])
+        raise ValueError(f"Unsupported operator {operator}")
+
+    def _atom(self, atom: str) -> Union[Literal, BitVector]:
+        if atom == "true":
+            return self.true
+        if atom == "false":
+            return -self.true
+        if atom.startswith("#b"):
+            return [self.true if bit == "1" else -self.true for bit in reversed(atom[2:])]
+        if atom.startswith("#x"):
+            width = 4 * (len(atom) - 2)
+            value = int(atom[2:], 16)
+            return [self.true if (value >> i) & 1 else -self.true for i in range(width)]
+        if atom in self._definitions:
+            return self._definitions[atom]
+        if atom not in self.variables:
+            if atom not in self.widths:
+                raise ValueError(f"Undeclared variable {atom}")
+            self.variables[atom] = [self.new_var() for _ in range(self.widths[atom])]
+        return self.variables[atom]
+
+    def _and(self, a: Literal, b: Literal) -> Literal:
+        if a == -self.true or b == -self.true or a == -b:
+            return -self.true
+        if a == self.true or a == b:
+            return b
+        if b == self.true:
+            return a
+        key = ("and", min(a, b), max(a, b))
+        if key not in self._gates:
+            v = self.new_var()
+            self.clauses.extend([[-v, a], [-v, b], [v, -a, -b]])
+            self._gates[key] = v
+        return self._gates[key]
+
+    def _or(self, a: Literal, b: Literal) -> Literal:
+        return -self._and(-a, -b)
+
+    def _xor(self, a: Literal, b: Literal) -> Literal:
+        if abs(a) == self.true:
+            return -b if a == self.true else b
+        if abs(b) == self.true:
+            return -a if b == self.true else a
+        if a == b:
+            return -self.true
+        if a == -b:
+            return self.true
+        # Negations are moved to the output of the gate
+        sign = 1
+        if a < 0:
+            a, sign = -a, -sign
+        if b < 0:
+            b, sign = -b, -sign
+        key = ("xor", min(a, b), max(a, b))
+        if key not in self._gates:
+            v = self.new_var()
+            self.clauses.extend([[-v, a, b], [-v, -a, -b], [v, -a, b], [v, a, -b]])
+            self._gates[key] = v
+        return sign * self._gates[key]
+
+    def _ite(self, c: Literal, t: Literal, e: Literal) -> Literal:
+        if c == self.true or t == e:
+            return t
+        if c == -self.true:
+            return e
+        if t == self.true and e == -self.true:
+            return c
+        if t == -self.true and e == self.true:
+            return -c
+        key = ("ite", c, t, e)
+        if key not in self._gates:
+            v = self.new_var()
+            self.clauses.extend([[-c, -t, v], [-c, t, -v], [c, -e, v], [c, e, -v]])
+            self._gates[key] = v
+        return self._gates[key]
+
+    def _and_all(self, literals: List[Literal]) -> Literal:
+        literals = sorted(set(lit for lit in literals if lit != self.true))
+        if -self.true in literals or any(-lit in literals for lit in literals):
+            return -self.true
+        if not literals:
+            return self.true
+        if len(literals) == 1:
+            return literals[0]
+        key = ("and",) + tuple(literals)
+        if key not in self._gates:
+            v = self.new_var()
+            self.clauses.extend([[-v, lit] for lit in literals])
+            self.clauses.append([v] + [-lit for lit in literals])
+            self._gates[key] = v
+        return self._gates[key]
+
+    def _equal(self, a, b) -> Literal:
+        if not isinstance(a, list):
+            return -self._xor(a, b)
+        return self._and_all([-self._xor(x, y) for x, y in zip(a, b)])
+
+    def _add(self, a: BitVector, b: BitVector, carry: Literal = None) -> BitVector:
+        # Ripple-carry adder
+        carry = -self.true if carry is None else carry
+        result = []
+        for x, y in zip(a, b):
+            half = self._xor(x, y)
+            result.append(self._xor(half, carry))
+            carry = self._or(self._and(x, y), self._and(carry, half))
+        return result
+
+    def _ult(self, a: BitVector, b: BitVector) -> Literal:
+        # From the least significant bit, the highest differing bit decides
+        less = -self.true
+        for x, y in zip(a, b):
+            less = self._ite(self._xor(x, y), y, less)
+        return less
+
+    def _urem(self, a: BitVector, b: BitVector) -> BitVector:
+        # Restoring division, x mod 0 = x as in SMT-LIB2
+        width = len(a)
+        divisor = b + [-self.true]
+        remainder = [-self.true] * (width + 1)
+        for i in reversed(range(width)):
+            remainder = [a[i]] + remainder[:width]
+            greater_equal = -self._ult(remainder, divisor)
+            difference = self._add(remainder, [-x for x in divisor], self.true)
+            remainder = [self._ite(greater_equal, d, r) for d, r in zip(difference, remainder)]
+        return remainder[:width]
@@ -95,6 +95,93 @@ def create_totalizer(stp_file: TextIO, inputs: List[str], prefix: str) -> List[s
             
     return out_vars
 
+def create_sequential_counter(stp_file: TextIO, inputs: List[str], prefix: str, limit: int) -> List[str]:
+    """
+    Creates a sequential counter for the given 1-bit inputs, which counts
+    up to limit. Returns a list of 1-bit expressions, the k-th one is set
+    if at least k+1 inputs are set.
+    """
+    return _sequential_counter(stp_file, inputs, prefix, limit)[-1][1:]
+
+def _sequential_counter(stp_file: TextIO, inputs: List[str], prefix: str, limit: int) -> List[List[str]]:
+    """
+    Returns the registers of a sequential counter. Register k of row j is
+    set if at least k of the first j inputs are set, for k <= limit.
+    """
+    rows = [["0bin1"] + ["0bin0"] * limit]
+    for j, bit in enumerate(inputs):
+        previous = rows[-1]
+        row = ["0bin1"]
+        for k in range(1, limit + 1):
+            if k > j + 1:
+                row.append("0bin0")
+                continue
+            register = f"{prefix}_{j}_{k}"
+            stpcommands.setupVariables(stp_file, [register], 1)
+            if k == 1:
+                stp_file.write(f"ASSERT({register} = ({previous[k]} | {bit}));\n")
+            elif k == j + 1:
+                stp_file.write(f"ASSERT({register} = ({bit} & {previous[k - 1]}));\n")
+            else:
+                stp_file.write(f"ASSERT({register} = ({previous[k]} | ({bit} & {previous[k - 1]})));\n")
+            row.append(register)
+        rows.append(row)
+    return rows
+
+def add_matsui_bounds(stp_file: TextIO, round_bits: List[List[str]], weight: int,
+                      bounds: List[int], prefix: str):
+    """
+    Asserts that the weight of round_bits is equal to weight, with a
+    sequential counter over all rounds. bounds[i - 1] is the minimum weight
+    B_i of i rounds. Any i consecutive rounds weigh at least B_i, and the
+    rounds between a and b weigh at most weight - B_a - B_(r - b), as in
+    the bounding conditions of Matsui's algorithm.
+    """
+    bits = [bit for bits_of_round in round_bits for bit in bits_of_round]
+    limit = weight + 1
+    rows = _sequential_counter(stp_file, bits, prefix, limit)
+    total = rows[-1]
+    stp_file.write(f"ASSERT({total[weight]} = 0bin1);\n")
+    stp_file.write(f"ASSERT({total[limit]} = 0bin0);\n")
+
+    rounds = len(round_bits)
+    # Row of the counter after each round
+    boundaries = [0]
+    for bits_of_round in round_bits:
+        boundaries.append(boundaries[-1] + len(bits_of_round))
+
+    def bound(length: int) -> int:
+        if 0 < length <= len(bounds) and bounds[length - 1] is not None:
+            return bounds[length - 1]
+        return 0
+
+    for a in range(rounds):
+        for b in range(a + 1, rounds + 1):
+            start, end = rows[boundaries[a]], rows[boundaries[b]]
+            # At least B_(b - a) in rounds a to b
+            lower = bound(b - a)
+            for m in range(limit + 1):
+                if m + lower > limit:
+                    _add_implication(stp_file, start[m], "0bin0")
+                elif lower > 0:
+                    _add_implication(stp_file, start[m], end[m + lower])
+            if a == 0 and b == rounds:
+                continue
+            # At most weight - B_a - B_(r - b) in rounds a to b
+            upper = weight - bound(a) - bound(rounds - b)
+            for m in range(limit + 1):
+                if m - upper <= 0:
+                    continue
+                if m - upper > limit:
+                    _add_implication(stp_file, end[m], "0bin0")
+                else:
+                    _add_implication(stp_file, end[m], start[m - upper])
+
+def _add_implication(stp_file: TextIO, a: str, b: str):
+    if a == "0bin0" or b == "0bin1":
+        return
+    stp_file.write(f"ASSERT((~{a} | {b}) = 0bin1);\n")
+
 def add_weight_constraint(stp_file: TextIO, bits: List[str], weight: int, prefix: str, encoding: str, equal: bool = True):
     """
     Adds a weight constraint using the specified encoding.
@@ -108,6 +195,8 @@ def add_weight_constraint(stp_file: TextIO, bits: List[str], weight: int, prefix
         sorted_bits = create_sorter(stp_file, bits, prefix)
     elif encoding == "totalizer":
         sorted_bits = create_totalizer(stp_file, bits, prefix)
+    elif encoding in ["seqcounter", "matsui"]:
+        sorted_bits = create_sequential_counter(stp_file, bits, prefix, weight + 1)
     else:
         raise ValueError(f"Unknown encoding: {encoding}")
 
@@ -0,0 +1,799 @@
+'''
+Intermediate representation of the constraint models. A model consists
+of bit-vector variables and assertions over typed terms. Models are
+either built directly or parsed from the STP CVC input language, and
+printed as STP CVC, SMT-LIB2 or DIMACS CNF. The optimization passes run
+on the representation, so they apply to all backends.
+'''
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+class Term(object):
+    """
+    Node of a model. Terms are created by a Model, which shares equal
+    terms, so that they can be compared by identity.
+    """
+    __slots__ = ("op", "args", "params", "width")
+
+    def __init__(self, op: str, args: Tuple["Term", ...], params: tuple, width: Optional[int]):
+        self.op = op
+        self.args = args
+        self.params = params
+        # Bit width, None for formulas
+        self.width = width
+
+    @property
+    def is_const(self) -> bool:
+        return self.op in ["const", "true", "false"]
+
+    @property
+    def value(self):
+        """
+        Value of a constant, a boolean for true and false.
+        """
+        if self.op == "const":
+            return self.params[0]
+        return self.op == "true"
+
+    def __repr__(self) -> str:
+        return printSMTLIB2Term(self)
+
+
+class Model(object):
+    """
+    Declarations and assertions of a constraint model. Terms are built
+    with the methods of the model, e.g. model.bvxor(a, b).
+    """
+
+    def __init__(self):
+        self.widths: Dict[str, int] = {}
+        self.assertions: List[Term] = []
+        # Whether the model asks for a solution, QUERY(FALSE) in STP
+        self.query = False
+        # Terms which are used several times, see eliminateCommonSubexpressions
+        self.shared: List[Term] = []
+        self._terms: Dict[tuple, Term] = {}
+
+    def term(self, op: str, args: Tuple[Term, ...] = (), params: tuple = (),
+             width: Optional[int] = None) -> Term:
+        key = (op, params, width, tuple(id(arg) for arg in args))
+        if key not in self._terms:
+            self._terms[key] = Term(op, tuple(args), params, width)
+        return self._terms[key]
+
+    # Declarations and assertions
+
+    def declare(self, name: str, width: int) -> Term:
+        self.widths[name] = width
+        return self.var(name)
+
+    def var(self, name: str) -> Term:
+        if name not in self.widths:
+            raise ValueError(f"Undeclared variable {name}")
+        return self.term("var", params=(name,), width=self.widths[name])
+
+    def add(self, formula: Term) -> None:
+        if formula.width is not None:
+            raise ValueError(f"Expected a formula, got a bit vector: {formula}")
+        self.assertions.append(formula)
+
+    def variables(self) -> Dict[str, int]:
+        """
+        Names and widths of the variables which occur in the assertions.
+        """
+        used = {}
+        for term in _postorder(self.assertions):
+            if term.op == "var":
+                used[term.params[0]] = term.width
+        return {name: width for name, width in self.widths.items() if name in used}
+
+    # Terms
+
+    def const(self, value: int, width: int, radix: str = "bin") -> Term:
+        return self.term("const", params=(value & ((1 << width) - 1), radix), width=width)
+
+    def true(self) -> Term:
+        return self.term("true")
+
+    def false(self) -> Term:
+        return self.term("false")
+
+    def bvnot(self, a: Term) -> Term:
+        return self.term("bvnot", (a,), width=a.width)
+
+    def bvand(self, *args: Term) -> Term:
+        return self._nary("bvand", args)
+
+    def bvor(self, *args: Term) -> Term:
+        return self._nary("bvor", args)
+
+    def bvxor(self, *args: Term) -> Term:
+        return self._nary("bvxor", args)
+
+    def bvadd(self, *args: Term) -> Term:
+        return self._nary("bvadd", args)
+
+    def bvsub(self, a: Term, b: Term) -> Term:
+        return self.term("bvsub", (a, b), width=a.width)
+
+    def bvurem(self, a: Term, b: Term) -> Term:
+        return self.term("bvurem", (a, b), width=a.width)
+
+    def concat(self, *args: Term) -> Term:
+        if len(args) == 1:
+            return args[0]
+        return self.term("concat", tuple(args), width=sum(arg.width for arg in args))
+
+    def extract(self, a: Term, high: int, low: int) -> Term:
+        return self.term("extract", (a,), (high, low), high - low + 1)
+
+    def zero_extend(self, a: Term, amount: int) -> Term:
+        if amount == 0:
+            return a
+        return self.term("zero_extend", (a,), (amount,), a.width + amount)
+
+    def rotl(self, a: Term, amount: int) -> Term:
+        amount %= a.width
+        if amount == 0:
+            return a
+        return self.concat(self.extract(a, a.width - 1 - amount, 0),
+                           self.extract(a, a.width - 1, a.width - amount))
+
+    def rotr(self, a: Term, amount: int) -> Term:
+        return self.rotl(a, a.width - amount % a.width)
+
+    def eq(self, a: Term, b: Term) -> Term:
+        return self.term("=", (a, b))
+
+    def not_(self, a: Term) -> Term:
+        return self.term("not", (a,))
+
+    def ite(self, condition: Term, then_term: Term, else_term: Term) -> Term:
+        return self.term("ite", (condition, then_term, else_term), width=then_term.width)
+
+    def compare(self, op: str, a: Term, b: Term) -> Term:
+        """
+        Unsigned comparison, op is one of bvule, bvult, bvuge or bvugt.
+        """
+        return self.term(op, (a, b))
+
+    def _nary(self, op: str, args) -> Term:
+        if len(args) == 1:
+            return args[0]
+        return self.term(op, tuple(args), width=args[0].width)
+
+
+def _postorder(roots: List[Term]):
+    """
+    Yields every term reachable from roots once, arguments first.
+    """
+    seen = set()
+    for root in roots:
+        stack = [(root, False)]
+        while stack:
+            term, expanded = stack.pop()
+            if id(term) in seen:
+                continue
+            if expanded:
+                seen.add(id(term))
+                yield term
+                continue
+            stack.append((term, True))
+            for arg in reversed(term.args):
+                if id(arg) not in seen:
+                    stack.append((arg, False))
+
+
+def _rebuild(model: Model, term: Term, args: Tuple[Term, ...]) -> Term:
+    if all(a is b for a, b in zip(args, term.args)):
+        return term
+    return model.term(term.op, args, term.params, term.width)
+
+
+# Frontend for the STP CVC input language
+
+_TOKEN = re.compile(r"""
+    (?P<skip>\s+|%[^\n]*)
+  | (?P<bin>0bin[01]+|0b[01]+)
+  | (?P<hex>0hex[0-9a-fA-F]+|0x[0-9a-fA-F]+)
+  | (?P<num>[0-9]+)
+  | (?P<id>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op><<|>>|[()\[\]:;,=&|~@])
+  | (?P<error>.)
+""", re.VERBOSE)
+
+_COMPARISONS = {"BVLE": "bvule", "BVLT": "bvult", "BVGE": "bvuge", "BVGT": "bvugt"}
+_ARITHMETIC = {"BVPLUS": "bvadd", "BVSUB": "bvsub", "BVMOD": "bvurem"}
+
+
+def parseCVC(cvc: str) -> Model:
+    """
+    Parses a model in the STP CVC input language.
+    """
+    return _CVCParser(cvc).parse()
+
+
+class _CVCParser(object):
+    """
+    Recursive descent parser for the subset of the CVC language used by
+    the cipher models.
+    """
+
+    def __init__(self, cvc: str):
+        self.tokens = []
+        for match in _TOKEN.finditer(cvc):
+            kind = match.lastgroup
+            if kind == "skip":
+                continue
+            if kind == "error":
+                raise ValueError(f"Unexpected character {match.group()!r} in STP input")
+            self.tokens.append((kind, match.group()))
+        self.tokens.append(("eof", ""))
+        self.pos = 0
+        self.model = Model()
+
+    def parse(self) -> Model:
+        while self._peek() != "":
+            self._statement()
+        return self.model
+
+    def _statement(self) -> None:
+        keyword = self._next()
+        if keyword == "ASSERT":
+            self._expect("(")
+            self.model.add(self._formula())
+            self._expect(")")
+            self._expect(";")
+            return
+        if keyword == "QUERY":
+            # QUERY(FALSE) asks for a model of the assertions
+            self._expect("(")
+            self._formula()
+            self._expect(")")
+            self._expect(";")
+            self.model.query = True
+            return
+        if keyword == "COUNTEREXAMPLE":
+            self._expect(";")
+            return
+
+        names = [keyword]
+        while self._accept(","):
+            names.append(self._next())
+        self._expect(":")
+        self._expect("BITVECTOR")
+        self._expect("(")
+        width = int(self._next())
+        self._expect(")")
+        self._expect(";")
+        for name in names:
+            self.model.declare(name, width)
+
+    def _formula(self) -> Term:
+        left = self._or()
+        if self._accept("="):
+            return self.model.eq(left, self._or())
+        return left
+
+    def _or(self) -> Term:
+        terms = [self._and()]
+        while self._accept("|"):
+            terms.append(self._and())
+        return self.model.bvor(*terms)
+
+    def _and(self) -> Term:
+        terms = [self._concat()]
+        while self._accept("&"):
+            terms.append(self._concat())
+        return self.model.bvand(*terms)
+
+    def _concat(self) -> Term:
+        left = self._unary()
+        while self._accept("@"):
+            left = self.model.concat(left, self._unary())
+        return left
+
+    def _unary(self) -> Term:
+        # In STP, negation binds weaker than shifts: ~a << 1 is ~(a << 1)
+        if self._accept("~"):
+            return self.model.bvnot(self._unary())
+        return self._shift()
+
+    def _shift(self) -> Term:
+        term = self._postfix()
+        while self._peek() in ["<<", ">>"]:
+            operator = self._next()
+            amount = int(self._next())
+            if amount == 0:
+                continue
+            if operator == "<<":
+                # STP appends zeros, the result grows by the shift amount
+                term = self.model.concat(term, self.model.const(0, amount))
+            elif amount >= term.width:
+                term = self.model.const(0, term.width)
+            else:
+                term = self.model.zero_extend(self.model.extract(term, term.width - 1, amount), amount)
+        return term
+
+    def _postfix(self) -> Term:
+        term = self._primary()
+        while self._accept("["):
+            high = int(self._next())
+            self._expect(":")
+            low = int(self._next())
+            self._expect("]")
+            term = self.model.extract(term, high, low)
+        return term
+
+    def _primary(self) -> Term:
+        kind, value = self.tokens[self.pos]
+        self.pos += 1
+        model = self.model
+        if value == "(":
+            term = self._formula()
+            self._expect(")")
+            return term
+        if kind == "bin":
+            bits = value[4:] if value.startswith("0bin") else value[2:]
+            return model.const(int(bits, 2), len(bits))
+        if kind == "hex":
+            digits = value[4:] if value.startswith("0hex") else value[2:]
+            return model.const(int(digits, 16), 4 * len(digits), radix="hex")
+        if kind != "id":
+            raise ValueError(f"Unexpected token {value!r} in STP input")
+
+        if value == "TRUE":
+            return model.true()
+        if value == "FALSE":
+            return model.false()
+        if value == "NOT":
+            return model.not_(self._arguments()[0])
+        if value == "IF":
+            condition = self._formula()
+            self._expect("THEN")
+            then_term = self._formula()
+            self._expect("ELSE")
+            else_term = self._formula()
+            self._expect("ENDIF")
+            return model.ite(condition, then_term, else_term)
+        if value == "BVXOR":
+            return model.bvxor(*self._arguments())
+        if value in _COMPARISONS:
+            left, right = self._arguments()
+            return model.compare(_COMPARISONS[value], left, right)
+        if value in _ARITHMETIC:
+            self._expect("(")
+            width = int(self._next())
+            terms = []
+            while self._accept(","):
+                terms.append(self._resize(self._formula(), width))
+            self._expect(")")
+            if len(terms) == 1:
+                return terms[0]
+            return model.term(_ARITHMETIC[value], tuple(terms), width=width)
+
+        if value not in model.widths:
+            raise ValueError(f"Undeclared variable {value} in STP input")
+        return model.var(value)
+
+    def _arguments(self) -> List[Term]:
+        self._expect("(")
+        terms = [self._formula()]
+        while self._accept(","):
+            terms.append(self._formula())
+        self._expect(")")
+        return terms
+
+    def _resize(self, term: Term, width: int) -> Term:
+        # Operands of BVPLUS and friends are adjusted to the result width
+        if term.width < width:
+            return self.model.zero_extend(term, width - term.width)
+        if term.width > width:
+            return self.model.extract(term, width - 1, 0)
+        return term
+
+    def _peek(self) -> str:
+        return self.tokens[self.pos][1]
+
+    def _next(self) -> str:
+        value = self.tokens[self.pos][1]
+        self.pos += 1
+        return value
+
+    def _accept(self, value: str) -> bool:
+        if self.tokens[self.pos][1] == value:
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, value: str) -> None:
+        if not self._accept(value):
+            raise ValueError(f"Expected {value!r} but found {self._peek()!r} in STP input")
+
+
+# Optimization passes
+
+def optimize(model: Model) -> Model:
+    """
+    Runs all optimization passes on the model.
+    """
+    foldConstants(model)
+    removeDeadVariables(model)
+    eliminateCommonSubexpressions(model)
+    return model
+
+
+def foldConstants(model: Model) -> Model:
+    """
+    Evaluates operations on constants and removes neutral operands, e.g.
+    x ^ 0 = x, x & 0 = 0 or extractions from concatenations. Assertions
+    which are always true are removed.
+    """
+    folded: Dict[int, Term] = {}
+    for term in _postorder(model.assertions):
+        args = tuple(folded[id(arg)] for arg in term.args)
+        folded[id(term)] = _fold(model, term, args)
+
+    assertions = []
+    for assertion in model.assertions:
+        assertion = folded[id(assertion)]
+        if assertion.op != "true":
+            assertions.append(assertion)
+    model.assertions = assertions
+    model.shared = []
+    return model
+
+
+def _fold(model: Model, term: Term, args: Tuple[Term, ...]) -> Term:
+    op = term.op
+    if op in ["var", "const", "true", "false"]:
+        return term
+    width = term.width
+    mask = (1 << width) - 1 if width is not None else None
+
+    if all(arg.is_const for arg in args):
+        value = _evaluate(term, [arg.value for arg in args])
+        if width is None:
+            return model.true() if value else model.false()
+        return model.const(value, width)
+
+    if op in ["bvand", "bvor", "bvxor"]:
+        neutral = mask if op == "bvand" else 0
+        absorbing = {"bvand": 0, "bvor": mask}.get(op)
+        operands = []
+        for arg in args:
+            if arg.is_const and arg.value == neutral:
+                continue
+            if arg.is_const and arg.value == absorbing:
+                return model.const(absorbing, width)
+            if op == "bvxor" and any(arg is other for other in operands):
+                # x ^ x = 0
+                operands = [other for other in operands if other is not arg]
+                continue
+            if op != "bvxor" and any(arg is other for other in operands):
+                continue
+            operands.append(arg)
+        if not operands:
+            return model.const(neutral, width)
+        return model.term(op, tuple(operands), width=width) if len(operands) > 1 else operands[0]
+    if op == "bvadd":
+        operands = [arg for arg in args if not (arg.is_const and arg.value == 0)]
+        if not operands:
+            return model.const(0, width)
+        return model.term(op, tuple(operands), width=width) if len(operands) > 1 else operands[0]
+    if op == "bvnot" and args[0].op == "bvnot":
+        return args[0].args[0]
+    if op == "extract":
+        return _fold_extract(model, args[0], *term.params)
+    if op == "concat":
+        return _fold_concat(model, args)
+    if op == "=" and args[0] is args[1]:
+        return model.true()
+    if op == "not" and args[0].op == "not":
+        return args[0].args[0]
+    if op == "ite" and args[0].is_const:
+        return args[1] if args[0].value else args[2]
+    if op == "ite" and args[1] is args[2]:
+        return args[1]
+    return _rebuild(model, term, args)
+
+
+def _fold_extract(model: Model, arg: Term, high: int, low: int) -> Term:
+    if low == 0 and high == arg.width - 1:
+        return arg
+    if arg.op == "extract":
+        return _fold_extract(model, arg.args[0], arg.params[1] + high, arg.params[1] + low)
+    if arg.op == "concat":
+        # Keep only the parts which overlap with the extracted bits
+        parts = []
+        offset = arg.width
+        for part in arg.args:
+            offset -= part.width
+            part_high, part_low = min(high, offset + part.width - 1), max(low, offset)
+            if part_high >= part_low:
+                parts.append(_fold_extract(model, part, part_high - offset, part_low - offset))
+        return _fold_concat(model, tuple(parts))
+    if arg.op == "zero_extend" and high < arg.args[0].width:
+        return _fold_extract(model, arg.args[0], high, low)
+    return model.extract(arg, high, low)
+
+
+def _fold_concat(model: Model, args: Tuple[Term, ...]) -> Term:
+    # Flatten nested concatenations and merge adjacent parts of one term
+    parts: List[Term] = []
+    for arg in args:
+        for part in (arg.args if arg.op == "concat" else (arg,)):
+            if parts and part.op == "extract" and parts[-1].op == "extract" and \
+                    part.args[0] is parts[-1].args[0] and part.params[0] + 1 == parts[-1].params[1]:
+                parts[-1] = _fold_extract(model, part.args[0], parts[-1].params[0], part.params[1])
+            elif parts and part.op == "const" and parts[-1].op == "const":
+                previous = parts[-1]
+                parts[-1] = model.const((previous.value << part.width) | part.value,
+                                        previous.width + part.width)
+            else:
+                parts.append(part)
+    return model.concat(*parts)
+
+
+def _evaluate(term: Term, values: list):
+    op = term.op
+    width = term.width
+    mask = (1 << width) - 1 if width is not None else None
+    if op == "bvnot":
+        return ~values[0] & mask
+    if op == "bvand":
+        result = mask
+        for value in values:
+            result &= value
+        return result
+    if op == "bvor":
+        result = 0
+        for value in values:
+            result |= value
+        return result
+    if op == "bvxor":
+        result = 0
+        for value in values:
+            result ^= value
+        return result
+    if op == "bvadd":
+        return sum(values) & mask
+    if op == "bvsub":
+        return (values[0] - values[1]) & mask
+    if op == "bvurem":
+        return values[0] % values[1] if values[1] else values[0]
+    if op == "concat":
+        result = 0
+        for arg, value in zip(term.args, values):
+            result = (result << arg.width) | value
+        return result
+    if op == "extract":
+        high, low = term.params
+        return (values[0] >> low) & ((1 << (high - low + 1)) - 1)
+    if op == "zero_extend":
+        return values[0]
+    if op == "ite":
+        return values[1] if values[0] else values[2]
+    if op == "=":
+        return values[0] == values[1]
+    if op == "not":
+        return not values[0]
+    if op == "bvule":
+        return values[0] <= values[1]
+    if op == "bvult":
+        return values[0] < values[1]
+    if op == "bvuge":
+        return values[0] >= values[1]
+    if op == "bvugt":
+        return values[0] > values[1]
+    raise ValueError(f"Unsupported operator {op}")
+
+
+def eliminateCommonSubexpressions(model: Model) -> Model:
+    """
+    Finds the compound terms which are used several times. The printers
+    define them once and refer to them by name. Equal terms are already
+    shared by the model, so a term is used several times if it has more
+    than one parent.
+    """
+    parents: Dict[int, int] = {}
+    order = list(_postorder(model.assertions))
+    for term in order:
+        for arg in term.args:
+            parents[id(arg)] = parents.get(id(arg), 0) + 1
+    model.shared = [term for term in order
+                    if parents.get(id(term), 0) > 1 and not _is_simple(term)]
+    return model
+
+
+def _is_simple(term: Term) -> bool:
+    if not term.args:
+        return True
+    # Negations and extractions of variables are as cheap as a reference
+    return term.op in ["bvnot", "extract", "not"] and not term.args[0].args
+
+
+def removeDeadVariables(model: Model, keep: Optional[set] = None) -> Model:
+    """
+    Removes the declarations of variables which do not occur in any
+    assertion. If keep is given, variables which are not in keep and are
+    only defined by an assertion v = t, but never used, are removed with
+    their definition. These assertions can always be satisfied.
+    """
+    if keep is not None:
+        while True:
+            uses: Dict[str, int] = {}
+            for assertion in model.assertions:
+                for term in _postorder([assertion]):
+                    if term.op == "var":
+                        uses[term.params[0]] = uses.get(term.params[0], 0) + 1
+            dead = [assertion for assertion in model.assertions
+                    if _defined_variable(assertion, uses, keep) is not None]
+            if not dead:
+                break
+            dead_ids = set(id(assertion) for assertion in dead)
+            model.assertions = [a for a in model.assertions if id(a) not in dead_ids]
+    used = model.variables()
+    model.widths = {name: width for name, width in model.widths.items() if name in used}
+    return model
+
+
+def _defined_variable(assertion: Term, uses: Dict[str, int], keep: set) -> Optional[str]:
+    if assertion.op != "=":
+        return None
+    for variable, definition in [assertion.args, reversed(assertion.args)]:
+        if variable.op == "var":
+            name = variable.params[0]
+            if name not in keep and uses[name] == 1 and variable.width == definition.width:
+                return name
+    return None
+
+
+# Printers
+
+def _names(model: Model) -> Dict[int, str]:
+    names = {}
+    for term in model.shared:
+        name = f"cse_{len(names)}"
+        while name in model.widths:
+            name = "_" + name
+        names[id(term)] = name
+    return names
+
+
+def printSMTLIB2Term(term: Term, names: Optional[Dict[int, str]] = None) -> str:
+    """
+    Prints a term in SMT-LIB2, shared terms are referred to by name.
+    """
+    names = names or {}
+    printed: Dict[int, str] = {}
+    for node in _postorder([term]):
+        if id(node) in names and node is not term:
+            printed[id(node)] = names[id(node)]
+            continue
+        args = [printed[id(arg)] for arg in node.args]
+        op = node.op
+        if op == "var":
+            text = node.params[0]
+        elif op == "const":
+            value, radix = node.params
+            if radix == "bin":
+                text = f"#b{value:0{node.width}b}"
+            else:
+                text = f"#x{value:0{node.width // 4}X}"
+        elif op in ["true", "false"]:
+            text = op
+        elif op == "extract":
+            text = f"((_ extract {node.params[0]} {node.params[1]}) {args[0]})"
+        elif op == "zero_extend":
+            text = f"((_ zero_extend {node.params[0]}) {args[0]})"
+        else:
+            text = f"({op} {' '.join(args)})"
+        printed[id(node)] = text
+    return printed[id(term)]
+
+
+def printSMTLIB2(model: Model) -> str:
+    """
+    Prints the model in SMT-LIB2. Only variables which occur in the
+    assertions are declared, as STP does. Shared terms are defined with
+    define-fun, which does not add variables to the solution.
+    """
+    names = _names(model)
+    output = ["(set-logic QF_BV)"]
+    for name, width in model.variables().items():
+        output.append(f"(declare-fun {name} () (_ BitVec {width}))")
+    for term in model.shared:
+        sort = "Bool" if term.width is None else f"(_ BitVec {term.width})"
+        output.append(f"(define-fun {names[id(term)]} () {sort} {printSMTLIB2Term(term, names)})")
+    for assertion in model.assertions:
+        output.append(f"(assert {printSMTLIB2Term(assertion, names)})")
+    if model.query:
+        output.append("(check-sat)")
+    return "\n".join(output) + "\n"
+
+
+_CVC_OPERATORS = {"bvand": " & ", "bvor": " | ", "concat": " @ "}
+_CVC_COMPARISONS = {value: key for key, value in _COMPARISONS.items()}
+_CVC_ARITHMETIC = {value: key for key, value in _ARITHMETIC.items()}
+
+
+def printCVCTerm(term: Term, names: Optional[Dict[int, str]] = None) -> str:
+    """
+    Prints a term in the STP CVC language.
+    """
+    names = names or {}
+    printed: Dict[int, str] = {}
+    for node in _postorder([term]):
+        if id(node) in names and node is not term:
+            printed[id(node)] = names[id(node)]
+            continue
+        args = [printed[id(arg)] for arg in node.args]
+        op = node.op
+        if op == "var":
+            text = node.params[0]
+        elif op == "const":
+            text = f"0bin{node.value:0{node.width}b}"
+        elif op in ["true", "false"]:
+            text = op.upper()
+        elif op == "extract":
+            text = f"({args[0]})[{node.params[0]}:{node.params[1]}]"
+        elif op == "zero_extend":
+            text = f"(0bin{'0' * node.params[0]} @ {args[0]})"
+        elif op == "bvnot":
+            text = f"(~{args[0]})"
+        elif op in _CVC_OPERATORS:
+            text = "(" + _CVC_OPERATORS[op].join(args) + ")"
+        elif op == "bvxor":
+            text = args[0]
+            for arg in args[1:]:
+                text = f"BVXOR({text}, {arg})"
+        elif op in _CVC_ARITHMETIC:
+            text = f"{_CVC_ARITHMETIC[op]}({node.width}, {', '.join(args)})"
+        elif op in _CVC_COMPARISONS:
+            text = f"{_CVC_COMPARISONS[op]}({args[0]}, {args[1]})"
+        elif op == "=":
+            text = f"({args[0]} = {args[1]})"
+        elif op == "not":
+            text = f"NOT({args[0]})"
+        elif op == "ite":
+            text = f"(IF {args[0]} THEN {args[1]} ELSE {args[2]} ENDIF)"
+        else:
+            raise ValueError(f"Unsupported operator {op}")
+        printed[id(node)] = text
+    return printed[id(term)]
+
+
+def printCVC(model: Model) -> str:
+    """
+    Prints the model in the STP CVC language. Shared bit-vector terms are
+    assigned to new variables, shared formulas are printed in place.
+    """
+    names = {key: name for key, name in _names(model).items()}
+    shared = [term for term in model.shared if term.width is not None]
+    names = {id(term): names[id(term)] for term in shared}
+    output = []
+    for name, width in model.variables().items():
+        output.append(f"{name}: BITVECTOR({width});")
+    for term in shared:
+        output.append(f"{names[id(term)]}: BITVECTOR({term.width});")
+        output.append(f"ASSERT({names[id(term)]} = {printCVCTerm(term, names)});")
+    for assertion in model.assertions:
+        output.append(f"ASSERT({printCVCTerm(assertion, names)});")
+    if model.query:
+        output.append("QUERY(FALSE);")
+        output.append("COUNTEREXAMPLE;")
+    return "\n".join(output) + "\n"
+
+
+def printDIMACS(model: Model) -> str:
+    """
+    Bit-blasts the model and prints the clauses in DIMACS CNF, see
+    CNFBuilder.dimacs.
+    """
+    from parser.cnf import CNFBuilder
+    builder = CNFBuilder()
+    builder.add_smtlib2(printSMTLIB2(model))
+    return builder.dimacs()
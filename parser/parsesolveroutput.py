@@ -55,6 +55,24 @@ def getCharBitwuzlaOutput(output, cipher, rounds):
                                                 cipher, rounds, weight)
 
 
+def getCharFromValues(values, widths, cipher, rounds):
+    """
+    Construct a characteristic from the variable values of an in-process
+    solver.
+    """
+    characteristic = {}
+    weight = "0"
+    for var_name, val_int in values.items():
+        var_value = "0x" + hex(val_int)[2:].zfill((widths[var_name] + 3) // 4)
+        if var_name == "weight":
+            weight = var_value
+        else:
+            characteristic[var_name] = var_value
+
+    return diffchars.DifferentialCharacteristic(characteristic,
+                                                cipher, rounds, weight)
+
+
 def getCharBoolectorOutput(output, cipher, rounds):
     """
     Parse the output of Boolector and construct a characteristic.
@@ -0,0 +1,219 @@
+'''
+Differential and linear properties of n-bit S-boxes and a minimized CNF
+of their valid transitions, used to model S-boxes in STP.
+'''
+
+import functools
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Number of points searched at once for the next uncovered point
+_CHUNK = 4096
+
+
+def getSboxSize(sbox: Tuple[int, ...]) -> int:
+    """
+    Number of input bits of the S-box.
+    """
+    n = len(sbox).bit_length() - 1
+    assert len(sbox) == 1 << n, "The S-box must have 2^n entries."
+    assert all(0 <= y < len(sbox) for y in sbox), "The S-box must map n to n bits."
+    return n
+
+
+def getChi(n: int = 5) -> Tuple[int, ...]:
+    """
+    Table of the chi map of Keccak and Ascon on n bits, y_i = x_i ^
+    (~x_{i+1} & x_{i+2}), where x_0 is the most significant bit.
+    """
+    table = []
+    for value in range(1 << n):
+        x = [(value >> (n - 1 - i)) & 1 for i in range(n)]
+        y = [x[i] ^ ((1 - x[(i + 1) % n]) & x[(i + 2) % n]) for i in range(n)]
+        table.append(sum(bit << (n - 1 - i) for i, bit in enumerate(y)))
+    return tuple(table)
+
+
+def getDDT(sbox: Tuple[int, ...]) -> np.ndarray:
+    """
+    Difference distribution table, DDT[a][b] is the number of x with
+    S(x) ^ S(x ^ a) = b.
+    """
+    table = np.array(sbox, dtype=np.int64)
+    x = np.arange(len(sbox))
+    return np.array([np.bincount(table ^ table[x ^ a], minlength=len(sbox))
+                     for a in range(len(sbox))])
+
+
+def getLAT(sbox: Tuple[int, ...]) -> np.ndarray:
+    """
+    Linear approximation table, LAT[a][b] is the number of x with
+    a.x = b.S(x) minus 2^(n-1).
+    """
+    x = np.arange(len(sbox))
+    masks = x[:, None]
+    # (-1)^(a.x) and (-1)^(b.S(x)) for all masks
+    inputs = 1 - 2 * _parity(masks & x[None, :])
+    outputs = 1 - 2 * _parity(masks & np.array(sbox)[None, :])
+    return (inputs @ outputs.T) // 2
+
+
+def _parity(values: np.ndarray) -> np.ndarray:
+    parity = np.zeros_like(values)
+    while values.any():
+        parity ^= values & 1
+        values = values >> 1
+    return parity
+
+
+def getTransitionWeights(sbox: Tuple[int, ...], linear: bool = False,
+                         precision: int = 0) -> Dict[Tuple[int, int], int]:
+    """
+    Weights of all valid transitions (a, b) of the S-box in multiples of
+    2^-precision. The weight is -log2 of the probability from the DDT, or
+    with linear of the absolute correlation from the LAT. Weights which
+    are not integers, e.g. for 6/16, are rounded down, so that minimal
+    weights computed with them are lower bounds.
+    """
+    n = getSboxSize(sbox)
+    if linear:
+        table, scale = np.abs(getLAT(sbox)), n - 1
+    else:
+        table, scale = getDDT(sbox), n
+    weights = {}
+    for a, b in zip(*np.nonzero(table)):
+        weight = (scale - math.log2(table[a][b])) * (1 << precision)
+        # Exact multiples must not be rounded down by the floating point error
+        weights[(int(a), int(b))] = math.floor(weight + 1e-9)
+    return weights
+
+
+def hasFractionalWeights(sbox: Tuple[int, ...], linear: bool = False) -> bool:
+    """
+    Whether some transitions of the S-box have a weight which is not an
+    integer.
+    """
+    table = np.abs(getLAT(sbox)) if linear else getDDT(sbox)
+    counts = table[table > 0]
+    return bool((counts & (counts - 1)).any())
+
+
+@functools.lru_cache(maxsize=None)
+def getSboxCNF(sbox: Tuple[int, ...], linear: bool = False) -> List[List[Tuple[int, int]]]:
+    """
+    Computes a minimized CNF for the valid transitions of an n-bit S-box
+    over the 3n variables (input, output, weight), most significant bit
+    first. The weight w, rounded down to an integer, is given by the w
+    least significant weight bits, see getFractionCNF for the rest.
+    A clause is a list of (variable, value) and excludes all assignments
+    with these values.
+    """
+    n = getSboxSize(sbox)
+    valid = set()
+    for (a, b), weight in getTransitionWeights(sbox, linear).items():
+        valid.add((a << 2*n) | (b << n) | ((1 << weight) - 1))
+    return _toClauses(minimizeCNF(valid, 3*n), 3*n)
+
+
+@functools.lru_cache(maxsize=None)
+def getFractionCNF(sbox: Tuple[int, ...], precision: int,
+                   linear: bool = False) -> List[List[Tuple[int, int]]]:
+    """
+    Computes a minimized CNF over the 2n + precision variables (input,
+    output, fraction), which sets the fraction bits to the fractional
+    part of the weight of each valid transition in multiples of
+    2^-precision. Invalid transitions are excluded by getSboxCNF, their
+    fraction bits are not constrained.
+    """
+    n = getSboxSize(sbox)
+    valid, ignore = set(), set()
+    weights = getTransitionWeights(sbox, linear, precision)
+    for a in range(1 << n):
+        for b in range(1 << n):
+            point = (a << (n + precision)) | (b << precision)
+            if (a, b) in weights:
+                valid.add(point | (weights[(a, b)] & ((1 << precision) - 1)))
+            else:
+                ignore.update(point | fraction for fraction in range(1 << precision))
+    num_vars = 2*n + precision
+    return _toClauses(minimizeCNF(valid, num_vars, ignore), num_vars)
+
+
+def _toClauses(cubes: List[Tuple[int, int]], num_vars: int) -> List[List[Tuple[int, int]]]:
+    return [[(num_vars - 1 - bit, (value >> bit) & 1) for bit in reversed(range(num_vars))
+             if (mask >> bit) & 1]
+            for mask, value in cubes]
+
+
+def minimizeCNF(valid: set, num_vars: int, ignore: Optional[set] = None) -> List[Tuple[int, int]]:
+    """
+    Covers all invalid assignments of num_vars bits with few cubes which
+    contain no valid assignment. Each cube (mask, value) gives the clause
+    which excludes it. Starting from the first uncovered assignment, the
+    literals of a cube are removed greedily as long as it contains no
+    valid assignment. Afterwards, cubes which are covered by the other
+    cubes are removed. The assignments in ignore do not have to be
+    covered, but cubes may contain them.
+    """
+    shape = (2,) * num_vars
+    points = np.zeros(1 << num_vars, dtype=bool)
+    points[list(valid)] = True
+    is_valid = points.reshape(shape)
+    # Valid, ignored or covered assignments
+    done = points.copy()
+    if ignore:
+        done[list(ignore)] = True
+    done_cube = done.reshape(shape)
+
+    cubes = set()
+    for start in range(0, len(done), _CHUNK):
+        while True:
+            uncovered = np.flatnonzero(~done[start:start + _CHUNK])
+            if len(uncovered) == 0:
+                break
+            point = start + int(uncovered[0])
+            # Two orders of removing literals give different prime implicants
+            for order in [range(num_vars), reversed(range(num_vars))]:
+                index = [(point >> (num_vars - 1 - i)) & 1 for i in range(num_vars)]
+                for i in order:
+                    literal = index[i]
+                    index[i] = slice(None)
+                    if is_valid[tuple(index)].any():
+                        index[i] = literal
+                done_cube[tuple(index)] = True
+                cubes.add(_toMask(index))
+
+    # Remove redundant cubes, starting with the smallest
+    count = np.zeros(shape, dtype=np.uint32)
+    if ignore:
+        # Ignored assignments never prevent removing a cube
+        count.reshape(-1)[list(ignore)] = 1 << 30
+    for cube in cubes:
+        count[_toIndex(cube, num_vars)] += 1
+    cover = []
+    for cube in sorted(cubes, key=lambda cube: (-bin(cube[0]).count("1"), cube)):
+        index = _toIndex(cube, num_vars)
+        if count[index].min() > 1:
+            count[index] -= 1
+        else:
+            cover.append(cube)
+    return cover
+
+
+def _toMask(index: List) -> Tuple[int, int]:
+    mask, value = 0, 0
+    for literal in index:
+        mask <<= 1
+        value <<= 1
+        if not isinstance(literal, slice):
+            mask |= 1
+            value |= literal
+    return (mask, value)
+
+
+def _toIndex(cube: Tuple[int, int], num_vars: int) -> Tuple:
+    mask, value = cube
+    return tuple((value >> bit) & 1 if (mask >> bit) & 1 else slice(None)
+                 for bit in reversed(range(num_vars)))
@@ -0,0 +1,81 @@
+'''
+Provides functions for constructing SMT-LIB2 commands that are sent to
+incremental solver sessions.
+'''
+
+import re
+from typing import Any, Dict
+
+from parser import ir
+
+
+def getWeightAssertion(weight: int, weightVariable: str = "weight") -> str:
+    """
+    Asserts that the 16-bit weight variable is equal to the given weight.
+    """
+    return f"(assert (= {weightVariable} #b{weight:016b}))"
+
+
+def getWeightBoundAssertion(weight: int, weightVariable: str = "weight") -> str:
+    """
+    Asserts that the 16-bit weight variable is at most the given weight.
+    """
+    return f"(assert (bvule {weightVariable} #b{weight:016b}))"
+
+
+def stripCommands(smtlib2: str) -> str:
+    """
+    Removes the commands which are issued by the session itself from a
+    SMT-LIB2 model, leaving only the declarations and assertions.
+    """
+    skip = ("(check-sat", "(get-model", "(get-value", "(exit")
+    lines = [line for line in smtlib2.splitlines()
+             if not line.strip().startswith(skip)]
+    return "\n".join(lines) + "\n"
+
+
+def getDeclaredVariables(smtlib2: str) -> Dict[str, int]:
+    """
+    Returns the names and bit widths of all variables declared in a
+    SMT-LIB2 model.
+    """
+    declarations = re.findall(r"\(declare-(?:fun|const)\s+\|?([a-zA-Z0-9_]+)\|?\s+(?:\(\)\s+)?"
+                              r"\(_\s+BitVec\s+([0-9]+)\)", smtlib2)
+    return {name: int(width) for name, width in declarations}
+
+
+def blockCharacteristic(characteristic: Any, widths: Dict[str, int], ignore_msbs: int = 0) -> str:
+    """
+    Returns an assertion that blocks the given characteristic. Works like
+    stpcommands.blockCharacteristic, but uses the declared bit widths.
+    """
+    distinct = []
+    for var, value in characteristic.characteristic_data.items():
+        # Weight variables are not blocked
+        if var.startswith('w') or value == "none" or var not in widths:
+            continue
+
+        width = widths[var]
+        bits = width - ignore_msbs if width > ignore_msbs else width
+        val_int = int(value.replace("0x", "").replace("#x", ""), 16) & ((1 << bits) - 1)
+        term = var if bits == width else f"((_ extract {bits - 1} 0) {var})"
+        distinct.append(f"(distinct {term} #b{val_int:0{bits}b})")
+
+    if not distinct:
+        return ""
+    if len(distinct) == 1:
+        return f"(assert {distinct[0]})"
+    return f"(assert (or {' '.join(distinct)}))"
+
+
+def translate(cvc: str, optimize: bool = False) -> str:
+    """
+    Translates a model in the STP CVC input language into SMT-LIB2. This
+    allows using SMT-LIB2 solvers without running STP with
+    --print-back-SMTLIB2. With optimize, the passes of parser.ir are run
+    on the model before printing it.
+    """
+    model = ir.parseCVC(cvc)
+    if optimize:
+        ir.optimize(model)
+    return ir.printSMTLIB2(model)
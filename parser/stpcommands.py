@@ -5,8 +5,22 @@ Provides functions for constructing the input file for STP.
 @author: stefan
 '''
 
-import itertools
-from typing import List, Dict, TextIO, Any
+import logging
+from typing import List, Dict, TextIO, Any, Optional
+
+from parser import sbox as sbox_engine
+from parser.sbox import getSboxCNF
+
+logger = logging.getLogger("cryptosmt")
+
+# Warnings which were printed already. Models are written for every
+# weight, each warning is printed once.
+warned = set()
+
+def _warn_once(message: str) -> None:
+    if message not in warned:
+        warned.add(message)
+        logger.warning(message)
 
 def blockCharacteristic(stpfile: TextIO, characteristic: Any, wordsize: int, ignore_msbs: int = 0) -> None:
     """
@@ -119,15 +133,53 @@ def getStringForNonZero(variables: List[str], wordsize: int) -> str:
     return command
 
 
-def setupWeightComputation(stpfile: TextIO, weight: int, p: List[str], wordsize: int, ignoreMSBs: int = 0, encoding: str = "bvplus") -> None:
+def setupWeightComputation(stpfile: TextIO, weight: Optional[int], p: List[str], wordsize: int, ignoreMSBs: int = 0, encoding: str = "bvplus",
+                           roundVariables: Optional[List[List[str]]] = None, roundBounds: Optional[List[int]] = None,
+                           fractions: Optional[List[str]] = None, precision: int = 0) -> None:
     """
     Assert that weight is equal to the sum of the hamming weight of p.
+    If weight is None the weight variable is left unconstrained, which
+    gives a weight-parametric model for incremental sessions. Its weight
+    is always computed with bvplus.
+    The matsui encoding needs the weight variables of each round in
+    roundVariables and uses the minimum weights roundBounds[i - 1] of
+    i rounds, see encodings.add_matsui_bounds. The other encodings only
+    add the lower bounds of setupRoundBounds.
+    fractions are the fractional S-box weights of addSbox, each given by
+    precision bits. The weight is then their sum added to the hamming
+    weight and rounded down, which is computed with bvplus and without
+    round bounds.
     """
     stpfile.write("weight: BITVECTOR(16);\n")
-    binary_weight = bin(weight)[2:].zfill(16)
-    stpfile.write(f"ASSERT(weight = 0bin{binary_weight});\n")
+    if fractions:
+        if encoding != "bvplus" or roundBounds:
+            _warn_once("Models with fractional S-box weights are summed with bvplus and without round bounds.")
+        stpfile.write(getFractionSum(fractions, precision) + "\n")
+        if weight is not None:
+            stpfile.write(getWeightAssertion(weight) + "\n")
+        fraction = f"0bin{'0' * precision}@weightfraction[15:{precision}]"
+        stpfile.write(getWeightString(p, wordsize, ignoreMSBs, fraction=fraction) + "\n")
+        return
+    if encoding == "matsui" and not roundVariables:
+        _warn_once("The matsui weight encoding needs the weight variables of each round, "
+                   "which this model does not provide. Using the sequential counter without round bounds.")
+    if roundBounds and roundVariables and (encoding != "matsui" or weight is None):
+        setupRoundBounds(stpfile, roundVariables, wordsize, ignoreMSBs, roundBounds)
+    if weight is None:
+        # The sorter/totalizer encodings need a concrete weight
+        if encoding not in ["bvplus", "matsui"]:
+            _warn_once(f"The {encoding} weight encoding needs a fixed weight, "
+                       f"the weight-parametric model uses bvplus.")
+        stpfile.write(getWeightString(p, wordsize, ignoreMSBs) + "\n")
+        return
+    stpfile.write(getWeightAssertion(weight) + "\n")
 
-    if encoding in ["sorter", "totalizer"]:
+    if encoding == "matsui" and roundVariables:
+        from . import encodings
+        round_bits = [[f"{var}[{bit}:{bit}]" for var in variables for bit in range(wordsize - ignoreMSBs)]
+                      for variables in roundVariables]
+        encodings.add_matsui_bounds(stpfile, round_bits, weight, roundBounds or [], "w_enc")
+    elif encoding in ["sorter", "totalizer", "seqcounter", "matsui"]:
         from . import encodings
         bits = []
         for var in p:
@@ -139,6 +191,29 @@ def setupWeightComputation(stpfile: TextIO, weight: int, p: List[str], wordsize:
     return
 
 
+def setupRoundBounds(stpfile: TextIO, roundVariables: List[List[str]], wordsize: int, ignoreMSBs: int,
+                     roundBounds: List[Optional[int]]) -> None:
+    """
+    Asserts that any i consecutive rounds weigh at least roundBounds[i - 1],
+    the minimum weight B_i of i rounds. The hamming weight of the weight
+    variables of round r is computed in roundweight<r>.
+    """
+    rounds = len(roundVariables)
+    names = [f"roundweight{r}" for r in range(rounds)]
+    setupVariables(stpfile, names, 16)
+    for name, variables in zip(names, roundVariables):
+        stpfile.write(getWeightString(variables, wordsize, ignoreMSBs, name) + "\n")
+    for length in range(1, min(rounds, len(roundBounds)) + 1):
+        if not roundBounds[length - 1]:
+            continue
+        binary_bound = bin(roundBounds[length - 1])[2:].zfill(16)
+        for start in range(rounds - length + 1):
+            window = names[start:start + length]
+            total = f"BVPLUS(16,{','.join(window)})" if length > 1 else window[0]
+            stpfile.write(f"ASSERT(BVGE({total}, 0bin{binary_bound}));\n")
+    return
+
+
 def limitWeight(stpfile: TextIO, weight: int, p: List[str], wordsize: int, ignoreMSBs: int = 0, encoding: str = "bvplus") -> None:
     """
     Adds the weight computation and assertion to the stp stpfile.
@@ -146,7 +221,7 @@ def limitWeight(stpfile: TextIO, weight: int, p: List[str], wordsize: int, ignor
     stpfile.write("limitWeight: BITVECTOR(16);\n")
     binary_weight = bin(weight)[2:].zfill(16)
     
-    if encoding in ["sorter", "totalizer"]:
+    if encoding in ["sorter", "totalizer", "seqcounter", "matsui"]:
         from . import encodings
         bits = []
         for var in p:
@@ -158,34 +233,72 @@ def limitWeight(stpfile: TextIO, weight: int, p: List[str], wordsize: int, ignor
         stpfile.write(f"ASSERT(BVLE(limitWeight, 0bin{binary_weight}));\n")
     return
 
-def setupWeightComputationSum(stpfile: TextIO, weight: int, p: List[str], wordsize: int, ignoreMSBs: int = 0, encoding: str = "bvplus") -> None:
+def setupWeightComputationSum(stpfile: TextIO, weight: Optional[int], p: List[str], wordsize: int, ignoreMSBs: int = 0, encoding: str = "bvplus",
+                              roundBounds: Optional[List[int]] = None) -> None:
     """
-    Assert that weight is equal to the sum of p.
+    Assert that weight is equal to the sum of p, the 16-bit weights of the
+    rounds. If weight is None the weight variable is left unconstrained.
+    The weights are added with BVPLUS, the bit-level encodings do not apply
+    to them. With roundBounds, any i consecutive rounds weigh at least
+    roundBounds[i - 1]. As the sum is exact, this also bounds the weight
+    of the other rounds as the matsui encoding does.
     """
     stpfile.write("weight: BITVECTOR(16);\n")
-    binary_weight = bin(weight)[2:].zfill(16)
-    stpfile.write(f"ASSERT(weight = 0bin{binary_weight});\n")
-
-    if encoding in ["sorter", "totalizer"]:
-        from . import encodings
-        bits = []
-        for var in p:
-            for bit in range(wordsize - ignoreMSBs):
-                bits.append(f"{var}[{bit}:{bit}]")
-        encodings.add_weight_constraint(stpfile, bits, weight, "w_sum_enc", encoding, equal=True)
+    if weight is not None:
+        stpfile.write(getWeightAssertion(weight) + "\n")
+    if encoding not in ["bvplus", "matsui"]:
+        _warn_once(f"The {encoding} weight encoding does not apply to a sum of round weights, using bvplus.")
+    if encoding == "matsui" and not roundBounds:
+        _warn_once("The matsui weight encoding has no effect without --roundbounds.")
+
+    round_sum = ",".join(p)
+    if len(p) > 1:
+        stpfile.write(f"ASSERT(weight = BVPLUS(16,{round_sum}));\n")
     else:
-        round_sum = ",".join(p)
-        if len(p) > 1:
-            stpfile.write(f"ASSERT(weight = BVPLUS(16,{round_sum}));\n")
-        else:
-            stpfile.write(f"ASSERT(weight = {round_sum});\n")
+        stpfile.write(f"ASSERT(weight = {round_sum});\n")
+
+    for length in range(1, min(len(p), len(roundBounds or [])) + 1):
+        if not roundBounds[length - 1]:
+            continue
+        binary_bound = bin(roundBounds[length - 1])[2:].zfill(16)
+        for start in range(len(p) - length + 1):
+            window = p[start:start + length]
+            total = f"BVPLUS(16,{','.join(window)})" if length > 1 else window[0]
+            stpfile.write(f"ASSERT(BVGE({total}, 0bin{binary_bound}));\n")
     return
 
 
-def getWeightString(variables: List[str], wordsize: int, ignoreMSBs: int = 0, weightVariable: str = "weight") -> str:
+def getWeightAssertion(weight: int, weightVariable: str = "weight") -> str:
+    """
+    Asserts that the 16-bit weight variable is equal to the given weight.
+    """
+    binary_weight = bin(weight)[2:].zfill(16)
+    return f"ASSERT({weightVariable} = 0bin{binary_weight});"
+
+
+def getWeightBoundAssertion(weight: int, weightVariable: str = "weight") -> str:
+    """
+    Asserts that the 16-bit weight variable is at most the given weight.
+    """
+    binary_weight = bin(weight)[2:].zfill(16)
+    return f"ASSERT(BVLE({weightVariable}, 0bin{binary_weight}));"
+
+
+def getFractionSum(fractions: List[str], precision: int, fractionVariable: str = "weightfraction") -> str:
+    """
+    Declares the 16-bit sum of the fractional weights, each given by
+    precision bits in multiples of 2^-precision.
+    """
+    terms = "".join(f"0bin{'0' * (16 - precision)}@({term})," for term in fractions)
+    return (f"{fractionVariable}: BITVECTOR(16);\n"
+            f"ASSERT({fractionVariable} = BVPLUS(16,{terms}0bin{'0' * 16}));")
+
+
+def getWeightString(variables: List[str], wordsize: int, ignoreMSBs: int = 0, weightVariable: str = "weight",
+                    fraction: Optional[str] = None) -> str:
     """
     Asserts that the weight is equal to the hamming weight of the
-    given variables.
+    given variables, plus the 16-bit term fraction if given.
     """
     command = f"ASSERT(({weightVariable} = BVPLUS(16,"
     for var in variables:
@@ -195,6 +308,8 @@ def getWeightString(variables: List[str], wordsize: int, ignoreMSBs: int = 0, we
         if (wordsize - ignoreMSBs) == 1:
             tmp += "0bin0,"
         command += tmp[:-1] + ")),"
+    if fraction is not None:
+        command += fraction + ","
     if len(variables):
         command += "0bin0000000000000000,"
     command = command[:-1]
@@ -215,6 +330,16 @@ def getStringAdd(a: str, b: str, c: str, wordsize: int) -> str:
     command += f" = 0bin{'0' * wordsize})"
     return command
 
+def getStringXORn(variables: List[str]) -> str:
+    """
+    XOR of all variables.
+    """
+    command = variables[0]
+    for variable in variables[1:]:
+        command = f"BVXOR({command}, {variable})"
+    return command
+
+
 def getStringForAndDifferential(a: str, b: str, c: str) -> str:
     """
     AND = valid(x,y,out) = (x and out) or (y and out) or (not out)
@@ -237,48 +362,61 @@ def getStringRightRotate(value: str, rotation: int, wordsize: int) -> str:
     command = f"((({value} >> {rotation % wordsize})[{wordsize - 1}:0]) | (({value} << {(wordsize - rotation) % wordsize})[{wordsize - 1}:0]))"
     return command
 
-def add4bitSbox(sbox: List[int], variables: List[str]) -> str:
+def addSbox(sbox: List[int], variables: List[str], linear: bool = False,
+            fraction: Optional[List[str]] = None) -> str:
+    """
+    Adds the constraints for an n-bit S-box and the weight. The variables
+    are the n input, n output and n weight bits, most significant bit
+    first. The transitions are taken from the DDT, or with linear from
+    the LAT, see sbox.getSboxCNF. The weight bits hold the weight rounded
+    down to an integer. The bits of fraction, most significant bit first,
+    hold the rest in multiples of 2^-len(fraction), see
+    sbox.getFractionCNF. Without them the weight is rounded down.
+    """
+    n = sbox_engine.getSboxSize(tuple(sbox))
+    assert(len(variables) == 3*n)
+
+    command = _getCNFAssertion(getSboxCNF(tuple(sbox), linear), variables)
+    if fraction:
+        clauses = sbox_engine.getFractionCNF(tuple(sbox), len(fraction), linear)
+        command += _getCNFAssertion(clauses, variables[:2*n] + list(fraction))
+    return command
+
+
+def _getCNFAssertion(clauses: List[List[Any]], variables: List[str]) -> str:
+    cnf = []
+    for clause in clauses:
+        literals = [f"~{variables[i]}" if value else variables[i] for i, value in clause]
+        cnf.append(f"({' | '.join(literals)})")
+    return f"ASSERT({' & '.join(cnf)} = 0bin1);\n"
+
+
+def add4bitSbox(sbox: List[int], variables: List[str], fraction: Optional[List[str]] = None) -> str:
     """
-    Adds the constraints for the S-box and the weight.
+    Adds the constraints for the S-box and the weight. Weights of
+    transitions with a probability which is not a power of two are
+    rounded down, see addSbox for the fraction bits.
     """
     assert(len(sbox) == 16)
     assert(len(variables) == 12)
+    return addSbox(sbox, variables, fraction=fraction)
 
-    DDT = [[0]*16 for i in range(16)]
-    for a in range(16):
-        for b in range(16):
-            DDT[a ^ b][sbox[a] ^ sbox[b]] += 1
-
-    trails = []
-    for input_diff in range(16):
-        for output_diff in range(16):
-            if DDT[input_diff][output_diff] != 0:
-                tmp = []
-                tmp.append((input_diff >> 3) & 1)
-                tmp.append((input_diff >> 2) & 1)
-                tmp.append((input_diff >> 1) & 1)
-                tmp.append((input_diff >> 0) & 1)
-                tmp.append((output_diff >> 3) & 1)
-                tmp.append((output_diff >> 2) & 1)
-                tmp.append((output_diff >> 1) & 1)
-                tmp.append((output_diff >> 0) & 1)
-                if DDT[input_diff][output_diff] == 2:
-                    tmp += [0, 1, 1, 1]
-                elif DDT[input_diff][output_diff] == 4:
-                    tmp += [0, 0, 1, 1]
-                elif DDT[input_diff][output_diff] == 8:
-                    tmp += [0, 0, 0, 1]
-                elif DDT[input_diff][output_diff] == 16:
-                    tmp += [0, 0, 0, 0]
-                trails.append(tmp)
-
-    cnf = ""
-    for prod in itertools.product([0, 1], repeat=len(trails[0])):
-        if list(prod) not in trails:
-            expr = ["~" if x == 1 else "" for x in list(prod)]
-            clause = ""
-            for literal in range(12):
-                clause += f"{expr[literal]}{variables[literal]} | "
-            cnf += f"({clause[:-2]}) &"
-
-    return f"ASSERT({cnf[:-2]} = 0bin1);\n"
+
+def add4bitSboxNibbles(sbox: List[int], a: str, b: str, w: str) -> str:
+    """
+    Adds the constraints for the S-box with the 4-bit variables a as
+    input, b as output and w as weight.
+    """
+    variables = [f"{var}[{bit}:{bit}]" for var in [a, b, w] for bit in reversed(range(4))]
+    return add4bitSbox(sbox, variables)
+
+
+def add8bitSbox(sbox: List[int], variables: List[str], fraction: Optional[List[str]] = None) -> str:
+    """
+    Adds the constraints for an 8-bit S-box and the weight. Weights of
+    transitions with a probability which is not a power of two are
+    rounded down, see addSbox for the fraction bits.
+    """
+    assert(len(sbox) == 256)
+    assert(len(variables) == 24)
+    return addSbox(sbox, variables, fraction=fraction)
@@ -1,18 +1,54 @@
-
+import os
+import shutil
 from .stp import STPSolver
-from .bitwuzla import BitwuzlaSolver
+from .bitwuzla import BitwuzlaSolver, BitwuzlaAPISolver
 from .boolector import BoolectorSolver
-from .cvc5 import CVC5Solver
-from config import PATH_STP, PATH_BITWUZLA, PATH_BOOLECTOR, PATH_CVC5
+from .cvc5 import CVC5Solver, CVC5APISolver
+from .sat import PySATSolver
+from .dimacs import DIMACSSolver
+from .portfolio import PortfolioSolver
+from .cache import ResultCache, CachedSolver
+from config import PATH_STP, PATH_BITWUZLA, PATH_BOOLECTOR, PATH_CVC5, PYSAT_SOLVER, RESULT_CACHE_SIZE, \
+    PATH_CRYPTOMINISAT
 
 def get_solver(parameters):
+    solver = _select_solver(parameters)
+    if parameters.get("cachedir"):
+        cache = ResultCache(parameters["cachedir"], parameters.get("cachesize") or RESULT_CACHE_SIZE)
+        return CachedSolver(solver, cache)
+    return solver
+
+def _select_solver(parameters):
+    # Per-query limits and the deadline of the search
+    limits = (parameters.get("solvertimeout"), parameters.get("solvermemory"),
+              parameters.get("deadline"))
+    if parameters.get("portfolio"):
+        return get_portfolio(limits)
     # If STP is explicitly requested, or if no other solver is specified
     if parameters.get("stp"):
-        return STPSolver(PATH_STP)
+        return STPSolver(PATH_STP, *limits)
+    if parameters.get("pysat"):
+        return PySATSolver(PYSAT_SOLVER, *limits)
+    if parameters.get("cryptominisat"):
+        return DIMACSSolver(PATH_CRYPTOMINISAT, *limits)
+    if parameters.get("bitwuzla") and parameters.get("inprocess"):
+        return BitwuzlaAPISolver(PATH_BITWUZLA, *limits)
     if parameters.get("bitwuzla"):
-        return BitwuzlaSolver(PATH_BITWUZLA)
+        return BitwuzlaSolver(PATH_BITWUZLA, *limits)
     if parameters.get("boolector"):
-        return BoolectorSolver(PATH_BOOLECTOR)
+        return BoolectorSolver(PATH_BOOLECTOR, *limits)
+    if parameters.get("cvc5") and parameters.get("inprocess"):
+        return CVC5APISolver(PATH_CVC5, *limits)
     if parameters.get("cvc5"):
-        return CVC5Solver(PATH_CVC5)
-    return STPSolver(PATH_STP)
+        return CVC5Solver(PATH_CVC5, *limits)
+    return STPSolver(PATH_STP, *limits)
+
+def get_portfolio(limits=(None, None, None)):
+    """
+    Portfolio of all solvers which are installed.
+    """
+    candidates = [STPSolver(PATH_STP, *limits), BitwuzlaSolver(PATH_BITWUZLA, *limits),
+                  BoolectorSolver(PATH_BOOLECTOR, *limits), CVC5Solver(PATH_CVC5, *limits)]
+    members = [solver for solver in candidates
+               if os.path.exists(solver.path) or shutil.which(solver.path)]
+    return PortfolioSolver(members or candidates[:1])
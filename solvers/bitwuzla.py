@@ -1,18 +1,17 @@
 
-import subprocess
 import logging
-from .solver import AbstractSolver, SolverResult
-from parser import parsesolveroutput
-from config import PATH_STP
+import time
+from .solver import AbstractSolver, SolverResult, SAT, UNSAT, UNKNOWN
+from .inprocess import InProcessSolver
+from parser import parsesolveroutput, smtlib2
 
 logger = logging.getLogger("cryptosmt")
 
 class BitwuzlaSolver(AbstractSolver):
+    flags = ["-m", "--bv-output-format", "16"]
+
     def solve(self, stp_file: str) -> SolverResult:
-        # Create input file with help of STP
-        stp_parameters = [PATH_STP, "--print-back-SMTLIB2", stp_file, "--CVC"]
-        logger.debug(f"Generating SMTLIB2 for Bitwuzla using STP...")
-        input_file = subprocess.check_output(stp_parameters)
+        input_file = self._smtlib2_model(stp_file).encode("utf-8")
 
         # Bitwuzla requires (check-sat) and (get-model)
         if b"(check-sat)" not in input_file:
@@ -20,22 +19,64 @@ class BitwuzlaSolver(AbstractSolver):
         if b"(get-model)" not in input_file:
             input_file += b"\n(get-model)\n"
 
-        bitwuzla_parameters = [self.path, "-m", "--bv-output-format", "16"]
+        bitwuzla_parameters = [self.path] + self.flags
         logger.debug(f"Solving with Bitwuzla...")
-        bitwuzla_process = subprocess.Popen(bitwuzla_parameters,
-                                            stdout=subprocess.PIPE,
-                                            stdin=subprocess.PIPE,
-                                            stderr=subprocess.PIPE)
-
-        result, err = bitwuzla_process.communicate(input=input_file)
-        decoded_result = result.decode("utf-8")
+        returncode, decoded_result = self._run(bitwuzla_parameters, input=input_file)
         
         # Prepend 'sat' if it's missing but Bitwuzla found a model
         if "(define-fun" in decoded_result and "sat" not in decoded_result:
             decoded_result = "sat\n" + decoded_result
         
-        is_sat = self._found_solution(decoded_result)
-        return SolverResult(is_sat, decoded_result)
+        return self._result(decoded_result)
+
+    def session_command(self):
+        return [self.path] + self.flags
 
     def parse_characteristic(self, result: SolverResult, cipher, rounds):
         return parsesolveroutput.getCharBitwuzlaOutput(result.raw_output, cipher, rounds)
+
+
+class BitwuzlaAPISolver(InProcessSolver):
+    """
+    Bitwuzla through its Python bindings.
+    """
+    package = "bitwuzla"
+
+    def _load(self, model: str):
+        import bitwuzla
+        options = bitwuzla.Options()
+        options.set(bitwuzla.Option.PRODUCE_MODELS, True)
+        if self.memory is not None:
+            options.set(bitwuzla.Option.MEMORY_LIMIT, self.memory)
+        parser = bitwuzla.Parser(bitwuzla.TermManager(), options)
+        parser.parse(smtlib2.stripCommands(model), True, False)
+        return parser
+
+    def _add(self, parser, assertion: str) -> None:
+        parser.parse(assertion, True, False)
+
+    def _push(self, parser) -> None:
+        parser.bitwuzla().push(1)
+
+    def _pop(self, parser) -> None:
+        parser.bitwuzla().pop(1)
+
+    def _check(self, parser) -> SolverResult:
+        import bitwuzla
+        solver = parser.bitwuzla()
+        timeout = self.query_timeout()
+        stop = time.time() + timeout if timeout is not None else None
+        solver.configure_terminator(
+            lambda: self._cancelled or (stop is not None and time.time() > stop))
+        logger.debug(f"Solving with the Bitwuzla bindings...")
+        result = solver.check_sat()
+        if result == bitwuzla.Result.UNSAT:
+            return self._make_result(UNSAT)
+        if result != bitwuzla.Result.SAT:
+            return self._make_result(UNKNOWN)
+        values, widths = {}, {}
+        for term in parser.get_declared_funs():
+            name = str(term.symbol())
+            values[name] = int(solver.get_value(term).value(10))
+            widths[name] = term.sort().bv_size()
+        return self._make_result(SAT, values, widths)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Callable, List, Optional, Tuple
+from .solver import AbstractSolver, SolverResult
+
+logger = logging.getLogger("cryptosmt")
+
+class ResultCache:
+    """
+    Persistent cache of solver results in a SQLite database. Entries are
+    addressed by a hash of the model, the solver identity and the query
+    type. If the cache grows beyond max_size megabytes, the least recently
+    used entries are removed.
+    """
+    def __init__(self, directory: str, max_size: int = 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "results.sqlite")
+        self.max_size = max_size * 1024 * 1024
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS results ("
+                       "key TEXT PRIMARY KEY, status TEXT, raw_output TEXT, solver TEXT, "
+                       "solver_values TEXT, widths TEXT, count INTEGER, "
+                       "size INTEGER, last_used REAL)")
+
+    @staticmethod
+    def key(model: str, identity: str, query: str = "solve") -> str:
+        digest = hashlib.sha256()
+        for part in [query, identity, model]:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_result(self, key: str) -> Optional[SolverResult]:
+        row = self._get(key, "status, raw_output, solver, solver_values, widths")
+        if row is None:
+            return None
+        status, raw_output, solver, values, widths = row
+        result = SolverResult(status == "sat", raw_output, status=status)
+        result.values = json.loads(values) if values else None
+        result.widths = json.loads(widths) if widths else None
+        # Name of the solver class which produced the output, see CachedSolver
+        result.solver_name = solver
+        return result
+
+    def put_result(self, key: str, result: SolverResult) -> None:
+        solver = type(result.solver).__name__ if result.solver is not None else None
+        values = json.dumps(result.values) if result.values is not None else None
+        widths = json.dumps(result.widths) if result.widths is not None else None
+        size = len(result.raw_output) + len(values or "") + len(widths or "")
+        self._put(key, (result.status, result.raw_output, solver, values, widths, None, size))
+
+    def get_count(self, key: str) -> Optional[int]:
+        row = self._get(key, "count")
+        return row[0] if row is not None else None
+
+    def put_count(self, key: str, count: int) -> None:
+        self._put(key, (None, None, None, None, None, count, 0))
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60)
+
+    def _get(self, key: str, columns: str):
+        with self._connect() as db:
+            row = db.execute(f"SELECT {columns} FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row
+
+    def _put(self, key: str, entry) -> None:
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (key,) + tuple(entry) + (time.time(),))
+            self._evict(db)
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        # Row overhead is small compared to the solver output
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_size:
+            return
+        removed = 0
+        for key, size in db.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+            if total - removed <= self.max_size * 0.9:
+                break
+            db.execute("DELETE FROM results WHERE key = ?", (key,))
+            removed += size
+        logger.debug(f"Removed {removed} bytes of old entries from the result cache")
+
+
+class CachedSolver(AbstractSolver):
+    """
+    Looks up the results of a solver in a ResultCache before running it.
+    Results which are UNKNOWN depend on the limits and are not stored.
+    Incremental sessions are not cached. Counts with a sat_logfile are
+    always counted again, as the log is not cached.
+    """
+    def __init__(self, solver: AbstractSolver, cache: ResultCache):
+        super().__init__(solver.path, solver.timeout, solver.memory, solver.deadline)
+        self.solver = solver
+        self.cache = cache
+        if hasattr(solver, "solve_and_count"):
+            self.solve_and_count = self._solve_and_count
+
+    def solve(self, stp_file: str) -> SolverResult:
+        key = self._key(stp_file, "solve")
+        result = self.cache.get_result(key)
+        if result is not None:
+            logger.debug(f"Using cached result for {stp_file}")
+            result.solver = self._member(result.solver_name)
+            return result
+        result = self.solver.solve(stp_file)
+        if not result.is_unknown:
+            self.cache.put_result(key, result)
+        return result
+
+    def _solve_and_count(self, stp_file: str, sat_logfile: Optional[str] = None, approxmc: bool = False,
+                         projection: Optional[List[str]] = None,
+                         progress: Optional[Callable[[int], None]] = None,
+                         tolerance: Optional[Tuple[float, float]] = None) -> int:
+        query = "approxmc" if approxmc else "count"
+        if approxmc and tolerance is not None:
+            query += f" {tolerance[0]} {tolerance[1]}"
+        if projection is not None:
+            query += " " + " ".join(projection)
+        key = self._key(stp_file, query)
+        count = self.cache.get_count(key) if sat_logfile is None else None
+        if count is not None:
+            logger.debug(f"Using cached count for {stp_file}")
+            self.count_complete = True
+            return count
+        count = self.solver.solve_and_count(stp_file, sat_logfile, approxmc=approxmc,
+                                            projection=projection, progress=progress, tolerance=tolerance)
+        self.count_complete = getattr(self.solver, "count_complete", False)
+        # Interrupted counts are only lower bounds
+        if self.count_complete:
+            self.cache.put_count(key, count)
+        return count
+
+    def parse_characteristic(self, result: SolverResult, cipher, rounds):
+        return self.solver.parse_characteristic(result, cipher, rounds)
+
+    def identity(self) -> str:
+        return self.solver.identity()
+
+    def open_session(self, stp_file: str):
+        return self.solver.open_session(stp_file)
+
+    def copy(self) -> "CachedSolver":
+        return CachedSolver(self.solver.copy(), self.cache)
+
+    def cancel(self) -> None:
+        super().cancel()
+        self.solver.cancel()
+
+    def _key(self, stp_file: str, query: str) -> str:
+        with open(stp_file, "r") as f:
+            return ResultCache.key(f.read(), self.solver.identity(), query)
+
+    def _member(self, name: Optional[str]) -> Optional[AbstractSolver]:
+        # Results of a portfolio are parsed by the solver which produced them
+        for member in getattr(self.solver, "members", []):
+            if type(member).__name__ == name:
+                return member
+        return None
@@ -1,22 +1,20 @@
 
-import subprocess
 import logging
-from .solver import AbstractSolver, SolverResult
-from parser import parsesolveroutput
-from config import PATH_STP
+from .solver import AbstractSolver, SolverResult, SAT, UNSAT, UNKNOWN
+from .inprocess import InProcessSolver
+from parser import parsesolveroutput, smtlib2
 
 logger = logging.getLogger("cryptosmt")
 
 class CVC5Solver(AbstractSolver):
+    flags = ["--lang", "smt2", "--produce-models", "--bitblast=eager"]
+
     def solve(self, stp_file: str) -> SolverResult:
-        # Create input file with help of STP
-        stp_parameters = [PATH_STP, "--print-back-SMTLIB2", stp_file, "--CVC"]
-        logger.debug(f"Generating SMTLIB2 for CVC5 using STP...")
         try:
-            input_file = subprocess.check_output(stp_parameters)
-        except subprocess.CalledProcessError as e:
-            logger.error(f"STP failed to generate SMTLIB2: {e}")
-            return SolverResult(False, str(e))
+            input_file = self._smtlib2_model(stp_file).encode("utf-8")
+        except ValueError as e:
+            logger.error(f"Failed to translate {stp_file} to SMTLIB2: {e}")
+            return SolverResult(False, str(e), status=UNKNOWN)
 
         # CVC5 requires (check-sat) and (get-model) if not present
         if b"(check-sat)" not in input_file:
@@ -24,23 +22,72 @@ class CVC5Solver(AbstractSolver):
         if b"(get-model)" not in input_file:
             input_file += b"\n(get-model)\n"
 
-        cvc5_parameters = [self.path, "--lang", "smt2", "--produce-models", "--bitblast=eager"]
+        cvc5_parameters = [self.path] + self.flags
         logger.debug(f"Solving with CVC5...")
-        cvc5_process = subprocess.Popen(cvc5_parameters,
-                                        stdout=subprocess.PIPE,
-                                        stdin=subprocess.PIPE,
-                                        stderr=subprocess.PIPE)
-
-        result, err = cvc5_process.communicate(input=input_file)
-        decoded_result = result.decode("utf-8")
+        returncode, decoded_result = self._run(cvc5_parameters, input=input_file)
         
         # Prepend 'sat' if it's missing but CVC5 found a model
         if "(define-fun" in decoded_result and "sat" not in decoded_result:
             decoded_result = "sat\n" + decoded_result
         
-        is_sat = self._found_solution(decoded_result)
-        return SolverResult(is_sat, decoded_result)
+        return self._result(decoded_result)
+
+    def session_command(self):
+        # Eager bit-blasting is not available in incremental mode
+        return [self.path, "--lang", "smt2", "--incremental", "--produce-models"]
 
     def parse_characteristic(self, result: SolverResult, cipher, rounds):
         # Bitwuzla uses the same SMTLIB2 output format for models
         return parsesolveroutput.getCharBitwuzlaOutput(result.raw_output, cipher, rounds)
+
+
+class CVC5APISolver(InProcessSolver):
+    """
+    CVC5 through its Python bindings. A running query can not be
+    cancelled, it stops at the timeout.
+    """
+    package = "cvc5"
+
+    def _load(self, model: str):
+        import cvc5
+        term_manager = cvc5.TermManager()
+        solver = cvc5.Solver(term_manager)
+        solver.setOption("produce-models", "true")
+        solver.setOption("incremental", "true")
+        context = (solver, cvc5.SymbolManager(term_manager))
+        self._add(context, smtlib2.stripCommands(model))
+        return context
+
+    def _add(self, context, assertion: str) -> None:
+        import cvc5
+        solver, symbols = context
+        parser = cvc5.InputParser(solver, symbols)
+        parser.setStringInput(cvc5.InputLanguage.SMT_LIB_2_6, assertion, "cryptosmt")
+        while True:
+            command = parser.nextCommand()
+            if command.isNull():
+                break
+            command.invoke(solver, symbols)
+
+    def _push(self, context) -> None:
+        context[0].push(1)
+
+    def _pop(self, context) -> None:
+        context[0].pop(1)
+
+    def _check(self, context) -> SolverResult:
+        solver, symbols = context
+        timeout = self.query_timeout()
+        # A limit of 0 disables the timeout in CVC5
+        solver.setOption("tlimit-per", str(max(int(timeout * 1000), 1)) if timeout is not None else "0")
+        logger.debug(f"Solving with the CVC5 bindings...")
+        result = solver.checkSat()
+        if result.isUnsat():
+            return self._make_result(UNSAT)
+        if not result.isSat():
+            return self._make_result(UNKNOWN)
+        values, widths = {}, {}
+        for term in symbols.getDeclaredTerms():
+            values[str(term)] = int(solver.getValue(term).getBitVectorValue(10))
+            widths[str(term)] = term.getSort().getBitVectorSize()
+        return self._make_result(SAT, values, widths)
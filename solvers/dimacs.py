@@ -0,0 +1,326 @@
+import logging
+import os
+import random
+import subprocess
+import threading
+from typing import Callable, Iterator, List, Optional, Tuple
+from .solver import AbstractSolver, SolverResult, SAT, UNSAT, UNKNOWN, start_process, kill_process
+from parser import parsesolveroutput
+from parser.cnf import CNFBuilder
+from config import PATH_CRYPTOMINISAT, PATH_APPROXMC, MAX_CHARACTERISTICS, CRYPTOMINISAT_PROJECTION
+
+logger = logging.getLogger("cryptosmt")
+
+# Bytes read at once from the output of CryptoMiniSat
+_CHUNK = 1 << 20
+# Line printed by CryptoMiniSat for every solution
+_SOLUTION = b"s SATISFIABLE"
+
+class DIMACSCounter:
+    """
+    Counts the solutions of a model with CryptoMiniSat or ApproxMC. The
+    model is bit-blasted into DIMACS CNF directly, and the mapping of the
+    characteristic bits to CNF variables is kept to decode the solutions.
+    Mixin for solvers derived from AbstractSolver.
+    """
+
+    def write_cnf(self, stp_file: str, cnf_file: str,
+                  projection: Optional[List[str]] = None) -> CNFBuilder:
+        """
+        Bit-blasts the STP file into cnf_file and returns the builder,
+        which decodes the models of the SAT solver. The bits of the
+        variables in projection are written as sampling set.
+        """
+        builder = CNFBuilder()
+        builder.add_smtlib2(self._smtlib2_model(stp_file))
+        with open(cnf_file, "w") as f:
+            f.write(builder.dimacs(projection))
+        logger.debug(f"Wrote CNF with {builder.num_vars} variables and {len(builder.clauses)} clauses to {cnf_file}")
+        return builder
+
+    def solve_and_count(self, stp_file: str, sat_logfile: Optional[str] = None, approxmc: bool = False,
+                        projection: Optional[List[str]] = None,
+                        progress: Optional[Callable[[int], None]] = None,
+                        tolerance: Optional[Tuple[float, float]] = None) -> int:
+        """
+        Counts the solutions of the STP file, exactly with CryptoMiniSat or
+        approximately with ApproxMC. With a projection, solutions which
+        only differ in other variables are counted once, e.g. auxiliary
+        variables of the weight encoding. The solver output, including all
+        models, is written to sat_logfile if it is given. progress is called
+        with the number of solutions found so far. tolerance is the pair
+        (epsilon, delta) of ApproxMC, its defaults are used if it is None.
+        """
+        cnf_file = f"tmp/{os.path.basename(stp_file)}_{random.randrange(16**8):08x}.cnf"
+        try:
+            builder = self.write_cnf(stp_file, cnf_file, projection)
+            return self._count(cnf_file, sat_logfile, approxmc, progress, tolerance,
+                               _projected(builder, projection))
+        finally:
+            if os.path.isfile(cnf_file):
+                os.remove(cnf_file)
+
+    def write_weight_cnf(self, stp_file: str, cnf_file: str,
+                         projection: Optional[List[str]] = None) -> "WeightCNF":
+        """
+        Bit-blasts a weight-parametric model once, the solutions of each
+        weight are then counted with count_weight.
+        """
+        builder = self.write_cnf(stp_file, cnf_file, projection)
+        return WeightCNF(cnf_file, builder.variables["weight"], builder.true, _projected(builder, projection))
+
+    def count_weight(self, cnf: "WeightCNF", weight: int, sat_logfile: Optional[str] = None,
+                     approxmc: bool = False, progress: Optional[Callable[[int], None]] = None,
+                     tolerance: Optional[Tuple[float, float]] = None) -> int:
+        """
+        Counts the solutions of the given weight, see solve_and_count. The
+        CNF is not modified, so that several processes can count different
+        weights at once.
+        """
+        units = cnf.units(weight)
+        if units is None:
+            self.count_complete = True
+            return 0
+        weight_file = f"{os.path.splitext(cnf.path)[0]}_w{weight}_{random.randrange(16**8):08x}.cnf"
+        try:
+            cnf.write(weight_file, units)
+            return self._count(weight_file, sat_logfile, approxmc, progress, tolerance, cnf.projected)
+        finally:
+            if os.path.isfile(weight_file):
+                os.remove(weight_file)
+
+    def enumerate_characteristics(self, stp_file: str, cipher, rounds: int,
+                                  limit: int = MAX_CHARACTERISTICS,
+                                  projection: Optional[List[str]] = None) -> Iterator:
+        """
+        Yields the solutions of the STP file as characteristics, up to
+        limit many.
+        """
+        cnf_file = f"tmp/{os.path.basename(stp_file)}_{random.randrange(16**8):08x}.cnf"
+        try:
+            builder = self.write_cnf(stp_file, cnf_file, projection)
+            for model in self._enumerate(cnf_file, limit, _projected(builder, projection)):
+                values = builder.values(model)
+                widths = {name: builder.widths[name] for name in values}
+                yield parsesolveroutput.getCharFromValues(values, widths, cipher, rounds)
+        finally:
+            if os.path.isfile(cnf_file):
+                os.remove(cnf_file)
+
+    def _count(self, cnf_file: str, sat_logfile: Optional[str], approxmc: bool,
+               progress: Optional[Callable[[int], None]],
+               tolerance: Optional[Tuple[float, float]] = None, projected: bool = False) -> int:
+        # Set once the solutions were counted without hitting a limit
+        self.count_complete = False
+        if approxmc:
+            return self._count_approximately(cnf_file, sat_logfile, tolerance)
+        return self._count_solutions(cnf_file, sat_logfile, progress, projected)
+
+    def _count_approximately(self, cnf_file: str, sat_logfile: str,
+                             tolerance: Optional[Tuple[float, float]] = None) -> int:
+        sat_params = [PATH_APPROXMC]
+        if tolerance is not None:
+            sat_params += ["--epsilon", str(tolerance[0]), "--delta", str(tolerance[1])]
+        sat_params.append(cnf_file)
+        logger.debug(f"Starting ApproxMC: {' '.join(sat_params)}")
+        returncode, decoded_result = self._run(sat_params)
+        if sat_logfile is not None:
+            with open(sat_logfile, "w") as log_file:
+                log_file.write(decoded_result)
+
+        # Parse ApproxMC output for "s mc <count>"
+        for line in decoded_result.splitlines():
+            if line.startswith("s mc "):
+                self.count_complete = True
+                return int(line.split()[2])
+        logger.warning("ApproxMC did not return a count.")
+        return 0
+
+    def _count_solutions(self, cnf_file: str, sat_logfile: Optional[str],
+                         progress: Optional[Callable[[int], None]], projected: bool = False) -> int:
+        """
+        Counts the solutions found by CryptoMiniSat. The output is read in
+        large chunks and only the solution markers are counted, the models
+        are only printed if they are logged.
+        """
+        print_models = "1" if sat_logfile is not None else "0"
+        process = self._start_cryptominisat(["--maxsol", str(MAX_CHARACTERISTICS),
+                                             "-s", print_models, cnf_file], projected)
+        solutions = 0
+        log_file = open(sat_logfile, "wb") if sat_logfile is not None else None
+        try:
+            # A marker can be split between two chunks, the end of the
+            # previous chunk is searched again
+            tail = b""
+            while True:
+                chunk = os.read(process.stdout.fileno(), _CHUNK)
+                if not chunk:
+                    break
+                if log_file is not None:
+                    log_file.write(chunk)
+                data = tail + chunk
+                found = data.count(_SOLUTION)
+                tail = data[-(len(_SOLUTION) - 1):]
+                if found:
+                    solutions += found
+                    if progress is not None:
+                        progress(solutions)
+            process.wait()
+        finally:
+            if log_file is not None:
+                log_file.close()
+            self._stop_cryptominisat(process)
+
+        self._check_complete(process, solutions)
+        return solutions
+
+    def _enumerate(self, cnf_file: str, limit: int = MAX_CHARACTERISTICS,
+                   projected: bool = False) -> Iterator[List[int]]:
+        """
+        Yields the models found by CryptoMiniSat, each as a list of literals.
+        """
+        process = self._start_cryptominisat(["--maxsol", str(limit), "-s", "1", cnf_file], projected)
+        solutions = 0
+        try:
+            model = None
+            for line in process.stdout:
+                if line.startswith(b"s "):
+                    if model is not None:
+                        solutions += 1
+                        yield model
+                    model = [] if line.startswith(_SOLUTION) else None
+                elif line.startswith(b"v ") and model is not None:
+                    model.extend(int(lit) for lit in line.split()[1:] if lit != b"0")
+            if model is not None:
+                solutions += 1
+                yield model
+            process.wait()
+        finally:
+            # The caller can stop the enumeration early
+            self._stop_cryptominisat(process)
+        self._check_complete(process, solutions)
+
+    def _start_cryptominisat(self, arguments: List[str], projected: bool = False):
+        # CryptoMiniSat only blocks the solutions on the sampling set of
+        # the "c ind" lines if it is told to, otherwise on all variables
+        sat_params = [PATH_CRYPTOMINISAT, "--verb", "0"]
+        if projected:
+            sat_params.append(CRYPTOMINISAT_PROJECTION)
+        sat_params += arguments
+        logger.debug(f"Starting SAT solver: {' '.join(sat_params)}")
+        timeout = self.query_timeout()
+        process = start_process(sat_params, cpu_time=timeout, memory=self.memory,
+                                stderr=subprocess.DEVNULL, stdout=subprocess.PIPE)
+        self._processes.add(process)
+        if self._cancelled:
+            kill_process(process)
+
+        # The solutions are read while the solver is running, so the
+        # wall-clock limit is enforced by a timer.
+        process.timer = None
+        if timeout is not None:
+            process.timer = threading.Timer(timeout, kill_process, [process])
+            process.timer.start()
+        return process
+
+    def _stop_cryptominisat(self, process) -> None:
+        if process.poll() is None:
+            kill_process(process)
+            process.wait()
+        process.stdout.close()
+        self._processes.discard(process)
+        if process.timer is not None:
+            process.timer.cancel()
+
+    def _check_complete(self, process, solutions: int) -> None:
+        if process.returncode < 0:
+            logger.warning(f"Counting was stopped by a limit, {solutions} solutions is only a lower bound.")
+        else:
+            self.count_complete = True
+
+
+def _projected(builder: CNFBuilder, projection: Optional[List[str]]) -> bool:
+    """
+    Whether the CNF of the builder has a sampling set for the projection.
+    """
+    return projection is not None and bool(builder.sampling_set(projection))
+
+
+class WeightCNF:
+    """
+    CNF file of a weight-parametric model with the literals of the weight
+    bits, least significant bit first. The CNF for a single weight adds
+    unit clauses for these bits, which act as assumptions, as CryptoMiniSat
+    and ApproxMC do not take assumptions on the command line. projected is
+    set if the CNF has a sampling set.
+    """
+    def __init__(self, path: str, weight_bits: List[int], true: int, projected: bool = False):
+        self.path = path
+        self.weight_bits = weight_bits
+        self.true = true
+        self.projected = projected
+
+    def units(self, weight: int) -> Optional[List[int]]:
+        """
+        Literals which fix the weight, None if the weight is not possible.
+        """
+        if weight >> len(self.weight_bits):
+            return None
+        units = []
+        for i, lit in enumerate(self.weight_bits):
+            lit = lit if (weight >> i) & 1 else -lit
+            if lit == -self.true:
+                return None
+            if lit != self.true:
+                units.append(lit)
+        return units
+
+    def write(self, path: str, units: List[int]) -> None:
+        """
+        Writes the CNF with the additional unit clauses to path.
+        """
+        with open(self.path, "r") as source, open(path, "w") as f:
+            for line in source:
+                if line.startswith("p cnf"):
+                    _, _, num_vars, num_clauses = line.split()
+                    line = f"p cnf {num_vars} {int(num_clauses) + len(units)}\n"
+                f.write(line)
+            for lit in units:
+                f.write(f"{lit} 0\n")
+
+
+class DIMACSSolver(DIMACSCounter, AbstractSolver):
+    """
+    Bit-blasts the model into DIMACS CNF and solves it with a SAT solver
+    executable that prints models in the SAT competition format, e.g.
+    CryptoMiniSat, CaDiCaL or Kissat.
+    """
+
+    def solve(self, stp_file: str) -> SolverResult:
+        cnf_file = f"{os.path.splitext(stp_file)[0]}_{random.randrange(16**8):08x}.cnf"
+        try:
+            builder = self.write_cnf(stp_file, cnf_file)
+            logger.debug(f"Solving with {self.path}: {cnf_file}")
+            returncode, raw_output = self._run([self.path, cnf_file])
+        finally:
+            if os.path.isfile(cnf_file):
+                os.remove(cnf_file)
+
+        status = UNKNOWN
+        model: List[int] = []
+        for line in raw_output.splitlines():
+            if line.startswith("s SATISFIABLE"):
+                status = SAT
+            elif line.startswith("s UNSATISFIABLE"):
+                status = UNSAT
+            elif line.startswith("v "):
+                model.extend(int(lit) for lit in line.split()[1:] if lit != "0")
+
+        result = SolverResult(status == SAT, raw_output, status=status)
+        if status == SAT:
+            result.values = builder.values(model)
+            result.widths = {name: builder.widths[name] for name in result.values}
+        return result
+
+    def parse_characteristic(self, result: SolverResult, cipher, rounds):
+        return parsesolveroutput.getCharFromValues(result.values, result.widths, cipher, rounds)
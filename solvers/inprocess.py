@@ -0,0 +1,108 @@
+import logging
+import importlib.metadata
+from abc import abstractmethod
+from typing import Any, Dict, List
+from .solver import AbstractSolver, SolverResult, SAT, UNSAT, UNKNOWN
+from parser import parsesolveroutput, smtlib2
+
+logger = logging.getLogger("cryptosmt")
+
+class InProcessSolver(AbstractSolver):
+    """
+    Base class for solvers which run inside the Python process through
+    their bindings. The model is passed to the solver directly and the
+    solution is returned as integers, without writing or parsing any
+    solver output. The bindings are optional dependencies and are only
+    imported when the solver is used.
+    """
+    # Distribution name of the bindings
+    package: str = ""
+
+    def version(self) -> str:
+        try:
+            return importlib.metadata.version(self.package)
+        except importlib.metadata.PackageNotFoundError:
+            return "unknown"
+
+    def solve(self, stp_file: str) -> SolverResult:
+        context = self._load(self._smtlib2_model(stp_file))
+        return self._check(context)
+
+    def open_session(self, stp_file: str):
+        return InProcessSession(self, self._smtlib2_model(stp_file))
+
+    def parse_characteristic(self, result: SolverResult, cipher, rounds):
+        return parsesolveroutput.getCharFromValues(result.values, result.widths, cipher, rounds)
+
+    @abstractmethod
+    def _load(self, model: str) -> Any:
+        """
+        Load a SMT-LIB2 model and return the solver context.
+        """
+        pass
+
+    @abstractmethod
+    def _add(self, context: Any, assertion: str) -> None:
+        pass
+
+    @abstractmethod
+    def _push(self, context: Any) -> None:
+        pass
+
+    @abstractmethod
+    def _pop(self, context: Any) -> None:
+        pass
+
+    @abstractmethod
+    def _check(self, context: Any) -> SolverResult:
+        pass
+
+    def _make_result(self, status: str, values: Dict[str, int] = None,
+                     widths: Dict[str, int] = None) -> SolverResult:
+        result = SolverResult(status == SAT, status, status=status)
+        result.values = values
+        result.widths = widths
+        return result
+
+
+class InProcessSession:
+    """
+    Incremental session of an in-process solver, with the same interface
+    as SMTLIB2Session.
+    """
+    def __init__(self, solver: InProcessSolver, model: str):
+        self.solver = solver
+        self.declared = smtlib2.getDeclaredVariables(model)
+        self.context = solver._load(model)
+
+    def push(self) -> None:
+        self.solver._push(self.context)
+
+    def pop(self) -> None:
+        self.solver._pop(self.context)
+
+    def add(self, assertion: str) -> None:
+        self.solver._add(self.context, assertion)
+
+    def check(self) -> SolverResult:
+        return self.solver._check(self.context)
+
+    def check_assuming(self, assertions: List[str]) -> SolverResult:
+        self.push()
+        for assertion in assertions:
+            self.add(assertion)
+        result = self.check()
+        self.pop()
+        return result
+
+    def parse_characteristic(self, result: SolverResult, cipher, rounds):
+        return self.solver.parse_characteristic(result, cipher, rounds)
+
+    def close(self) -> None:
+        self.context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
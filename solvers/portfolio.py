@@ -0,0 +1,85 @@
+import threading
+import queue
+import logging
+from typing import List
+from .solver import AbstractSolver, SolverResult, UNKNOWN
+from .stp import STPSolver
+
+logger = logging.getLogger("cryptosmt")
+
+class PortfolioSolver(AbstractSolver):
+    """
+    Races several solvers on the same query. The first definitive SAT or
+    UNSAT answer wins and the remaining solver processes are killed.
+    """
+    def __init__(self, members: List[AbstractSolver]):
+        super().__init__(", ".join(type(member).__name__ for member in members))
+        self.members = members
+        # Racers of the running query, for cancel()
+        self._racers = []
+
+    def solve(self, stp_file: str) -> SolverResult:
+        # Fresh instances for every query, so that cancelling the losers
+        # does not affect queries running concurrently in other threads.
+        racers = [member.copy() for member in self.members]
+        self._racers = racers
+        if self._cancelled:
+            for racer in racers:
+                racer.cancel()
+        results = queue.Queue()
+        threads = []
+
+        # STP reads the file directly and can start right away, the other
+        # solvers share a single SMT-LIB2 translation.
+        racers.sort(key=lambda racer: not isinstance(racer, STPSolver))
+        translation = None
+        for racer in racers:
+            if not isinstance(racer, STPSolver):
+                if translation is None:
+                    translation = (stp_file, self._smtlib2_model(stp_file))
+                racer.translation = translation
+            thread = threading.Thread(target=self._race, args=(racer, stp_file, results), daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        result = None
+        for _ in racers:
+            result = results.get()
+            if self._is_definitive(result):
+                logger.debug(f"Portfolio: {type(result.solver).__name__} answered first")
+                break
+
+        for racer in racers:
+            racer.cancel()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def identity(self) -> str:
+        return f"PortfolioSolver({', '.join(member.identity() for member in self.members)})"
+
+    def copy(self) -> "PortfolioSolver":
+        return PortfolioSolver(self.members)
+
+    def cancel(self) -> None:
+        super().cancel()
+        for racer in list(self._racers):
+            racer.cancel()
+
+    def parse_characteristic(self, result: SolverResult, cipher, rounds):
+        # The characteristic is in the output format of the winning solver
+        return result.solver.parse_characteristic(result, cipher, rounds)
+
+    @staticmethod
+    def _race(solver: AbstractSolver, stp_file: str, results: queue.Queue) -> None:
+        try:
+            result = solver.solve(stp_file)
+        except Exception as e:
+            logger.debug(f"Portfolio: {type(solver).__name__} failed: {e}")
+            result = SolverResult(False, str(e), status=UNKNOWN)
+        result.solver = solver
+        results.put(result)
+
+    @staticmethod
+    def _is_definitive(result: SolverResult) -> bool:
+        return not result.is_unknown
@@ -0,0 +1,93 @@
+import logging
+import threading
+from .solver import SolverResult, SAT, UNSAT, UNKNOWN
+from .inprocess import InProcessSolver
+from parser.cnf import CNFBuilder
+
+logger = logging.getLogger("cryptosmt")
+
+class SATContext:
+    """
+    CNF of a model together with the SAT solver it is loaded into.
+    Assertions of a push/pop scope are guarded by a selector variable,
+    which is assumed while the scope is open and fixed to false on pop.
+    """
+    def __init__(self, builder: CNFBuilder, solver):
+        self.builder = builder
+        self.solver = solver
+        self.selectors = []
+        # Number of clauses of the builder which were passed to the solver
+        self.loaded = 0
+
+
+class PySATSolver(InProcessSolver):
+    """
+    SAT solvers through PySAT. The path is the name of the PySAT solver,
+    e.g. glucose4 or maplechrono. The SMT-LIB2 model is bit-blasted with
+    parser.cnf. The memory limit is not supported.
+    """
+    package = "python-sat"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._running = set()
+
+    def version(self) -> str:
+        return f"{super().version()} {self.path}"
+
+    def cancel(self) -> None:
+        super().cancel()
+        for solver in list(self._running):
+            solver.interrupt()
+
+    def _load(self, model: str) -> SATContext:
+        from pysat.solvers import Solver
+        builder = CNFBuilder()
+        builder.add_smtlib2(model)
+        logger.debug(f"Bit-blasted model to {builder.num_vars} variables and {len(builder.clauses)} clauses")
+        return SATContext(builder, Solver(name=self.path))
+
+    def _add(self, context: SATContext, assertion: str) -> None:
+        context.builder.add_smtlib2(assertion)
+
+    def _push(self, context: SATContext) -> None:
+        selector = context.builder.new_var()
+        context.selectors.append(selector)
+        context.builder.selector = selector
+
+    def _pop(self, context: SATContext) -> None:
+        selector = context.selectors.pop()
+        context.builder.clauses.append([-selector])
+        context.builder.selector = context.selectors[-1] if context.selectors else None
+
+    def _check(self, context: SATContext) -> SolverResult:
+        solver = context.solver
+        solver.append_formula(context.builder.clauses[context.loaded:])
+        context.loaded = len(context.builder.clauses)
+
+        timeout = self.query_timeout()
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, solver.interrupt)
+            timer.start()
+        self._running.add(solver)
+        try:
+            logger.debug(f"Solving with PySAT ({self.path})...")
+            if self._cancelled:
+                result = None
+            else:
+                result = solver.solve_limited(assumptions=context.selectors, expect_interrupt=True)
+        finally:
+            self._running.discard(solver)
+            if timer is not None:
+                timer.cancel()
+            solver.clear_interrupt()
+
+        if result is None:
+            return self._make_result(UNKNOWN)
+        if not result:
+            return self._make_result(UNSAT)
+        builder = context.builder
+        values = builder.values(solver.get_model())
+        widths = {name: builder.widths[name] for name in values}
+        return self._make_result(SAT, values, widths)
@@ -0,0 +1,173 @@
+import subprocess
+import threading
+import logging
+from typing import List, Optional
+from .solver import SolverResult, SAT, UNSAT, UNKNOWN, start_process, kill_process
+from parser import parsesolveroutput, smtlib2
+
+logger = logging.getLogger("cryptosmt")
+
+class SMTLIB2Session:
+    """
+    A long-lived solver process which is fed SMT-LIB2 commands over stdin.
+    The model is loaded once and each query is checked inside a push/pop
+    scope, so bit-blasting and learned clauses carry over between queries.
+    """
+    def __init__(self, command: List[str], model: str, solver=None):
+        self.command = command
+        self.model = "(set-option :produce-models true)\n" + smtlib2.stripCommands(model)
+        self.declared = smtlib2.getDeclaredVariables(model)
+        # Limits are taken from the solver which opened the session
+        self.solver = solver
+        # Assertions of all open scopes, to restore them after a restart
+        self.scopes = [[]]
+        self._start()
+
+    def push(self) -> None:
+        self.scopes.append([])
+        self._send("(push 1)\n")
+
+    def pop(self) -> None:
+        self.scopes.pop()
+        self._send("(pop 1)\n")
+
+    def add(self, assertion: str) -> None:
+        """
+        Adds an assertion to the current scope.
+        """
+        self.scopes[-1].append(assertion)
+        self._send(assertion + "\n")
+
+    def check(self) -> SolverResult:
+        """
+        Checks the current assertions and fetches the model if satisfiable.
+        If the timeout is reached, the solver is restarted and the result
+        is UNKNOWN.
+        """
+        timeout = self.solver.query_timeout() if self.solver else None
+        lock = threading.Lock()
+        answered = False
+
+        def expire():
+            # The timer may fire while the answer is read, which is kept
+            with lock:
+                if not answered:
+                    kill_process(self.process)
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, expire)
+            timer.start()
+        try:
+            self._send("(check-sat)\n")
+            status = self._read_status()
+            model = None
+            if status == SAT:
+                self._send("(get-model)\n")
+                model = self._read_model()
+            with lock:
+                answered = status == UNSAT or model is not None
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+        if self.process.poll() is not None:
+            self._restart()
+            if not answered:
+                logger.warning(f"Solver session stopped by a limit, restarted {self.command[0]}")
+                return SolverResult(False, UNKNOWN, status=UNKNOWN)
+        if status != SAT:
+            return SolverResult(False, status, status=status)
+        return SolverResult(True, "sat\n" + model)
+
+    def check_assuming(self, assertions: List[str]) -> SolverResult:
+        """
+        Checks the model under the given assertions, which are removed
+        again afterwards.
+        """
+        self.push()
+        for assertion in assertions:
+            self.add(assertion)
+        result = self.check()
+        self.pop()
+        return result
+
+    def parse_characteristic(self, result: SolverResult, cipher, rounds):
+        # All sessions print their models in SMT-LIB2 format
+        return parsesolveroutput.getCharBitwuzlaOutput(result.raw_output, cipher, rounds)
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            try:
+                self._send("(exit)\n")
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                kill_process(self.process)
+                self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start(self) -> None:
+        logger.debug(f"Starting incremental session: {' '.join(self.command)}")
+        memory = self.solver.memory if self.solver else None
+        self.process = start_process(self.command, memory=memory,
+                                     stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL,
+                                     text=True)
+        self._send(self.model)
+
+    def _restart(self) -> None:
+        """
+        Starts a new solver process and restores all open scopes.
+        """
+        self.process.wait()
+        self._start()
+        for depth, assertions in enumerate(self.scopes):
+            if depth > 0:
+                self._send("(push 1)\n")
+            for assertion in assertions:
+                self._send(assertion + "\n")
+
+    def _send(self, commands: str) -> None:
+        try:
+            self.process.stdin.write(commands)
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            # The process was killed, this is detected in check()
+            pass
+
+    def _read_status(self) -> str:
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                if self.process.poll() is None:
+                    self.process.wait()
+                return UNKNOWN
+            line = line.strip()
+            if line in ["sat", "unsat", "unknown"]:
+                return line
+            if line.startswith("(error"):
+                logger.warning(f"Solver session reported: {line}")
+
+    def _read_model(self) -> Optional[str]:
+        """
+        Reads the model of get-model, None if the output ends before it is
+        complete.
+        """
+        model = []
+        depth = 0
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                return None
+            model.append(line)
+            depth += line.count("(") - line.count(")")
+            if depth <= 0 and "(" in "".join(model):
+                break
+        return "".join(model)
@@ -1,20 +1,107 @@
-
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import subprocess
 import logging
-from parser import parsesolveroutput
+import math
+import os
+import signal
+import time
+from parser import parsesolveroutput, smtlib2
+
+try:
+    import resource
+except ImportError:
+    # Resource limits are only available on POSIX systems
+    resource = None
 
 logger = logging.getLogger("cryptosmt")
 
+# Versions of the solver executables by path
+_versions: Dict[str, str] = {}
+
+SAT = "sat"
+UNSAT = "unsat"
+UNKNOWN = "unknown"
+
 class SolverResult:
-    def __init__(self, is_sat: bool, raw_output: str):
+    def __init__(self, is_sat: bool, raw_output: str, solver: Optional["AbstractSolver"] = None,
+                 status: Optional[str] = None):
         self.is_sat = is_sat
         self.raw_output = raw_output
+        # The solver which produced the result, set by the portfolio
+        self.solver = solver
+        # UNKNOWN if the solver gave no answer, e.g. because of a limit
+        self.status = status if status is not None else (SAT if is_sat else UNSAT)
+        # Values and bit widths of the variables, from in-process solvers
+        self.values: Optional[Dict[str, int]] = None
+        self.widths: Optional[Dict[str, int]] = None
+
+    @property
+    def is_unknown(self) -> bool:
+        return self.status == UNKNOWN
+
+def start_process(command: List[str], cpu_time: Optional[float] = None,
+                  memory: Optional[int] = None, **kwargs) -> subprocess.Popen:
+    """
+    Start a solver process in its own process group, so that it can be
+    killed together with its children. cpu_time is given in seconds and
+    memory in megabytes.
+    Solvers are started from several threads, so the limits are not set
+    with preexec_fn. They are applied with prlimit after the process was
+    started, or with ulimit in a shell which executes the solver where
+    prlimit is not available.
+    """
+    if resource is None or (cpu_time is None and memory is None):
+        return subprocess.Popen(command, start_new_session=True, **kwargs)
+    seconds = math.ceil(cpu_time) + 1 if cpu_time is not None else None
+
+    if not hasattr(resource, "prlimit"):
+        # ulimit sets the hard and the soft limit, the address space in kilobytes
+        script = ""
+        if seconds is not None:
+            script += f"ulimit -t {seconds} && "
+        if memory is not None:
+            script += f"ulimit -v {memory * 1024} && "
+        command = ["/bin/sh", "-c", script + 'exec "$@"', "sh"] + list(command)
+        return subprocess.Popen(command, start_new_session=True, **kwargs)
+
+    process = subprocess.Popen(command, start_new_session=True, **kwargs)
+    try:
+        if seconds is not None:
+            resource.prlimit(process.pid, resource.RLIMIT_CPU, (seconds, seconds + 1))
+        if memory is not None:
+            limit = memory * 1024 * 1024
+            resource.prlimit(process.pid, resource.RLIMIT_AS, (limit, limit))
+    except ProcessLookupError:
+        # The process already exited
+        pass
+    return process
+
+def kill_process(process: subprocess.Popen) -> None:
+    """
+    Kill the process group of a process started with start_process.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
 
 class AbstractSolver(ABC):
-    def __init__(self, path: str):
+    # Command line flags used by solve()
+    flags: List[str] = []
+
+    def __init__(self, path: str, timeout: Optional[float] = None, memory: Optional[int] = None,
+                 deadline: Optional[float] = None):
         self.path = path
+        # Wall-clock limit per query in seconds and memory limit in megabytes
+        self.timeout = timeout
+        self.memory = memory
+        # Absolute time at which all queries are stopped, from --timelimit
+        self.deadline = deadline
+        # SMT-LIB2 translation (stp_file, model) shared by a portfolio
+        self.translation: Optional[Tuple[str, str]] = None
+        self._processes = set()
+        self._cancelled = False
 
     @abstractmethod
     def solve(self, stp_file: str) -> SolverResult:
@@ -30,6 +117,119 @@ class AbstractSolver(ABC):
         """
         pass
 
+    def copy(self) -> "AbstractSolver":
+        """
+        A new instance of this solver with the same path and limits.
+        """
+        return type(self)(self.path, self.timeout, self.memory, self.deadline)
+
+    def version(self) -> str:
+        """
+        Version string of the solver, "unknown" if it can not be determined.
+        """
+        if self.path not in _versions:
+            try:
+                output = subprocess.run([self.path, "--version"], capture_output=True,
+                                        text=True, timeout=10).stdout
+                lines = [line.strip() for line in output.splitlines() if line.strip()]
+                _versions[self.path] = lines[0] if lines else "unknown"
+            except (OSError, subprocess.TimeoutExpired):
+                _versions[self.path] = "unknown"
+        return _versions[self.path]
+
+    def identity(self) -> str:
+        """
+        Name, version and flags of the solver, which identify its results
+        in the result cache.
+        """
+        return " ".join([type(self).__name__, self.version()] + self.flags)
+
+    def session_command(self) -> Optional[List[str]]:
+        """
+        Command line for an interactive SMT-LIB2 process, or None if the
+        solver does not support incremental sessions.
+        """
+        return None
+
+    def open_session(self, stp_file: str):
+        """
+        Load the given STP file once into a long-lived solver process.
+        """
+        from .session import SMTLIB2Session
+        command = self.session_command()
+        if command is None:
+            raise NotImplementedError(f"{type(self).__name__} does not support incremental sessions.")
+        return SMTLIB2Session(command, self._smtlib2_model(stp_file), self)
+
+    def query_timeout(self) -> Optional[float]:
+        """
+        Time left for the next query, considering the per-query timeout
+        and the deadline of the search.
+        """
+        limits = []
+        if self.timeout is not None:
+            limits.append(self.timeout)
+        if self.deadline is not None:
+            limits.append(max(self.deadline - time.time(), 0.0))
+        return min(limits) if limits else None
+
+    def cancel(self) -> None:
+        """
+        Kill all running solver processes. Processes started afterwards
+        are killed immediately.
+        """
+        self._cancelled = True
+        for process in list(self._processes):
+            kill_process(process)
+
+    def _run(self, command: List[str], input: Optional[bytes] = None, cwd: Optional[str] = None) -> Tuple[Optional[int], str]:
+        """
+        Run a solver process and return its exit code and output. The exit
+        code is None if the process was killed because of the timeout. The
+        process can also be killed from another thread with cancel().
+        """
+        timeout = self.query_timeout()
+        process = start_process(command, cpu_time=timeout, memory=self.memory,
+                                stdout=subprocess.PIPE,
+                                stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                                stderr=subprocess.PIPE,
+                                cwd=cwd)
+        self._processes.add(process)
+        try:
+            if self._cancelled:
+                kill_process(process)
+            output, err = process.communicate(input=input, timeout=timeout)
+            returncode = process.returncode
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{type(self).__name__} reached the timeout of {round(timeout, 2)}s")
+            kill_process(process)
+            output, err = process.communicate()
+            returncode = None
+        finally:
+            self._processes.discard(process)
+        return (returncode, output.decode("utf-8"))
+
+    def _result(self, output: str) -> SolverResult:
+        """
+        Construct the result from the solver output. Output without an
+        answer, e.g. of a killed process, gives an UNKNOWN result.
+        """
+        if "unsat" in output or "Valid" in output:
+            return SolverResult(False, output, status=UNSAT)
+        if "sat" in output or "Invalid" in output:
+            return SolverResult(True, output, status=SAT)
+        return SolverResult(False, output, status=UNKNOWN)
+
+    def _smtlib2_model(self, stp_file: str) -> str:
+        """
+        Translate the STP file into SMT-LIB2, without running STP.
+        """
+        if self.translation is not None and self.translation[0] == stp_file:
+            return self.translation[1]
+        logger.debug(f"Translating {stp_file} to SMTLIB2...")
+        with open(stp_file, "r") as f:
+            return smtlib2.translate(f.read(), optimize=True)
+
     def _found_solution(self, solver_result: str) -> bool:
         """
         Common logic to check if a solution was found.
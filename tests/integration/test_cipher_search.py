@@ -38,7 +38,8 @@ def get_available_solvers():
     ("twine", 2, 64, 2, 1, []),
     # Newly refactored
     ("rectangle", 1, 16, 2, 1, ["--blocksize", "64"]),
-    ("gift", 1, 64, 2, 1, []),
+    # The best transition of weight -log2(6/16) is rounded down to 1
+    ("gift", 1, 64, 1, 0, []),
     ("midori", 1, 64, 2, 1, []),
     ("sparx", 1, 16, 5, 4, []),
     ("chaskeyhalf", 2, 32, 0, 0, ["--nummessages", "1"]),
@@ -310,3 +311,15 @@ def test_simon_find_best_constants(run_cryptosmt):
     assert "Constant Min Weights:" in result.stdout
     # For wordsize 4, it should output a list of weights
     assert "[" in result.stdout and "]" in result.stdout
+
+@pytest.mark.skipif(not solver_available(), reason="Solver not found")
+def test_simon_find_all_characteristics_incremental(run_cryptosmt):
+    """
+    Mode 2 with one long-lived solver session must find the same 128 characteristics.
+    """
+    args = ["--cipher", "simon", "--rounds", "2", "--wordsize", "16", "--mode", "2", "--sweight", "2", "--endweight", "3",
+            "--bitwuzla", "--incremental"]
+    result = run_cryptosmt(args)
+
+    assert result.returncode == 0
+    assert "Finished weight 2. Total found: 128" in result.stdout
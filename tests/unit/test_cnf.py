@@ -0,0 +1,48 @@
+import pytest
+from parser import smtlib2
+from parser.cnf import CNFBuilder, parseSExpressions
+
+pysat_solvers = pytest.importorskip("pysat.solvers")
+
+def solve(builder, assumptions=()):
+    with pysat_solvers.Solver(name="glucose4", bootstrap_with=builder.clauses) as solver:
+        if not solver.solve(assumptions=list(assumptions)):
+            return None
+        return builder.values(solver.get_model())
+
+def test_parseSExpressions():
+    assert parseSExpressions("(assert (= x #b01)) (check-sat)") == \
+        [["assert", ["=", "x", "#b01"]], ["check-sat"]]
+
+def test_translated_model():
+    cvc = ("x, y, z: BITVECTOR(8);\n"
+           "ASSERT(z = BVPLUS(8, x, y));\n"
+           "ASSERT(x = 0hex13);\n"
+           "ASSERT(BVXOR(y, x) = 0hexff);\n"
+           "QUERY(FALSE);\n")
+    builder = CNFBuilder()
+    builder.add_smtlib2(smtlib2.translate(cvc))
+    values = solve(builder)
+    assert values["x"] == 0x13
+    assert values["y"] == 0x13 ^ 0xff
+    assert values["z"] == (0x13 + (0x13 ^ 0xff)) & 0xff
+
+def test_arithmetic_and_comparison():
+    builder = CNFBuilder()
+    builder.add_smtlib2("(declare-fun a () (_ BitVec 6))\n"
+                        "(declare-fun b () (_ BitVec 6))\n"
+                        "(assert (= a #b101101))\n"
+                        "(assert (= b (bvurem a #b000111)))\n")
+    assert solve(builder)["b"] == 45 % 7
+
+    builder.add_smtlib2("(assert (bvult a b))")
+    assert solve(builder) is None
+
+def test_selector_guards_assertions():
+    builder = CNFBuilder()
+    builder.add_smtlib2("(declare-fun x () (_ BitVec 4))\n"
+                        "(assert (= x #x5))\n")
+    builder.selector = builder.new_var()
+    builder.add_smtlib2("(assert (= x #x6))")
+    assert solve(builder, [builder.selector]) is None
+    assert solve(builder, [-builder.selector])["x"] == 5
@@ -0,0 +1,129 @@
+import sys
+import pytest
+from solvers import dimacs
+from solvers.dimacs import DIMACSSolver
+
+pytest.importorskip("pysat.solvers")
+
+# Enumerates the models of a CNF with PySAT and prints them like
+# CryptoMiniSat with --maxsol. Models are blocked on the sampling set.
+FAKE_CRYPTOMINISAT = f"""#!{sys.executable}
+import sys
+from pysat.formula import CNF
+from pysat.solvers import Solver
+args = sys.argv[1:]
+limit = int(args[args.index("--maxsol") + 1]) if "--maxsol" in args else 1
+print_models = args[args.index("-s") + 1] != "0" if "-s" in args else True
+cnf = CNF(from_file=args[-1])
+num_vars = int(next(line for line in open(args[-1]) if line.startswith("p cnf")).split()[2])
+# The sampling set is only used with the projection option
+sampling_set = [int(var) for line in cnf.comments if line.startswith("c ind")
+                for var in line.split()[2:] if var != "0"] if "--onlyindep" in args else []
+with Solver(name="glucose4", bootstrap_with=cnf.clauses) as solver:
+    for i in range(limit):
+        if not solver.solve():
+            print("s UNSATISFIABLE")
+            break
+        model = solver.get_model()
+        print("s SATISFIABLE")
+        if print_models:
+            print("v " + " ".join(str(lit) for lit in model) + " 0")
+        # Variables which do not occur in any clause are false in the model
+        value = lambda var: model[var - 1] if var <= len(model) else -var
+        solver.add_clause([-value(var) for var in sampling_set or range(1, num_vars + 1)])
+"""
+
+MODEL = ("a, b: BITVECTOR(4);\n"
+         "w: BITVECTOR(4);\n"
+         "ASSERT(b = BVXOR(a, 0hex3));\n"
+         "ASSERT(w = a & b);\n"
+         "ASSERT(BVLE(a, 0hex5));\n"
+         "QUERY(FALSE);\n")
+
+class MockCipher:
+    name = "mock"
+
+    def getFormatString(self):
+        return ["a", "b", "w"]
+
+@pytest.fixture
+def cryptominisat(tmp_path, monkeypatch):
+    path = tmp_path / "cryptominisat5"
+    path.write_text(FAKE_CRYPTOMINISAT)
+    path.chmod(0o755)
+    monkeypatch.setattr(dimacs, "PATH_CRYPTOMINISAT", str(path))
+    return str(path)
+
+@pytest.fixture
+def stp_file(tmp_path):
+    path = tmp_path / "model.stp"
+    path.write_text(MODEL)
+    return str(path)
+
+def test_solve_and_count(cryptominisat, stp_file, tmp_path):
+    solver = DIMACSSolver(cryptominisat)
+    assert solver.solve_and_count(stp_file, str(tmp_path / "sat.log")) == 6
+    assert solver.count_complete
+    assert (tmp_path / "sat.log").read_text().count("s SATISFIABLE") == 6
+
+def test_count_without_log(cryptominisat, stp_file):
+    solver = DIMACSSolver(cryptominisat)
+    found = []
+    assert solver.solve_and_count(stp_file, progress=found.append) == 6
+    assert solver.count_complete
+    assert found and found[-1] == 6
+
+def test_count_markers_across_chunks(cryptominisat, stp_file, tmp_path, monkeypatch):
+    # Markers are split between chunks of a few bytes
+    monkeypatch.setattr(dimacs, "_CHUNK", 5)
+    solver = DIMACSSolver(cryptominisat)
+    assert solver.solve_and_count(stp_file) == 6
+    assert solver.solve_and_count(stp_file, str(tmp_path / "sat.log")) == 6
+    assert (tmp_path / "sat.log").read_text().count("\nv ") == 6
+
+def test_enumerate_characteristics(cryptominisat, stp_file, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "tmp").mkdir()
+    solver = DIMACSSolver(cryptominisat)
+    characteristics = list(solver.enumerate_characteristics(stp_file, MockCipher(), 1))
+    found = set((int(c.characteristic_data["a"], 16), int(c.characteristic_data["b"], 16))
+                for c in characteristics)
+    assert found == set((a, a ^ 3) for a in range(6))
+    assert len(list(solver.enumerate_characteristics(stp_file, MockCipher(), 1, limit=2))) == 2
+
+def test_projected_count(cryptominisat, stp_file, tmp_path):
+    solver = DIMACSSolver(cryptominisat)
+    # a[3:3] is always 0, b[3:3] = 0 and w are given by a
+    assert solver.solve_and_count(stp_file, str(tmp_path / "sat.log"), projection=["a"]) == 6
+    cnf = (tmp_path / "projected.cnf")
+    builder = solver.write_cnf(stp_file, str(cnf), projection=["b"])
+    assert [line for line in cnf.read_text().splitlines() if line.startswith("c ind")] == \
+        [f"c ind {' '.join(str(var) for var in builder.sampling_set(['b']))} 0"]
+
+def test_projection_ignores_auxiliary_variables(cryptominisat, tmp_path):
+    # t is free, so counting all solutions gives twice the number
+    model = tmp_path / "aux.stp"
+    model.write_text("a, t: BITVECTOR(2);\nASSERT(a = 0bin01 | t[1:1] @ 0bin0);\nQUERY(FALSE);\n")
+    solver = DIMACSSolver(cryptominisat)
+    assert solver.solve_and_count(str(model), str(tmp_path / "sat.log")) == 4
+    assert solver.solve_and_count(str(model), str(tmp_path / "sat.log"), projection=["a"]) == 2
+
+def test_solve(cryptominisat, stp_file):
+    solver = DIMACSSolver(cryptominisat)
+    result = solver.solve(stp_file)
+    assert result.is_sat
+    values = result.values
+    assert values["b"] == values["a"] ^ 3 and values["w"] == values["a"] & values["b"]
+    assert result.widths == {"a": 4, "b": 4, "w": 4}
+
+def test_count_weight(cryptominisat, tmp_path):
+    # The weight is the Hamming weight of a
+    bits = ", ".join(f"0bin000000000000000 @ a[{i}:{i}]" for i in range(4))
+    model = tmp_path / "weights.stp"
+    model.write_text(f"a: BITVECTOR(4);\nweight: BITVECTOR(16);\n"
+                     f"ASSERT(weight = BVPLUS(16, {bits}));\nQUERY(FALSE);\n")
+    solver = DIMACSSolver(cryptominisat)
+    cnf = solver.write_weight_cnf(str(model), str(tmp_path / "weights.cnf"), projection=["a"])
+    counts = [solver.count_weight(cnf, weight, str(tmp_path / "sat.log")) for weight in range(6)]
+    assert counts == [1, 4, 6, 4, 1, 0]
+    assert cnf.units(1 << 16) is None
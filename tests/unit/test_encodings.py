@@ -0,0 +1,59 @@
+import io
+import pytest
+from parser import encodings, smtlib2
+from parser.cnf import CNFBuilder
+
+pysat_solvers = pytest.importorskip("pysat.solvers")
+
+def satisfiable(model, value, num_bits):
+    cvc = f"x: BITVECTOR({num_bits});\n" + model + \
+          f"ASSERT(x = 0bin{bin(value)[2:].zfill(num_bits)});\nQUERY(FALSE);\n"
+    builder = CNFBuilder()
+    builder.add_smtlib2(smtlib2.translate(cvc))
+    with pysat_solvers.Solver(name="glucose4", bootstrap_with=builder.clauses) as solver:
+        return solver.solve()
+
+def test_sequential_counter():
+    model = io.StringIO()
+    bits = [f"x[{i}:{i}]" for i in range(5)]
+    encodings.add_weight_constraint(model, bits, 2, "c", "seqcounter", equal=True)
+    for value in range(1 << 5):
+        assert satisfiable(model.getvalue(), value, 5) == (bin(value).count("1") == 2)
+
+def test_sequential_counter_upper_bound():
+    model = io.StringIO()
+    bits = [f"x[{i}:{i}]" for i in range(4)]
+    encodings.add_weight_constraint(model, bits, 1, "c", "seqcounter", equal=False)
+    for value in range(1 << 4):
+        assert satisfiable(model.getvalue(), value, 4) == (bin(value).count("1") <= 1)
+
+def test_matsui_bounds():
+    # Three rounds of two bits, any round weighs at least 1
+    model = io.StringIO()
+    round_bits = [[f"x[{2*r + 1}:{2*r + 1}]", f"x[{2*r}:{2*r}]"] for r in range(3)]
+    encodings.add_matsui_bounds(model, round_bits, 4, [1, 3], "c")
+    for value in range(1 << 6):
+        weights = [bin((value >> (2*r)) & 3).count("1") for r in range(3)]
+        expected = (sum(weights) == 4 and min(weights) >= 1 and
+                    weights[0] + weights[1] >= 3 and weights[1] + weights[2] >= 3)
+        assert satisfiable(model.getvalue(), value, 6) == expected
+
+def test_matsui_bounds_below_optimum():
+    model = io.StringIO()
+    round_bits = [[f"x[{r}:{r}]"] for r in range(4)]
+    encodings.add_matsui_bounds(model, round_bits, 2, [1], "c")
+    # Every round needs weight 1, so 4 rounds can not weigh 2
+    assert not any(satisfiable(model.getvalue(), value, 4) for value in range(1 << 4))
+
+def test_round_bounds():
+    # The bounds of test_matsui_bounds without the total weight
+    from parser import stpcommands
+    model = io.StringIO()
+    model.write("w0, w1, w2: BITVECTOR(2);\n")
+    for r in range(3):
+        model.write(f"ASSERT(w{r} = x[{2*r + 1}:{2*r}]);\n")
+    stpcommands.setupRoundBounds(model, [["w0"], ["w1"], ["w2"]], 2, 0, [1, 3])
+    for value in range(1 << 6):
+        weights = [bin((value >> (2*r)) & 3).count("1") for r in range(3)]
+        expected = (min(weights) >= 1 and weights[0] + weights[1] >= 3 and weights[1] + weights[2] >= 3)
+        assert satisfiable(model.getvalue(), value, 6) == expected
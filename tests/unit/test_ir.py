@@ -0,0 +1,81 @@
+import pytest
+from parser import ir
+from parser.cnf import CNFBuilder
+
+pysat_solvers = pytest.importorskip("pysat.solvers")
+
+MODEL = ("a, b, c: BITVECTOR(4);\n"
+         "t: BITVECTOR(4);\n"
+         "ASSERT(t = BVXOR(a & 0hexF, BVXOR(b, 0hex0)));\n"
+         "ASSERT(c = (a[1:0] @ a[3:2]) | BVXOR(t, t));\n"
+         "ASSERT(BVXOR(a, b) & c = BVXOR(a, b) & ~c);\n"
+         "ASSERT(BVPLUS(4, a, 0bin0) = ~~b);\n"
+         "QUERY(FALSE);\n")
+
+def solutions(smtlib2):
+    builder = CNFBuilder()
+    builder.add_smtlib2(smtlib2)
+    found = set()
+    with pysat_solvers.Solver(name="glucose4", bootstrap_with=builder.clauses) as solver:
+        for model in solver.enum_models():
+            values = builder.values(model)
+            found.add((values["a"], values["b"], values["c"]))
+    return found
+
+def test_parse_and_print():
+    model = ir.parseCVC(MODEL)
+    assert model.widths == {"a": 4, "b": 4, "c": 4, "t": 4}
+    assert len(model.assertions) == 4 and model.query
+    assert ir.printSMTLIB2(model).endswith("(check-sat)\n")
+    # The STP printer gives an equivalent model
+    assert solutions(ir.printSMTLIB2(ir.parseCVC(ir.printCVC(model)))) == \
+        solutions(ir.printSMTLIB2(model))
+
+def test_foldConstants():
+    model = ir.foldConstants(ir.parseCVC(MODEL))
+    printed = ir.printSMTLIB2(model)
+    assert "(assert (= t (bvxor a b)))" in printed
+    assert "(assert (= c (concat ((_ extract 1 0) a) ((_ extract 3 2) a))))" in printed
+    assert "(assert (= a b))" in printed
+
+def test_extract_folding():
+    model = ir.Model()
+    x = model.declare("x", 8)
+    rotated = model.rotl(model.rotl(x, 3), 5)
+    model.add(model.eq(model.extract(model.concat(x, rotated), 7, 0), x))
+    ir.foldConstants(model)
+    # rotl by 8 is the identity, so the assertion is always true
+    assert model.assertions == []
+
+def test_eliminateCommonSubexpressions():
+    model = ir.optimize(ir.parseCVC(MODEL))
+    printed = ir.printSMTLIB2(model)
+    assert "(define-fun cse_0 () (_ BitVec 4) (bvxor a b))" in printed
+    assert printed.count("(bvxor a b)") == 1
+    assert "cse_0" in ir.printCVC(model)
+
+def test_optimize_preserves_solutions():
+    expected = solutions(ir.printSMTLIB2(ir.parseCVC(MODEL)))
+    assert expected
+    assert solutions(ir.printSMTLIB2(ir.optimize(ir.parseCVC(MODEL)))) == expected
+
+def test_removeDeadVariables():
+    model = ir.parseCVC("x, y, z: BITVECTOR(2);\n"
+                        "ASSERT(y = ~x);\n"
+                        "ASSERT(x = 0bin01);\n")
+    ir.removeDeadVariables(model)
+    assert model.widths == {"x": 2, "y": 2}
+    # y is defined but not used otherwise
+    ir.removeDeadVariables(model, keep={"x"})
+    assert model.widths == {"x": 2}
+    assert len(model.assertions) == 1
+
+def test_printDIMACS():
+    printed = ir.printDIMACS(ir.optimize(ir.parseCVC(MODEL))).splitlines()
+    assert printed[0].startswith("c var ")
+    lines = [line for line in printed if not line.startswith("c ")]
+    num_vars, num_clauses = map(int, lines[0].split()[2:])
+    assert lines[0].startswith("p cnf ")
+    assert len(lines) == num_clauses + 1
+    assert all(line.endswith(" 0") for line in lines[1:])
+    assert max(abs(int(lit)) for line in lines[1:] for lit in line.split()) <= num_vars
@@ -0,0 +1,44 @@
+import pytest
+import ciphers
+from cryptanalysis.matsui import MatsuisAlgorithm, getSPN
+
+@pytest.mark.parametrize("name, wordsize, bounds", [
+    ("present", 64, [2, 4, 8, 12]),
+    # -log2(6/16) is rounded down to 1.375
+    ("gift", 64, [1.375, 3.375, 7, 11.375]),
+    ("rectangle", 64, [2, 4, 7, 10]),
+])
+def test_minimal_weights(name, wordsize, bounds):
+    algorithm = MatsuisAlgorithm(getSPN(ciphers.get_cipher(name), {"wordsize": wordsize}))
+    assert algorithm.findMinimalWeights(len(bounds)) == bounds
+
+def test_trail():
+    algorithm = MatsuisAlgorithm(getSPN(ciphers.get_cipher("present"), {}))
+    weight, trail = algorithm.search(3)
+    assert weight == 8 and len(trail) == 3
+    for r, (inputs, outputs, round_weight) in enumerate(trail):
+        assert set(inputs) == set(outputs)
+        assert round_weight == sum(algorithm.getProbabilityForDifferential(inputs[k], outputs[k])
+                                   for k in inputs)
+        if r + 1 < len(trail):
+            assert algorithm.calculateNextInputDifference(outputs) == trail[r + 1][0]
+    # No characteristic below the optimum
+    assert algorithm.search(3, end=8) == (None, None)
+
+@pytest.mark.parametrize("name", ["rectangle", "gift"])
+def test_trail_satisfies_model(tmp_path, name):
+    # The characteristic is a solution of the SMT model of the cipher
+    pytest.importorskip("pysat.solvers")
+    from solvers.sat import PySATSolver
+    cipher = ciphers.get_cipher(name)
+    algorithm = MatsuisAlgorithm(getSPN(cipher, {}))
+    weight, trail = algorithm.search(2)
+    characteristic = algorithm.getCharacteristic(trail, cipher)
+    assert characteristic.getWeight() == int(weight)
+    assert (characteristic.getFractionalWeight() or characteristic.getWeight()) == weight
+    fixed = {name: value for name, value in characteristic.characteristic_data.items()
+             if not name.startswith("w")}
+    stp_file = str(tmp_path / f"{name}.stp")
+    cipher.createSTP(stp_file, {"rounds": 2, "wordsize": 64, "blocksize": 64, "sweight": int(weight),
+                                "fixedVariables": fixed})
+    assert PySATSolver("glucose4").solve(stp_file).is_sat
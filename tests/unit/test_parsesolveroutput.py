@@ -52,3 +52,20 @@ def test_getCharBoolectorOutput():
     assert characteristic.weight == "0x000a"
     assert characteristic.characteristic_data["x0"] == "0x0100"
     assert characteristic.characteristic_data["y0"] == "0x0444"
+
+def test_getCharFromValues():
+    cipher = MockCipher()
+    values = {"x0": 0x100, "y0": 0x444, "weight": 10}
+    widths = {"x0": 16, "y0": 16, "weight": 16}
+    characteristic = parsesolveroutput.getCharFromValues(values, widths, cipher, 1)
+
+    assert characteristic.weight == "0x000a"
+    assert characteristic.characteristic_data["x0"] == "0x0100"
+    assert characteristic.characteristic_data["y0"] == "0x0444"
+
+def test_getCharFromValues_partial_nibble():
+    # Widths which are not a multiple of 4 are rounded up to full digits
+    values = {"x0": 0x1, "weight": 0}
+    widths = {"x0": 5, "weight": 16}
+    characteristic = parsesolveroutput.getCharFromValues(values, widths, MockCipher(), 1)
+    assert characteristic.characteristic_data["x0"] == "0x01"
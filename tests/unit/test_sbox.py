@@ -0,0 +1,81 @@
+import pytest
+from parser import sbox, stpcommands
+
+PRESENT_SBOX = (0xC, 0x5, 0x6, 0xB, 0x9, 0x0, 0xA, 0xD, 0x3, 0xE, 0xF, 0x8, 0x4, 0x7, 0x1, 0x2)
+ASCON_SBOX = (0x04, 0x0b, 0x1f, 0x14, 0x1a, 0x15, 0x09, 0x02, 0x1b, 0x05, 0x08, 0x12, 0x1d, 0x03, 0x06, 0x1c,
+              0x1e, 0x13, 0x07, 0x0e, 0x00, 0x0d, 0x11, 0x18, 0x10, 0x0c, 0x01, 0x19, 0x16, 0x0a, 0x0f, 0x17)
+
+def satisfies(clauses, point, num_vars):
+    bits = [(point >> (num_vars - 1 - i)) & 1 for i in range(num_vars)]
+    return all(any(bits[i] != value for i, value in clause) for clause in clauses)
+
+GIFT_SBOX = (0x1, 0xa, 0x4, 0xc, 0x6, 0xf, 0x3, 0x9, 0x2, 0xd, 0xb, 0x7, 0x5, 0x0, 0x8, 0xe)
+
+def check_cnf(table, linear=False):
+    n = sbox.getSboxSize(table)
+    weights = sbox.getTransitionWeights(table, linear)
+    valid = set((a << 2*n) | (b << n) | ((1 << w) - 1) for (a, b), w in weights.items())
+    clauses = sbox.getSboxCNF(table, linear)
+    for point in range(1 << 3*n):
+        assert satisfies(clauses, point, 3*n) == (point in valid)
+    return clauses
+
+def test_tables():
+    ddt = sbox.getDDT(PRESENT_SBOX)
+    assert ddt[0][0] == 16
+    assert all(sum(row) == 16 for row in ddt)
+    assert ddt.max(initial=0, where=ddt < 16) == 4
+
+    lat = sbox.getLAT(PRESENT_SBOX)
+    assert lat[0][0] == 8
+    assert all(lat[0][b] == 0 for b in range(1, 16))
+    assert abs(lat[1:, 1:]).max() == 4
+
+def test_transition_weights():
+    ddt = sbox.getDDT(GIFT_SBOX)
+    a, b = [(a, b) for a in range(16) for b in range(16) if ddt[a][b] == 6][0]
+    # -log2(6/16) = 1.415 is rounded down
+    assert sbox.getTransitionWeights(GIFT_SBOX)[(a, b)] == 1
+    assert sbox.getTransitionWeights(GIFT_SBOX, precision=3)[(a, b)] == 11
+    assert sbox.getTransitionWeights(GIFT_SBOX)[(0, 0)] == 0
+    assert len(sbox.getTransitionWeights(GIFT_SBOX)) == (ddt > 0).sum()
+    assert sbox.hasFractionalWeights(GIFT_SBOX)
+    assert not sbox.hasFractionalWeights(PRESENT_SBOX)
+
+def test_getFractionCNF():
+    weights = sbox.getTransitionWeights(GIFT_SBOX, precision=3)
+    clauses = sbox.getFractionCNF(GIFT_SBOX, 3)
+    for (a, b), weight in weights.items():
+        for fraction in range(8):
+            point = (a << 7) | (b << 3) | fraction
+            assert satisfies(clauses, point, 11) == (fraction == weight % 8)
+
+def test_fractional_sbox_model():
+    check_cnf(GIFT_SBOX)
+    command = stpcommands.add4bitSbox(list(GIFT_SBOX), [f"v{i}" for i in range(12)],
+                                      fraction=["f2", "f1", "f0"])
+    assert command.count("ASSERT(") == 2
+
+def test_getSboxCNF_lat():
+    check_cnf(PRESENT_SBOX, linear=True)
+
+def test_getSboxCNF_5bit():
+    clauses = check_cnf(ASCON_SBOX)
+    assert len(clauses) < 1 << 10
+
+def test_chi():
+    chi = sbox.getChi(5)
+    # y_i = x_i ^ (~x_{i+1} & x_{i+2}) with x_0 as most significant bit
+    assert chi[0b10000] == 0b10010 and chi[0b00100] == 0b10100
+    # All transitions of the quadratic chi have integer weights, so the
+    # model of Ascon and Keccak is exact
+    ddt = sbox.getDDT(chi)
+    assert len(sbox.getTransitionWeights(chi)) == (ddt > 0).sum()
+    assert max(sbox.getTransitionWeights(chi).values()) == 4
+    check_cnf(chi)
+
+def test_add4bitSboxNibbles():
+    command = stpcommands.add4bitSboxNibbles(list(PRESENT_SBOX), "a", "b", "w")
+    assert command == stpcommands.add4bitSbox(
+        list(PRESENT_SBOX), [f"{var}[{bit}:{bit}]" for var in "abw" for bit in [3, 2, 1, 0]])
+    assert command.startswith("ASSERT(") and command.endswith(" = 0bin1);\n")
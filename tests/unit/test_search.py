@@ -26,3 +26,395 @@ def test_foundSolution():
     solver = STPSolver("dummy")
     assert solver._found_solution("sat") is True
     assert solver._found_solution("unsat") is False
+
+class CountingCipher:
+    """
+    Writes a model with a weight assertion and counts the calls of createSTP.
+    """
+    def __init__(self, weight_dependent=False):
+        self.name = "counting"
+        self.calls = 0
+        self.weight_dependent = weight_dependent
+
+    def createSTP(self, filename, parameters):
+        from parser import stpcommands
+        self.calls += 1
+        weight = parameters["sweight"]
+        with open(filename, "w") as f:
+            f.write(f"% rounds={parameters['rounds']}\nweight: BITVECTOR(16);\n")
+            f.write(stpcommands.getWeightAssertion(weight) + "\n")
+            if self.weight_dependent:
+                f.write(f"% bound {weight}\n")
+            f.write("QUERY(FALSE);\n")
+
+def test_model_template(tmp_path):
+    from cryptanalysis.strategies.template import write_model
+    cipher = CountingCipher()
+    stp_file = str(tmp_path / "model.stp")
+    for weight in range(5):
+        write_model(cipher, stp_file, {"rounds": 3, "sweight": weight})
+        expected = str(tmp_path / "expected.stp")
+        CountingCipher().createSTP(expected, {"rounds": 3, "sweight": weight})
+        assert open(stp_file).read() == open(expected).read()
+    # The first two models are generated, the others rendered
+    assert cipher.calls == 2
+
+    write_model(cipher, stp_file, {"rounds": 4, "sweight": 1})
+    assert cipher.calls == 3
+
+def test_model_template_weight_dependent(tmp_path):
+    from cryptanalysis.strategies.template import write_model
+    cipher = CountingCipher(weight_dependent=True)
+    stp_file = str(tmp_path / "model.stp")
+    for weight in range(4):
+        write_model(cipher, stp_file, {"rounds": 5, "sweight": weight})
+        assert f"% bound {weight}" in open(stp_file).read()
+    assert cipher.calls == 4
+
+def test_bounded_min_weight_search():
+    from cryptanalysis.strategies.min_weight import MinWeightStrategy
+    from solvers.solver import SolverResult
+
+    class MockCharacteristic:
+        def __init__(self, weight):
+            self.weight = weight
+        def getWeight(self):
+            return self.weight
+        def getFractionalWeight(self):
+            return None
+        def printText(self):
+            pass
+
+    class MockSession:
+        # The characteristics have weight 37 and 41
+        def __init__(self):
+            self.bounds = []
+        def check_assuming(self, assertions):
+            bound = int(assertions[0].split("#b")[1][:16], 2)
+            self.bounds.append(bound)
+            if bound >= 41:
+                return SolverResult(True, "41")
+            if bound >= 37:
+                return SolverResult(True, "37")
+            return SolverResult(False, "unsat")
+        def parse_characteristic(self, result, cipher, rounds):
+            return MockCharacteristic(int(result.raw_output))
+
+    session = MockSession()
+    strategy = MinWeightStrategy(None, {"sweight": 0, "endweight": 1000, "rounds": 1})
+    strategy.unknown_weights = []
+    assert strategy._bounded_search(session) == 37
+    assert len(session.bounds) < 15
+
+def test_speculative_min_weight_search(tmp_path, monkeypatch):
+    import re
+    from cryptanalysis.strategies.min_weight import MinWeightStrategy
+    from solvers.solver import AbstractSolver, SolverResult, UNKNOWN
+
+    class SleepySolver(AbstractSolver):
+        # Weight 5 is SAT, weights from 9 run until they are cancelled
+        cancelled = []
+
+        def solve(self, stp_file):
+            with open(stp_file) as f:
+                weight = int(re.search(r"0bin([01]+)", f.read()).group(1), 2)
+            while weight >= 9 and not self._cancelled:
+                time.sleep(0.01)
+            if self._cancelled:
+                SleepySolver.cancelled.append(weight)
+                return SolverResult(False, "", status=UNKNOWN)
+            if weight in [4, 5]:
+                time.sleep(0.3)
+            return SolverResult(weight == 5, str(weight))
+
+        def parse_characteristic(self, result, cipher, rounds):
+            return None
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "tmp").mkdir()
+    strategy = MinWeightStrategy(CountingCipher(), {"sweight": 0, "endweight": 20, "rounds": 1,
+                                                    "wordsize": 16, "threads": 4})
+    strategy.solver = SleepySolver("sleepy")
+    strategy.unknown_weights = []
+    weight, result = strategy._speculative_search(4)
+    assert weight == 5
+    assert result.is_sat
+    assert 9 in SleepySolver.cancelled
+    assert strategy.unknown_weights == []
+
+def test_stitch_characteristics():
+    from cryptanalysis.diffchars import DifferentialCharacteristic
+    from cryptanalysis.strategies.stitch import stitch_characteristics
+
+    class Cipher:
+        name = "mock"
+        def getFormatString(self):
+            return ["x", "w"]
+
+    first = DifferentialCharacteristic({"x0": "0x1", "x1": "0x2", "w0": "0x1"}, Cipher(), 1, "0x1")
+    second = DifferentialCharacteristic({"x0": "0x2", "x1": "0x4", "x2": "0x8", "w0": "0x2", "w1": "0x3"},
+                                        Cipher(), 2, "0x5")
+    stitched = stitch_characteristics(first, second, Cipher(), 3)
+    assert stitched.getWeight() == 6
+    assert stitched.getData() == [["0x1", "-1"], ["0x2", "-1"], ["0x4", "-2"], ["0x8", "none"]]
+
+@pytest.mark.parametrize("weights, full, expected", [
+    # The stitched weight 4 + 5 is the lower bound 4 + 5
+    ({"first": 4, "bound": 5, "second": 5}, None, 9),
+    # A better characteristic of the full model below the stitched weight
+    ({"first": 4, "bound": 5, "second": 8}, 10, 10),
+    ({"first": 4, "bound": 5, "second": 8}, 11, 11),
+    ({"first": 4, "bound": 5, "second": 8}, None, 12),
+])
+def test_stitch_strategy(weights, full, expected, monkeypatch):
+    from cryptanalysis.strategies import stitch
+    from cryptanalysis.strategies.stitch import StitchStrategy
+
+    class Characteristic:
+        def __init__(self, weight):
+            self.weight = weight
+            self.num_rounds = 2
+            self.characteristic_data = {"x2": "0x1", "x0": "0x1"}
+        def getWeight(self):
+            return self.weight
+
+    class Strategy(StitchStrategy):
+        full_searches = []
+        def _state_prefixes(self):
+            return ["x"]
+        # First half, lower bound of the second half, second half
+        calls = ["first", "bound", "second"]
+        def _min_weight(self, rounds, fixed, sweight):
+            name = self.calls.pop(0)
+            assert ("x0" in fixed) == (name == "second")
+            return weights[name], Characteristic(weights[name])
+        def _full_search(self, sweight, endweight, report=True):
+            self.full_searches.append((sweight, endweight))
+            found = full if full is not None else endweight
+            self.characteristic = Characteristic(found)
+            return found
+        def _report(self, weight, characteristic):
+            self.reported = weight
+
+    monkeypatch.setattr(stitch, "stitch_characteristics",
+                        lambda first, second, cipher, rounds: Characteristic(first.weight + second.weight))
+    strategy = Strategy(None, {"rounds": 4, "sweight": 0, "endweight": 100})
+    assert strategy.run() == expected
+    assert strategy.reported == expected
+    if weights["second"] == weights["bound"]:
+        assert Strategy.full_searches == []
+    else:
+        assert Strategy.full_searches == [(9, 12)]
+
+def test_round_bounds(tmp_path):
+    from cryptanalysis import roundbounds
+    bounds = [0, 2, 4, 6, 8, 12, None, 18]
+    assert roundbounds.lower_bound(bounds, 7) == 12
+    assert roundbounds.lower_bound(bounds, 9) == 18
+    assert roundbounds.lower_bound(bounds, 12) == 24
+    assert roundbounds.known_rounds(bounds) == 6
+
+    path = str(tmp_path / "bounds.json")
+    parameters = {"cipher": "simon", "wordsize": 16}
+    assert roundbounds.load_bounds(path, parameters) == []
+    roundbounds.save_bounds(path, parameters, bounds)
+    assert roundbounds.load_bounds(path, parameters) == bounds
+    assert roundbounds.load_bounds(path, {"cipher": "simon", "wordsize": 32}) == []
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_cube_enumeration(incremental, tmp_path, monkeypatch):
+    # The cubes on x0 find the same characteristics as the sequential search,
+    # y0 is fixed to keep the number of characteristics small
+    pytest.importorskip("pysat.solvers")
+    import ciphers
+    from cryptanalysis.strategies.all_characteristics import AllCharacteristicsStrategy, _trail_key
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "tmp").mkdir()
+    found = {}
+    for threads in [1, 2]:
+        parameters = {"rounds": 2, "wordsize": 16, "sweight": 2, "endweight": 3, "pysat": True,
+                      "threads": threads, "quiet": True, "fixedVariables": {"y0": "0x0004"},
+                      "blockedCharacteristics": [], "iterative": False, "incremental": incremental}
+        AllCharacteristicsStrategy(ciphers.get_cipher("simon"), parameters).run()
+        found[threads] = sorted(_trail_key(c) for c in parameters["blockedCharacteristics"])
+    assert len(found[1]) > 1
+    assert found[1] == found[2]
+
+def test_enumerate_session_unblockable():
+    # A characteristic without declared variables would be found forever
+    from cryptanalysis.strategies.all_characteristics import _enumerate_session
+    from solvers.solver import SolverResult
+
+    class Characteristic:
+        characteristic_data = {"x0": "0x1"}
+
+    class Session:
+        declared = {"y0": 16}
+        def check(self):
+            return SolverResult(True, "sat\n")
+        def parse_characteristic(self, result, cipher, rounds):
+            return Characteristic()
+        def add(self, assertion):
+            pass
+
+    found = []
+    with pytest.raises(RuntimeError):
+        _enumerate_session(None, 1, Session(), 0, lambda: False, found.append)
+    assert found == []
+
+def test_weight_scheduler():
+    from cryptanalysis.strategies.probability import WeightScheduler
+    scheduler = WeightScheduler(range(10, 20))
+    # The lowest weights are counted first until the counts give a growth
+    assert scheduler.next_weight(0.0) == 10
+    scheduler.add(10, 4)
+    assert scheduler.next_weight(0.0) == 11
+    scheduler.add(11, 0)
+    assert scheduler.next_weight(0.0) == 12
+    scheduler.add(12, 16)
+    assert scheduler.growth() == 2.0
+    assert scheduler.predict(15) == 128
+    # The most expensive weight first, or from the lowest
+    assert scheduler.next_weight(0.0) == 19
+    assert scheduler.next_weight(0.0, expensive_first=False) == 13
+
+def test_weight_scheduler_stop():
+    from cryptanalysis.strategies.probability import WeightScheduler
+    scheduler = WeightScheduler(range(10, 14), fraction=0.01)
+    for weight, count in [(10, 64), (11, 32)]:
+        assert scheduler.next_weight(0.0) == weight
+        assert scheduler.needs_bound(weight)
+        scheduler.add_bound(weight, 5 * count)
+        assert scheduler.next_weight(0.0) == weight and not scheduler.needs_bound(weight)
+        scheduler.add(weight, count)
+    probability = 64 * 2**-10 + 32 * 2**-11
+    # Weights are only skipped by their upper bound, not by the prediction
+    assert scheduler.next_weight(probability, expensive_first=False) == 12
+    scheduler.add_bound(12, 2**12 * 0.02 * probability)
+    assert scheduler.next_weight(probability) == 12
+    scheduler.add(12, 1)
+    assert scheduler.next_weight(probability) == 13
+    scheduler.add_bound(13, 2**13 * 0.005 * probability)
+    assert scheduler.next_weight(probability) is None
+    assert scheduler.skipped == [13]
+    assert scheduler.skipped_contribution() == 0.005 * probability
+    # Weights which could not be bounded are counted
+    scheduler = WeightScheduler([20], fraction=0.01)
+    scheduler.add_bound(scheduler.next_weight(0.0), None)
+    assert scheduler.next_weight(1.0) == 20
+
+def test_bound_weight_task():
+    from cryptanalysis.strategies.probability import _bound_weight_task
+    def count(weight, approxmc, progress, tolerance):
+        assert approxmc and tolerance == (4.0, 0.01)
+        return (weight, {3: 10, 4: None}[weight])
+    assert _bound_weight_task(count, (4.0, 0.01), 3) == (3, 50)
+    assert _bound_weight_task(count, (4.0, 0.01), 4) == (4, None)
+
+def test_probability_interval():
+    from cryptanalysis.strategies.probability import ProbabilityInterval, refinement_tolerances
+    tolerances = refinement_tolerances(0.8, 0.2, 2)
+    assert [eps for eps, _ in tolerances] == [4.0, 2.0, 1.0, 0.8]
+    assert sum(2 * delta for _, delta in tolerances) <= 0.2
+
+    interval = ProbabilityInterval(range(10, 12))
+    interval.add(10, 100, 4.0, 0.05)
+    assert interval.bounds[10] == (20, 500)
+    assert interval.lower() == 20 * 2**-10
+    assert interval.upper() == float("inf")
+    # The bounds of all counts of a weight are intersected
+    interval.add(10, 40, 1.0, 0.025)
+    assert interval.bounds[10] == (20, 80)
+    interval.add(11, 0, 4.0, 0.05)
+    assert interval.exact(11)
+    assert interval.upper() == 80 * 2**-10
+    assert interval.confidence() == pytest.approx(0.875)
+
+def test_anytime_strategy():
+    import ciphers
+    from cryptanalysis.strategies.probability import AnytimeProbabilityStrategy
+
+    class Strategy(AnytimeProbabilityStrategy):
+        counted = []
+        def _counter(self):
+            def count(weight, approxmc, progress=None, tolerance=None):
+                self.counted.append((weight, tolerance[0]))
+                return weight, {10: 0, 11: 16}[weight]
+            return None, count
+
+    parameters = {"rounds": 2, "sweight": 10, "endweight": 12, "cryptominisat": True, "epsilon": 1.0}
+    probability = Strategy(ciphers.get_cipher("simon"), parameters).run()
+    # Weights without characteristics are not counted again
+    assert Strategy.counted == [(10, 4.0), (11, 4.0), (11, 2.0), (11, 1.0)]
+    assert probability == 8 * 2**-11
+
+def test_count_projection(tmp_path, monkeypatch):
+    # The projection is known before the worker renders its models from a
+    # template, which leaves the state variables of its cipher empty
+    import ciphers
+    from cryptanalysis.strategies.probability import ProbabilityStrategy
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "tmp").mkdir()
+    parameters = {"rounds": 2, "wordsize": 16, "sweight": 0, "endweight": 4, "pysat": True,
+                  "fixedVariables": {}, "blockedCharacteristics": []}
+    _, count = ProbabilityStrategy(ciphers.get_cipher("simon"), parameters)._counter()
+    assert "x0" in count.args[2] and "y2" in count.args[2]
+
+def test_anytime_incomplete_count():
+    # A count which did not finish is neither exact nor part of the bounds
+    import ciphers
+    from cryptanalysis.strategies.probability import AnytimeProbabilityStrategy
+
+    class Strategy(AnytimeProbabilityStrategy):
+        intervals = []
+        def _counter(self):
+            def count(weight, approxmc, progress=None, tolerance=None):
+                return weight, None if tolerance[0] == 4.0 else 0
+            return None, count
+        def _refine(self, interval, weight, solutions, epsilon, delta):
+            super()._refine(interval, weight, solutions, epsilon, delta)
+            self.intervals.append((dict(interval.bounds), interval.failure))
+
+    parameters = {"rounds": 2, "sweight": 10, "endweight": 11, "cryptominisat": True, "epsilon": 2.0}
+    assert Strategy(ciphers.get_cipher("simon"), parameters).run() == 0
+    assert Strategy.intervals[0] == ({}, 0.0)
+    assert Strategy.intervals[1][0] == {10: (0, 0)}
+
+def test_anytime_stop_kills_counters():
+    # Counters which are still running are killed when the time is up
+    import threading
+    import ciphers
+    from cryptanalysis.strategies.probability import AnytimeProbabilityStrategy
+
+    class Solver:
+        def __init__(self):
+            self.cancelled = threading.Event()
+        def copy(self):
+            return Solver()
+        def cancel(self):
+            self.cancelled.set()
+        def solve_and_count(self):
+            pass
+
+    class Strategy(AnytimeProbabilityStrategy):
+        def _counter(self):
+            def count(weight, approxmc, progress=None, tolerance=None, solver=None):
+                if weight == 11:
+                    # ApproxMC only stops if it is killed
+                    assert solver.cancelled.wait(10)
+                    return weight, None
+                return weight, 4
+            return None, count
+        def reached_timelimit(self):
+            return bool(self.counted)
+        def _refine(self, interval, weight, solutions, epsilon, delta):
+            super()._refine(interval, weight, solutions, epsilon, delta)
+            self.counted.append(weight)
+
+    parameters = {"rounds": 2, "sweight": 10, "endweight": 12, "cryptominisat": True, "threads": 2}
+    strategy = Strategy(ciphers.get_cipher("simon"), parameters)
+    strategy.solver, strategy.counted = Solver(), []
+    # The interval of the weights counted so far is reported
+    assert strategy.run() == 2**-10
+    assert strategy.counted == [10]
@@ -0,0 +1,59 @@
+import pytest
+from parser import smtlib2
+
+class MockCharData:
+    def __init__(self, data):
+        self.characteristic_data = data
+
+def test_getWeightAssertion():
+    assert smtlib2.getWeightAssertion(5) == "(assert (= weight #b0000000000000101))"
+
+def test_getDeclaredVariables():
+    model = ("(declare-fun x0 () (_ BitVec 16))\n"
+             "(declare-const |w0| (_ BitVec 4))\n")
+    assert smtlib2.getDeclaredVariables(model) == {"x0": 16, "w0": 4}
+
+def test_blockCharacteristic():
+    char = MockCharData({"x0": "0x0001", "y0": "0x0002", "w0": "0x0003"})
+    assertion = smtlib2.blockCharacteristic(char, {"x0": 16, "y0": 16, "w0": 16})
+    assert assertion == ("(assert (or (distinct x0 #b0000000000000001) "
+                         "(distinct y0 #b0000000000000010)))")
+
+def test_blockCharacteristic_with_ignore_msbs():
+    # Speck-32: the MSB of every word is ignored
+    char = MockCharData({"x0": "0x8001"})
+    assertion = smtlib2.blockCharacteristic(char, {"x0": 16}, ignore_msbs=1)
+    assert assertion == "(assert (distinct ((_ extract 14 0) x0) #b000000000000001))"
+
+def test_translate_declarations_and_query():
+    cvc = ("x0, y0: BITVECTOR(16);\n"
+           "w0: BITVECTOR(4);\n"
+           "ASSERT(x0 = 0bin0000000000000001);\n"
+           "ASSERT(w0 = 0hex1);\n"
+           "QUERY(FALSE);\n"
+           "COUNTEREXAMPLE;\n")
+    assert smtlib2.translate(cvc) == ("(set-logic QF_BV)\n"
+                                      "(declare-fun x0 () (_ BitVec 16))\n"
+                                      "(declare-fun w0 () (_ BitVec 4))\n"
+                                      "(assert (= x0 #b0000000000000001))\n"
+                                      "(assert (= w0 #x1))\n"
+                                      "(check-sat)\n")
+
+def test_translate_expressions():
+    cvc = ("a, b: BITVECTOR(4);\n"
+           "% comment\n"
+           "ASSERT(BVXOR(a, ~b) = (a[1:0] @ b[3:2]) & a | 0hexF);\n"
+           "ASSERT(a = b << 1 >> 2);\n"
+           "ASSERT(BVPLUS(8, 0bin0, a[3:3]) = 0x01);\n"
+           "ASSERT(IF NOT(BVLE(a, b)) THEN 0b0001 ELSE a ENDIF = b);\n")
+    assertions = [l for l in smtlib2.translate(cvc).splitlines() if l.startswith("(assert")]
+    assert assertions == [
+        "(assert (= (bvxor a (bvnot b)) (bvor (bvand (concat ((_ extract 1 0) a) ((_ extract 3 2) b)) a) #xF)))",
+        "(assert (= a ((_ zero_extend 2) ((_ extract 4 2) (concat b #b0)))))",
+        "(assert (= (bvadd ((_ zero_extend 7) #b0) ((_ zero_extend 7) ((_ extract 3 3) a))) #x01))",
+        "(assert (= (ite (not (bvule a b)) #b0001 a) b))",
+    ]
+
+def test_translate_rejects_undeclared_variables():
+    with pytest.raises(ValueError):
+        smtlib2.translate("ASSERT(x0 = 0bin0);")
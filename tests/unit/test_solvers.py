@@ -1,8 +1,20 @@
 
 import pytest
-from solvers.solver import SolverResult
+import subprocess
+import sys
+import time
+from solvers.solver import AbstractSolver, SolverResult, UNKNOWN
 import solvers
 
+class ScriptSolver(AbstractSolver):
+    # The path is a python script which prints the solver output
+    def solve(self, stp_file):
+        returncode, output = self._run([sys.executable, "-c", self.path])
+        return self._result(output)
+
+    def parse_characteristic(self, result, cipher, rounds):
+        return result.raw_output
+
 def test_solver_result():
     res = SolverResult(True, "sat\nx=0x1")
     assert res.is_sat is True
@@ -39,3 +51,234 @@ def test_solver_solution_check():
     assert solver._found_solution("Invalid") is True
     assert solver._found_solution("Valid") is False
     assert solver._found_solution("something else") is False
+
+def test_session_push_pop():
+    from solvers.session import SMTLIB2Session
+    # Minimal interactive solver: x is fixed to 1 by every weight assertion
+    # except the one asserting weight 3.
+    script = (
+        "import sys\n"
+        "scope = []\n"
+        "for line in sys.stdin:\n"
+        "    line = line.strip()\n"
+        "    if line.startswith('(push'): scope.append([])\n"
+        "    elif line.startswith('(pop'): scope.pop()\n"
+        "    elif line.startswith('(assert') and scope: scope[-1].append(line)\n"
+        "    elif line == '(check-sat)':\n"
+        "        sat = any('#b0000000000000011' in a for s in scope for a in s)\n"
+        "        print('sat' if sat else 'unsat', flush=True)\n"
+        "    elif line == '(get-model)':\n"
+        "        print('(\\n(define-fun weight () (_ BitVec 16) #x0003)\\n)', flush=True)\n"
+    )
+    model = "(set-logic QF_BV)\n(declare-fun weight () (_ BitVec 16))\n(check-sat)\n(exit)\n"
+    with SMTLIB2Session([sys.executable, "-c", script], model) as session:
+        assert "weight" in session.declared
+        assert session.check_assuming(["(assert (= weight #b0000000000000010))"]).is_sat is False
+        result = session.check_assuming(["(assert (= weight #b0000000000000011))"])
+        assert result.is_sat is True
+        assert "#x0003" in result.raw_output
+
+@pytest.mark.parametrize("params", [{"boolector": True}, {}])
+def test_session_support(params):
+    # STP is not driven over SMT-LIB2
+    solver = solvers.get_solver(params)
+    assert solver.session_command() is None
+    with pytest.raises(NotImplementedError):
+        solver.open_session("dummy.stp")
+
+def test_portfolio_first_answer_wins(tmp_path):
+    from solvers.portfolio import PortfolioSolver
+
+    slow = ScriptSolver("import time; time.sleep(30); print('sat')")
+    fast = ScriptSolver("print('unsat')")
+    portfolio = PortfolioSolver([slow, fast])
+
+    stp_file = tmp_path / "model.stp"
+    stp_file.write_text("x: BITVECTOR(4);\nASSERT(x = 0x1);\nQUERY(FALSE);\n")
+    start = time.time()
+    result = portfolio.solve(str(stp_file))
+    assert time.time() - start < 20
+    assert result.is_sat is False
+    assert "unsat" in result.raw_output
+    assert isinstance(result.solver, ScriptSolver)
+    assert portfolio.parse_characteristic(result, None, 0) == result.raw_output
+
+def test_get_portfolio():
+    solver = solvers.get_solver({"portfolio": True})
+    assert isinstance(solver, solvers.portfolio.PortfolioSolver)
+    assert len(solver.members) >= 1
+
+def test_solver_result_status():
+    solver = ScriptSolver("")
+    assert solver._result("sat\n").status == "sat"
+    assert solver._result("unsat\n").status == "unsat"
+    assert solver._result("Invalid.\n").is_sat is True
+    assert solver._result("Valid.\n").status == "unsat"
+    result = solver._result("")
+    assert result.is_unknown and not result.is_sat
+    assert SolverResult(True, "").status == "sat"
+
+def test_solver_timeout():
+    # The solver starts a child process, which is killed with its group
+    script = "import subprocess; subprocess.run(['sleep', '30']); print('sat')"
+    solver = ScriptSolver(script, timeout=1)
+    start = time.time()
+    result = solver.solve("dummy.stp")
+    assert time.time() - start < 10
+    assert result.is_unknown
+
+def test_start_process_limits():
+    resource = pytest.importorskip("resource")
+    from solvers.solver import start_process
+    script = "import resource; print(resource.getrlimit(resource.RLIMIT_AS)[0])"
+    process = start_process([sys.executable, "-c", "import time; time.sleep(1); " + script],
+                            memory=4096, stdout=subprocess.PIPE, text=True)
+    output, _ = process.communicate()
+    assert int(output) == 4096 * 1024 * 1024
+
+def test_solver_deadline():
+    solver = ScriptSolver("", timeout=60, deadline=time.time() + 5)
+    assert solver.query_timeout() <= 5
+    assert ScriptSolver("").query_timeout() is None
+
+def test_session_timeout_restarts_solver():
+    from solvers.session import SMTLIB2Session
+    # Hangs on the query for weight 3, all other queries are unsat
+    script = (
+        "import sys, time\n"
+        "scope = [[]]\n"
+        "for line in sys.stdin:\n"
+        "    line = line.strip()\n"
+        "    if line.startswith('(push'): scope.append([])\n"
+        "    elif line.startswith('(pop'): scope.pop()\n"
+        "    elif line.startswith('(assert'): scope[-1].append(line)\n"
+        "    elif line == '(check-sat)':\n"
+        "        if any('#b0000000000000011' in a for s in scope for a in s): time.sleep(60)\n"
+        "        print('unsat', flush=True)\n"
+    )
+    model = "(declare-fun weight () (_ BitVec 16))\n(assert (= weight weight))\n"
+    solver = ScriptSolver("", timeout=1)
+    with SMTLIB2Session([sys.executable, "-c", script], model, solver) as session:
+        result = session.check_assuming(["(assert (= weight #b0000000000000011))"])
+        assert result.is_unknown
+        # The restarted process has the model, but not the removed scope
+        assert session.scopes == [[]]
+        assert session.check_assuming(["(assert (= weight #b0000000000000010))"]).status == "unsat"
+
+def test_session_answer_before_exit():
+    from solvers.session import SMTLIB2Session
+    # The process ends after its answer was read, as if the timer fired late
+    script = (
+        "import sys\n"
+        "for line in sys.stdin:\n"
+        "    if line.strip() == '(check-sat)':\n"
+        "        print('unsat', flush=True)\n"
+        "        sys.exit()\n"
+    )
+    model = "(declare-fun weight () (_ BitVec 16))\n"
+    with SMTLIB2Session([sys.executable, "-c", script], model, ScriptSolver("", timeout=60)) as session:
+        read_status = session._read_status
+        session._read_status = lambda: (read_status(), session.process.wait())[0]
+        assert session.check().status == "unsat"
+        assert session.check().status == "unsat"
+
+def test_get_inprocess_solver_factory():
+    solver = solvers.get_solver({"bitwuzla": True, "inprocess": True})
+    assert isinstance(solver, solvers.bitwuzla.BitwuzlaAPISolver)
+
+    solver = solvers.get_solver({"cvc5": True, "inprocess": True})
+    assert isinstance(solver, solvers.cvc5.CVC5APISolver)
+
+    solver = solvers.get_solver({"pysat": True})
+    assert isinstance(solver, solvers.sat.PySATSolver)
+
+@pytest.mark.parametrize("module, solver_class, path", [
+    ("bitwuzla", "BitwuzlaAPISolver", "bitwuzla"),
+    ("cvc5", "CVC5APISolver", "cvc5"),
+    ("pysat", "PySATSolver", "glucose4"),
+])
+def test_inprocess_solver(tmp_path, module, solver_class, path):
+    pytest.importorskip(module)
+    model = tmp_path / "model.stp"
+    model.write_text("x, weight: BITVECTOR(8);\n"
+                     "ASSERT(BVLE(weight, 0hex10));\n"
+                     "ASSERT(weight = BVPLUS(8, x, 0hex03));\n"
+                     "QUERY(FALSE);\n")
+    solver = getattr(solvers, solver_class)(path)
+
+    result = solver.solve(str(model))
+    assert result.is_sat
+    assert result.values["weight"] == (result.values["x"] + 3) & 0xff
+    assert result.widths["x"] == 8
+
+    with solver.open_session(str(model)) as session:
+        result = session.check_assuming(["(assert (= weight #x11))"])
+        assert result.status == "unsat"
+        result = session.check_assuming(["(assert (= weight #x05))"])
+        assert result.is_sat
+        assert result.values["x"] == 2
+        assert session.check().is_sat
+
+def test_result_cache(tmp_path):
+    from solvers.cache import ResultCache, CachedSolver
+
+    calls = tmp_path / "calls"
+    inner = ScriptSolver(f"open({str(calls)!r}, 'a').write('x'); print('sat')")
+    solver = CachedSolver(inner, ResultCache(str(tmp_path / "cache")))
+    stp_file = tmp_path / "model.stp"
+    stp_file.write_text("x: BITVECTOR(4);\nQUERY(FALSE);\n")
+
+    assert solver.solve(str(stp_file)).is_sat
+    # Results are persistent and shared with new instances
+    solver = CachedSolver(inner.copy(), ResultCache(str(tmp_path / "cache")))
+    result = solver.solve(str(stp_file))
+    assert result.is_sat and "sat" in result.raw_output
+    assert calls.read_text() == "x"
+
+    # A different model is not a cache hit
+    stp_file.write_text("y: BITVECTOR(4);\nQUERY(FALSE);\n")
+    solver.solve(str(stp_file))
+    assert calls.read_text() == "xx"
+
+def test_result_cache_skips_unknown(tmp_path):
+    from solvers.cache import ResultCache, CachedSolver
+
+    solver = CachedSolver(ScriptSolver("print('timeout')"), ResultCache(str(tmp_path)))
+    stp_file = tmp_path / "model.stp"
+    stp_file.write_text("QUERY(FALSE);\n")
+    assert solver.solve(str(stp_file)).is_unknown
+    key = solver._key(str(stp_file), "solve")
+    assert solver.cache.get_result(key) is None
+
+def test_result_cache_eviction(tmp_path):
+    from solvers.cache import ResultCache
+
+    cache = ResultCache(str(tmp_path), max_size=1)
+    for i in range(5):
+        cache.put_result(f"key{i}", SolverResult(True, "x" * 300000))
+    assert cache.get_result("key0") is None
+    assert cache.get_result("key4").raw_output == "x" * 300000
+
+def test_result_cache_satlog(tmp_path):
+    # The log of the counter is written even if the count is cached
+    from solvers.cache import ResultCache, CachedSolver
+
+    class Counter(ScriptSolver):
+        calls = 0
+        def solve_and_count(self, stp_file, sat_logfile=None, **kwargs):
+            Counter.calls += 1
+            if sat_logfile is not None:
+                with open(sat_logfile, "w") as f:
+                    f.write("s mc 3\n")
+            self.count_complete = True
+            return 3
+
+    solver = CachedSolver(Counter("print('sat')"), ResultCache(str(tmp_path / "cache")))
+    stp_file = tmp_path / "model.stp"
+    stp_file.write_text("x: BITVECTOR(4);\nQUERY(FALSE);\n")
+    log = tmp_path / "satlog.log"
+    assert solver.solve_and_count(str(stp_file)) == 3
+    assert solver.solve_and_count(str(stp_file)) == 3
+    assert Counter.calls == 1
+    assert solver.solve_and_count(str(stp_file), str(log)) == 3
+    assert Counter.calls == 2 and log.read_text() == "s mc 3\n"
@@ -60,3 +60,53 @@ def test_blockCharacteristic_bitwidth_consistency():
     assert "x0[2:0]" in content
     assert "0bin010" in content
     assert "0bin000" in content
+
+def test_setupWeightComputation_parametric():
+    output = io.StringIO()
+    stpcommands.setupWeightComputation(output, None, ["w0", "w1"], 4)
+    content = output.getvalue()
+    assert "weight: BITVECTOR(16);" in content
+    assert "ASSERT(weight = 0bin" not in content
+    assert "ASSERT((weight = BVPLUS(16," in content
+
+    output = io.StringIO()
+    stpcommands.setupWeightComputation(output, 5, ["w0", "w1"], 4)
+    assert "ASSERT(weight = 0bin0000000000000101);" in output.getvalue()
+
+def test_setupWeightComputationSum_round_bounds():
+    output = io.StringIO()
+    stpcommands.setupWeightComputationSum(output, 8, ["w0", "w1", "w2"], 64,
+                                          encoding="matsui", roundBounds=[2, 8])
+    content = output.getvalue()
+    assert "ASSERT(weight = BVPLUS(16,w0,w1,w2));" in content
+    for window in ["w0", "w1", "w2"]:
+        assert f"ASSERT(BVGE({window}, 0bin0000000000000010));" in content
+    for window in ["BVPLUS(16,w0,w1)", "BVPLUS(16,w1,w2)"]:
+        assert f"ASSERT(BVGE({window}, 0bin0000000000001000));" in content
+
+def test_warnings_printed_once(caplog, monkeypatch):
+    monkeypatch.setattr(stpcommands, "warned", set())
+    with caplog.at_level("WARNING", logger="cryptosmt"):
+        for _ in range(2):
+            stpcommands.setupWeightComputationSum(io.StringIO(), 8, ["w0", "w1"], 64, encoding="matsui")
+    assert len(caplog.records) == 1
+    assert caplog.records[0].message in stpcommands.warned
+
+
+def test_getSboxCNF_matches_ddt():
+    sbox = (0xC, 0x5, 0x6, 0xB, 0x9, 0x0, 0xA, 0xD, 0x3, 0xE, 0xF, 0x8, 0x4, 0x7, 0x1, 0x2)
+    weights = {2: 0b0111, 4: 0b0011, 8: 0b0001, 16: 0b0000}
+    ddt = [[0] * 16 for _ in range(16)]
+    for x in range(16):
+        for dx in range(16):
+            ddt[dx][sbox[x] ^ sbox[x ^ dx]] += 1
+    valid = set((dx << 8) | (dy << 4) | weights[ddt[dx][dy]]
+                for dx in range(16) for dy in range(16) if ddt[dx][dy] in weights)
+
+    clauses = stpcommands.getSboxCNF(sbox)
+    # One clause per invalid point would give 3840 clauses
+    assert len(clauses) < 100
+    for point in range(1 << 12):
+        bits = [(point >> (11 - i)) & 1 for i in range(12)]
+        satisfied = all(any(bits[i] != value for i, value in clause) for clause in clauses)
+        assert satisfied == (point in valid)
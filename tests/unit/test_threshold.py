@@ -0,0 +1,58 @@
+import pytest
+import ciphers
+from cryptanalysis.threshold import ThresholdSearch, buildPDDT, getARXRound, loadPDDT, xdpAddWeight
+
+def test_xdp_add_weight():
+    # Weights of the Lipmaa-Moriai formula against the DDT of the 4-bit addition
+    n = 4
+    for a in range(1 << n):
+        for b in range(1 << n):
+            counts = {}
+            for x in range(1 << n):
+                for y in range(1 << n):
+                    c = ((x + y) ^ ((x ^ a) + (y ^ b))) % (1 << n)
+                    counts[c] = counts.get(c, 0) + 1
+            for c in range(1 << n):
+                weight = xdpAddWeight(a, b, c, n)
+                if c not in counts:
+                    assert weight is None
+                else:
+                    assert (1 << (2 * n)) == counts[c] << weight
+
+def test_pddt():
+    n, threshold = 6, 2
+    table = buildPDDT(n, threshold)
+    expected = sorted((xdpAddWeight(a, b, c, n), a, b, c) for a in range(1 << n) for b in range(1 << n)
+                      for c in range(1 << n)
+                      if (a or b) and xdpAddWeight(a, b, c, n) is not None and
+                      xdpAddWeight(a, b, c, n) <= threshold)
+    assert [(w, a, b, c) for a, b, c, w in table.tolist()] == expected
+
+def test_pddt_cache(tmp_path):
+    table = loadPDDT(8, 1, str(tmp_path))
+    assert (tmp_path / "pddt_n8_t1.npy").is_file()
+    assert (loadPDDT(8, 1, str(tmp_path)) == table).all()
+
+def test_minimal_weights():
+    cipher = ciphers.get_cipher("speck")
+    search = ThresholdSearch(getARXRound(cipher, {"wordsize": 16}), buildPDDT(16, 2), 2)
+    assert search.findMinimalWeights(4) == [0, 1, 3, 5]
+    assert search.exact
+
+def test_unsupported_cipher():
+    with pytest.raises(ValueError):
+        getARXRound(ciphers.get_cipher("simon"), {"wordsize": 16})
+
+def test_trail_satisfies_model(tmp_path):
+    # The characteristic is a solution of the SMT model of the cipher
+    pytest.importorskip("pysat.solvers")
+    from solvers.sat import PySATSolver
+    cipher = ciphers.get_cipher("speck")
+    search = ThresholdSearch(getARXRound(cipher, {"wordsize": 16}), buildPDDT(16, 2), 2)
+    weight, trail = search.search(3)
+    characteristic = search.getCharacteristic(trail, cipher)
+    fixed = {name: value for name, value in characteristic.characteristic_data.items()
+             if not name.startswith("w")}
+    stp_file = str(tmp_path / "speck.stp")
+    cipher.createSTP(stp_file, {"rounds": 3, "wordsize": 16, "sweight": weight, "fixedVariables": fixed})
+    assert PySATSolver("glucose4").solve(stp_file).is_sat